@@ -0,0 +1,42 @@
+"""Compares encode()/decode() with encode_batch()/decode_batch() of a tuple of frames.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench_batch.py [frames] [rows] [codec]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from pdutils.serialize import json
+
+
+def frames(count, rows):
+    rs = np.random.RandomState(42)
+    index = pd.date_range('2000-01-01', periods=rows, freq='S')
+    return tuple(pd.DataFrame(dict(('col%d' % i, rs.normal(size=rows)) for i in range(8)), index=index)
+                 for _ in range(count))
+
+
+def main(count=8, rows=200000, codec=None):
+    json.register_handlers()
+    data = frames(int(count), int(rows))
+    megabytes = sum(df.values.nbytes + df.index.values.nbytes for df in data) / 1e6
+    string = json.encode(data, codec=codec)
+    print('%-20s %12s %12s' % ('method', 'encode MB/s', 'decode MB/s'))
+    for name, encode, decode in [
+            ('serial', lambda: json.encode(data, codec=codec), lambda: json.decode(string)),
+            ('batch (threads)', lambda: json.encode_batch(data, codec=codec),
+             lambda: json.decode_batch(string)),
+            ('batch (processes)', lambda: json.encode_batch(data, processes=True, codec=codec),
+             lambda: json.decode_batch(string, processes=True))]:
+        encoding = min(timeit.repeat(encode, number=1, repeat=3))
+        decoding = min(timeit.repeat(decode, number=1, repeat=3))
+        print('%-20s %12.1f %12.1f' % (name, megabytes / encoding, megabytes / decoding))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
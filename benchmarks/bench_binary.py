@@ -0,0 +1,59 @@
+"""Compares the throughput of the binary container format with the JSON documents.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench_binary.py [rows] [directory]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from pdutils.serialize import binary
+from pdutils.serialize import json
+
+
+def frame(rows):
+    rs = np.random.RandomState(42)
+    index = pd.date_range('2000-01-01', periods=rows, freq='S')
+    return pd.DataFrame(dict(('col%d' % i, rs.normal(size=rows)) for i in range(8)), index=index)
+
+
+def save_json(df, path):
+    with open(path, 'w') as f:
+        f.write(json.encode(df))
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.decode(f.read())
+
+
+def touch(df):
+    """Reads every value of `df`, so that lazily mapped pages are paged in."""
+    return sum(float(df[col].values.sum()) for col in df.columns)
+
+
+def main(rows=2000000, directory=None):
+    json.register_handlers()
+    df = frame(int(rows))
+    megabytes = (df.values.nbytes + df.index.values.nbytes) / 1e6
+    directory = directory or tempfile.mkdtemp()
+    print('%-14s %12s %12s %12s' % ('format', 'size MB', 'save MB/s', 'load MB/s'))
+    for name, save, load in [('json', save_json, load_json),
+                             ('binary', binary.save, lambda path: binary.load(path, mmap_mode=False)),
+                             ('binary (mmap)', binary.save, binary.load)]:
+        path = os.path.join(directory, 'bench.' + name.split()[0])
+        saving = min(timeit.repeat(lambda: save(df, path), number=1, repeat=3))
+        loading = min(timeit.repeat(lambda: touch(load(path)), number=1, repeat=3))
+        print('%-14s %12.1f %12.1f %12.1f'
+              % (name, os.path.getsize(path) / 1e6, megabytes / saving, megabytes / loading))
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
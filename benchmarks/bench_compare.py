@@ -0,0 +1,43 @@
+"""Compares df_compare() called once per pair with df_compare_batch(), on many tiny frames.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench_compare.py [pairs]
+
+Every pair is equivalent, as in a passing golden test suite, so
+df_compare_batch() never falls back to df_compare().
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pdutils.compare import df_compare, df_compare_batch
+
+
+def _pairs(count):
+    rs = np.random.RandomState(0)
+    pairs = []
+    for _ in range(count):
+        size = rs.randint(10, 101)
+        df = pd.DataFrame({'a': rs.normal(size=size), 'b': np.arange(size), 'c': rs.normal(size=size) > 0},
+                          pd.date_range('2000-01-01', periods=size, freq='S'))
+        pairs.append((df, df.copy()))
+    return pairs
+
+
+def main(count=20000):
+    pairs = _pairs(int(count))
+    print('%-24s %12s %12s' % ('method', 'seconds', 'us/pair'))
+    for name, compare in [('df_compare', lambda: [df_compare(left, right) for left, right in pairs]),
+                          ('df_compare_batch', lambda: df_compare_batch(pairs))]:
+        start = time.time()
+        compare()
+        seconds = time.time() - start
+        print('%-24s %12.2f %12.1f' % (name, seconds, seconds / len(pairs) * 1e6))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,49 @@
+"""Compares the XOR float codec with plain zlib on representative float64 series.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench_float_codecs.py [rows]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from pdutils.serialize import codecs
+
+
+SPECS = ['zlib', 'shuffle+zlib', 'xor', 'xor+zlib']
+
+
+def series(rows):
+    """Returns (name, values) pairs of the kinds of series found in practice."""
+    rs = np.random.RandomState(42)
+    t = np.linspace(0., 100., rows)
+    walk = 100. + np.cumsum(rs.normal(0., 0.05, rows))
+    return [
+        ('price (random walk)', walk),
+        ('price (tick rounded)', np.round(walk, 2)),
+        ('sensor (smooth)', 20. + 5. * np.sin(t / 10.)),
+        ('sensor (noisy)', 20. + 5. * np.sin(t / 10.) + rs.normal(0., 0.01, rows)),
+        ('forward filled', np.repeat(walk[::100], 100)[:rows]),
+        ('white noise', rs.normal(0., 1., rows)),
+    ]
+
+
+def main(rows=1000000):
+    print('%-22s %-14s %8s %12s %12s' % ('series', 'codec', 'ratio', 'encode MB/s', 'decode MB/s'))
+    for name, values in series(rows):
+        raw = values.tostring()
+        megabytes = len(raw) / 1e6
+        for spec in SPECS:
+            applied, buf = codecs.encode(raw, values.dtype, spec)
+            assert codecs.decode(buf, values.dtype, applied) == raw
+            encode = min(timeit.repeat(lambda: codecs.encode(raw, values.dtype, spec), number=1, repeat=3))
+            decode = min(timeit.repeat(lambda: codecs.decode(buf, values.dtype, applied), number=1, repeat=3))
+            print('%-22s %-14s %8.2f %12.1f %12.1f'
+                  % (name, spec, len(raw) / float(len(buf)), megabytes / encode, megabytes / decode))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
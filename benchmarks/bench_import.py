@@ -0,0 +1,37 @@
+"""Measures the time taken to import pdutils, in fresh interpreters.
+
+Run from the top of the source tree:
+
+    python benchmarks/bench_import.py [runs]
+
+The times include starting the interpreter, which the first row measures on
+its own. Before the package was made lazy 'import pdutils' cost about as much
+as 'from pdutils import df_compare' does, as it always imported numpy.
+"""
+
+import os
+import subprocess
+import sys
+import timeit
+
+STATEMENTS = [
+    'pass',
+    'import pdutils',
+    'from pdutils import assert_',
+    'import pdutils.serialize',
+    'from pdutils import df_compare',
+    'import pdutils.serialize.json',
+]
+
+
+def main(runs=20):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    print('%-32s %12s' % ('statement', 'ms'))
+    for statement in STATEMENTS:
+        command = [sys.executable, '-c', statement]
+        seconds = min(timeit.repeat(lambda: subprocess.check_call(command, env=env), number=1, repeat=int(runs)))
+        print('%-32s %12.1f' % (statement, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
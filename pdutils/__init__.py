@@ -1,2 +1,32 @@
-from pdutils.compare import ts_compare, df_compare, ndarray_compare
-from pdutils.assert_funcs import assert_, assert_not
+"""Utilities for the pandas library.
+
+The public names are imported from their modules on first use (see
+__getattr__ below), so that importing pdutils doesn't import numpy.
+"""
+import importlib
+
+#: Maps the public names of the package to the modules defining them.
+_EXPORTS = {
+    'ts_compare': 'pdutils.compare',
+    'df_compare': 'pdutils.compare',
+    'df_compare_batch': 'pdutils.compare',
+    'ndarray_compare': 'pdutils.compare',
+    'sketch': 'pdutils.compare',
+    'sketch_compare': 'pdutils.compare',
+    'assert_': 'pdutils.assert_funcs',
+    'assert_not': 'pdutils.assert_funcs',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
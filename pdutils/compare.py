@@ -5,8 +5,175 @@ import numpy as np
 
 _strip_nans = lambda a: a[np.negative(np.isnan(a))]
 
+#: The number of registers of the HyperLogLog distinct count of a sketch, as a power of 2.
+_SKETCH_BITS = 10
+
+_EPS = np.finfo(np.float64).eps
+
+
+def _distinct(values):
+    """Returns the HyperLogLog estimate of the number of distinct values in an array."""
+    # pandas is only imported here, so that comparing numpy arrays doesn't import it.
+    import pandas as pd
+
+    m = 1 << _SKETCH_BITS
+    if not values.size:
+        return 0.
+    hashes = pd.util.hash_array(values.ravel())
+    registers = (hashes >> np.uint64(64 - _SKETCH_BITS)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - _SKETCH_BITS)) - 1)
+    # The position of the leftmost 1 bit of the rest of the hash, 1 for the top one.
+    ranks = (64 - _SKETCH_BITS) - np.floor(np.log2(rest.astype(np.float64) + 1.)).astype(np.intp)
+    # The highest rank seen in each register, without a slow np.maximum.at().
+    seen = np.bincount(registers * 64 + ranks, minlength=m * 64).reshape(m, 64) > 0
+    highest = np.where(seen.any(axis=1), 63 - np.argmax(seen[:, ::-1], axis=1), 0)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2. ** -highest)
+    empty = np.count_nonzero(highest == 0)
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(float(m) / empty)
+    return float(estimate)
+
+
+def sketch(values, distinct=True):
+    """Returns a summary of the values of a numpy.ndarray, computed in one vectorized pass over it.
 
-def ndarray_compare(left, right, rtol=1.e-5, atol=1.e-8):
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The values to summarise.
+
+    distinct : bool
+        If True the approximate number of distinct values is included. (optional)
+        Default: True
+
+    Returns
+    -------
+    summary : dict
+        {"dtype": ..., "count": ..., "nans": ...} and, for numeric, boolean
+        and datetime values, the "min", "max", "sum" and "sum_sq" of the
+        values that aren't NaN (None if there are none), plus "distinct" if
+        asked for. Integer (and datetime) values are summed as int64, the
+        sums of equal arrays are therefore always equal. A summary holds
+        plain Python numbers, so it can be stored as JSON.
+    """
+    values = np.asarray(values)
+    summary = {'dtype': values.dtype.str, 'count': int(values.size), 'nans': 0}
+    kind = values.dtype.kind
+    if kind == 'f':
+        nans = np.isnan(values)
+        summary['nans'] = int(np.count_nonzero(nans))
+        numbers = (values[~nans] if summary['nans'] else values.ravel()).astype(np.float64, copy=False)
+        convert = float
+    elif kind in 'biuMm':
+        numbers = values.ravel().view(np.int64) if kind in 'Mm' else values.ravel().astype(np.int64, copy=False)
+        convert = int
+    else:
+        numbers = None
+    if numbers is not None:
+        if numbers.size:
+            summary.update(min=convert(numbers.min()), max=convert(numbers.max()), sum=convert(numbers.sum()),
+                           sum_sq=convert(np.dot(numbers, numbers)))
+        else:
+            summary.update(min=None, max=None, sum=convert(0), sum_sq=convert(0))
+    if distinct:
+        summary['distinct'] = _distinct(values)
+    return summary
+
+
+def _close(left, right, tolerance):
+    """Returns True unless float statistics `left` and `right` differ by more than `tolerance`.
+
+    Statistics that aren't finite, e.g. a sum of squares that overflowed on
+    one side only, are inconclusive.
+    """
+    if left == right or not np.all(np.isfinite([left, right, tolerance])):
+        return True
+    return abs(left - right) <= tolerance
+
+
+def sketch_compare(left, right, rtol=1.e-5, atol=1.e-8):
+    """Compares the sketches of two numpy.ndarray objects, as returned by sketch().
+
+    The comparison only rejects: if `equivalent` is False the arrays are not
+    equivalent as per ndarray_compare(), while if it is True they may or may
+    not be. The statistics of integer (and other exactly compared) arrays
+    must match exactly. Those of floating point arrays must match within the
+    most that values within the tolerances of np.allclose() can move them
+    (e.g. a sum by the number of values times atol + rtol * the largest
+    magnitude), allowing for rounding.
+
+    Returns
+    -------
+    equivalent, status : tuple
+        `status` is a string with specific details of the difference if
+        `equivalent` is False.
+    """
+    if left['dtype'] != right['dtype']:
+        return False, 'dtype mismatch! left: %r, right: %r' % (np.dtype(left['dtype']), np.dtype(right['dtype']))
+    if left['count'] != right['count']:
+        return False, 'value count mismatch! left has %d value(s), right has %d value(s)' \
+            % (left['count'], right['count'])
+    if left['nans'] != right['nans']:
+        return False, 'NaN value positions do not match! left has %d NaN(s), right has %d NaN(s)' \
+            % (left['nans'], right['nans'])
+    names = [name for name in ('min', 'max', 'sum', 'sum_sq') if name in left and name in right]
+    if np.dtype(left['dtype']).kind == 'f':
+        if left['min'] is None:
+            return True, 'sketches are equivalent'
+        n = left['count'] - left['nans']
+        magnitude = max(abs(left['min']), abs(left['max']), abs(right['min']), abs(right['max']))
+        # How far a value may move, as per np.allclose(), and the rounding errors of sums of n values.
+        # np.allclose() works in the dtype of the values, whose rounding of the difference and of the
+        # tolerance (e.g. of atol to float32) lets values move a few of its epsilons (or, for tolerances
+        # too small for its normal numbers, of its smallest steps) further.
+        info = np.finfo(left['dtype'])
+        move = (atol + rtol * magnitude) * (1 + 4 * info.eps) + 2 * info.eps * info.tiny
+        rounding = 2 * _EPS * n * n * magnitude
+        tolerances = {'min': move, 'max': move, 'sum': n * move + rounding,
+                      'sum_sq': n * move * (2 * magnitude + move) + rounding * magnitude}
+        differ = [name for name in names if not _close(left[name], right[name], tolerances[name])]
+    else:
+        if np.dtype(left['dtype']).kind in 'biu' and 'distinct' in left and 'distinct' in right:
+            names.append('distinct')
+        differ = [name for name in names if left[name] != right[name]]
+    if differ:
+        return False, 'values are different! %s' % ', '.join(
+            '%s: left %r, right %r' % (name, left[name], right[name]) for name in differ)
+    return True, 'sketches are equivalent'
+
+
+def _sample_rows(size, sample, seed):
+    """Returns the sorted positions of the rows of a sample of `size` rows, or None to compare them all.
+
+    `sample` is a positive number of rows, or a fraction of them (of at least
+    one row) if a float of at most 1.
+    """
+    if sample <= 0:
+        raise ValueError('sample must be a positive number or fraction of rows, got %r' % (sample,))
+    count = max(int(round(sample * size)), 1) if isinstance(sample, float) and sample <= 1 else int(sample)
+    if count >= size:
+        return None
+    rs = np.random.RandomState(seed)
+    if 2 * count > size:
+        return np.sort(rs.permutation(size)[:count])
+    rows = np.unique(rs.randint(0, size, count))
+    while len(rows) < count:
+        rows = np.unique(np.concatenate([rows, rs.randint(0, size, count - len(rows))]))
+    return rows
+
+
+def _sampled(status, rows, size, confidence):
+    """Returns the `status` of a comparison of a sample of rows, with the bound it implies on the mismatch rate."""
+    if rows is None:
+        return status
+    # The largest mismatch rate for which a sample this size would have shown no mismatch with
+    # probability 1 - confidence (the binomial bound, conservative for a sample without replacement).
+    bound = 1. - (1. - confidence) ** (1. / max(len(rows), 1))
+    return '%s in a sample of %d of %d rows, the mismatch rate is below %.3g with %g%% confidence' \
+        % (status, len(rows), size, bound, 100 * confidence)
+
+
+def ndarray_compare(left, right, rtol=1.e-5, atol=1.e-8, sample=None, seed=0, confidence=0.95):
     """Compares two numpy.ndarray objects for equivalence.
     
     Parameters
@@ -23,6 +190,22 @@ def ndarray_compare(left, right, rtol=1.e-5, atol=1.e-8):
     atol : float
         The absolute tolerance parameter for np.allclose() comparisons.
 
+    sample : int or float
+        If given only a sample of this many rows (or this fraction of them,
+        if a float of at most 1) is compared, picked at random but in order. The
+        status of arrays whose samples are equivalent reports the bound on
+        the fraction of rows that differ this implies. (optional)
+        Default: None (every row is compared)
+
+    seed : int
+        The seed of the random choice of rows, the same seed always picks
+        the same rows. (optional)
+        Default: 0
+
+    confidence : float
+        The confidence of the bound on the mismatch rate. (optional)
+        Default: 0.95
+
     Returns
     -------
     equivalent, status : tuple
@@ -33,6 +216,19 @@ def ndarray_compare(left, right, rtol=1.e-5, atol=1.e-8):
     if left.dtype != right.dtype:
         return False, 'dtype mismatch! left: %r, right: %r' % (left.dtype, right.dtype)
 
+    rows = size = None
+    if sample is not None:
+        # A 0-d array is a single row, which is always compared.
+        size = 1
+        if left.ndim and right.ndim:
+            if len(left) != len(right):
+                return False, 'row count mismatch! left has %d row(s), right has %d row(s)' \
+                    % (len(left), len(right))
+            size = len(left)
+        rows = _sample_rows(size, sample, seed)
+        if rows is not None:
+            left, right = left[rows], right[rows]
+
     if np.issubdtype(left.dtype, np.floating):
         if not np.all(np.isnan(left) == np.isnan(right)):
             return False, 'NaN value positions do not match!'
@@ -42,10 +238,10 @@ def ndarray_compare(left, right, rtol=1.e-5, atol=1.e-8):
         if not np.all(left == right):
             return False, 'values are different!'
 
-    return True, 'values are equivalent'
+    return True, _sampled('values are equivalent', rows, size, confidence)
 
 
-def ts_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
+def ts_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False, sample=None, seed=0, confidence=0.95):
     """Compares two pandas.TimeSeries objects for equivalence.
 
     Parameters
@@ -66,6 +262,9 @@ def ts_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
         If True displays detailed comparison information. (optional)
         Default: False
 
+    sample, seed, confidence :
+        Compare a sample of the rows only, as for ndarray_compare(). (optional)
+
     Returns
     -------
     equivalent, status : tuple
@@ -102,6 +301,11 @@ def ts_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
             'left index type %s, right index type %s' \
                 % (type(left.index), type(right.index))
 
+    size = len(left)
+    rows = None if sample is None else _sample_rows(size, sample, seed)
+    if rows is not None:
+        left, right = left.iloc[rows], right.iloc[rows]
+
     if not np.all(left.index.values == right.index.values):
         return False, 'index values are not the same!'
 
@@ -112,10 +316,10 @@ def ts_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
             comparison_data = '\nLEFT TimeSeries:\n%r\nRIGHT TimeSeries:\n%r\n' % (left, right)
         return False, 'comparison of values failed! %s%s' % (msg, comparison_data)
 
-    return True, 'TimeSeries contents are equivalent'
+    return True, _sampled('TimeSeries contents are equivalent', rows, size, confidence)
 
 
-def df_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
+def df_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False, sample=None, seed=0, confidence=0.95):
     """Compares two pandas.DataFrame objects for equivalence.
 
     Parameters
@@ -136,6 +340,10 @@ def df_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
         If True displays detailed comparison information. (optional)
         Default: False
 
+    sample, seed, confidence :
+        Compare a sample of the rows only, as for ndarray_compare(). The
+        same rows of the index and of every column are compared. (optional)
+
    Returns
     -------
     equivalent, status : tuple
@@ -165,6 +373,10 @@ def df_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
     6. both sides have column values are strictly equal (according to
        np.all(...)) for all data types apart from floating point (which
     are compared equal with a specified tolerance using np.allclose(...)).
+
+    The sketch()es of the columns are compared first (see
+    sketch_compare()), so a column whose counts, NaN counts, ranges or sums
+    already differ is reported without comparing any column in full.
     """
     if left.columns.size != right.columns.size:
         reason_template = '%s side column(s) {%s} not found on the %s side'
@@ -192,17 +404,106 @@ def df_compare(left, right, rtol=1.e-5, atol=1.e-8, verbose=False):
         return False, 'index type mismatch! left index type %s, right index type %s' \
             % (type(left.index), type(right.index))
 
+    size = len(left)
+    rows = None if sample is None else _sample_rows(size, sample, seed)
+    if rows is not None:
+        left, right = left.iloc[rows], right.iloc[rows]
+
     if not np.all(left.index.values == right.index.values):
         return False, 'index values are not the same!'
 
+    def failed(col, msg):
+        comparison_data = ''
+        if verbose:
+            comparison_data = '\nLEFT DataFrame:\n%r\nRIGHT DataFrame:\n%r\n' \
+                % (left[sorted(left.columns)], right[sorted(right.columns)])
+        return False, 'comparison of column %r failed! %s%s' % (col, msg, comparison_data)
+
+    #   Quick-reject stage, so that a column differing wildly is found without comparing the others in full.
+    for col in sorted(lcols):
+        equivalent, msg = sketch_compare(sketch(left[col].values, distinct=False),
+                                         sketch(right[col].values, distinct=False), rtol=rtol, atol=atol)
+        if not equivalent:
+            return failed(col, msg)
+
     for col in sorted(lcols):
         equivalent, msg = ndarray_compare(left[col].values, right[col].values, rtol=rtol, atol=atol)
         if not equivalent:
-            comparison_data = ''
-            if verbose:
-                comparison_data = '\nLEFT DataFrame:\n%r\nRIGHT DataFrame:\n%r\n' \
-                    % (left[sorted(left.columns)], right[sorted(right.columns)])
-            return False, 'comparison of column %r failed! %s%s' % (col, msg, comparison_data)
+            return failed(col, msg)
+
+    return True, _sampled('DataFrame contents are equivalent', rows, size, confidence)
+
+
+def _arrays(df):
+    """Returns the schema of DataFrame `df` and the arrays of its index and columns, if all numpy arrays.
+
+    Otherwise returns (None, None), as for an empty frame.
+    """
+    columns = tuple(df.columns)
+    if not len(df) or not isinstance(df.index.dtype, np.dtype) or len(set(columns)) != len(columns):
+        return None, None
+    arrays = [df.index.values] + [df[col].values for col in columns]
+    if not all(isinstance(array, np.ndarray) for array in arrays):
+        return None, None
+    return (type(df.index), columns, tuple(array.dtype for array in arrays)), arrays
 
-    return True, 'DataFrame contents are equivalent'
 
+def _rows_differ(left, right, rtol, atol):
+    """Returns the mask of the rows of arrays `left` and `right` that differ as per ndarray_compare()."""
+    if np.issubdtype(left.dtype, np.floating):
+        lnans, rnans = np.isnan(left), np.isnan(right)
+        return (lnans != rnans) | ~(lnans | np.isclose(left, right, rtol=rtol, atol=atol))
+    return np.asarray(left != right, dtype=bool)
+
+
+def df_compare_batch(pairs, rtol=1.e-5, atol=1.e-8):
+    """Compares many pairs of (small) pandas.DataFrame objects for equivalence, as df_compare() does.
+
+    The pairs whose left and right frames have one schema (the same index
+    type, columns, column order and dtypes) are grouped by schema, and the
+    columns (and index) of the frames of each group concatenated, so that
+    every column of a group is compared in a few vectorized operations
+    rather than once per pair. The
+    pairs found to differ, and those that can't be grouped (e.g. empty
+    frames or extension dtypes), are compared by df_compare() itself.
+
+    Parameters
+    ----------
+    pairs : iterable
+        The (left, right) pairs of DataFrame objects to compare.
+
+    rtol : float
+        The relative tolerance parameter used for np.isclose() comparisons. (optional)
+
+    atol : float
+        The absolute tolerance parameter for np.isclose() comparisons. (optional)
+
+    Returns
+    -------
+    results : list
+        The (equivalent, status) tuple of each pair, in order, as returned
+        by df_compare().
+    """
+    pairs = list(pairs)
+    results = [None] * len(pairs)
+    groups = {}
+    for i, (left, right) in enumerate(pairs):
+        key, larrays = _arrays(left)
+        if key is not None and len(left) == len(right):
+            rkey, rarrays = _arrays(right)
+            if key == rkey:
+                groups.setdefault(key, []).append((i, larrays, rarrays))
+                continue
+        results[i] = df_compare(left, right, rtol=rtol, atol=atol)
+    for members in groups.values():
+        lefts, rights = [[np.concatenate(arrays) for arrays in zip(*[member[side] for member in members])]
+                         for side in (1, 2)]
+        # The index values, then every column.
+        differ = np.asarray(lefts[0] != rights[0], dtype=bool)
+        for left, right in zip(lefts[1:], rights[1:]):
+            differ |= _rows_differ(left, right, rtol, atol)
+        starts = np.cumsum([0] + [len(member[1][0]) for member in members[:-1]])
+        for (i, _, _), failed in zip(members, np.logical_or.reduceat(differ, starts)):
+            results[i] = df_compare(*pairs[i], rtol=rtol, atol=atol) if failed \
+                else (True, 'DataFrame contents are equivalent')
+    return results
@@ -0,0 +1,160 @@
+"""Column-level deltas between two versions of a DataFrame.
+
+diff() describes how a new version of a frame differs from an old one, and
+patch() applies that description to the old version to get the new one:
+
+    delta = diff(yesterday, today)
+    assert_(df_compare(patch(yesterday, delta), today))
+
+A delta is a dict of numpy and pandas objects, which encodes with
+pdutils.serialize.json.encode() like any other:
+
+    {"format": "pdutils.delta", "version": 1, "base_shape": [rows, columns],
+     "columns": [...], "removed_columns": [...], "removed_rows": Index,
+     "rows": DataFrame, "changes": [[name, change], ...], "index": Index or None}
+
+Rows are matched by index value, so both versions must have unique index
+values. "removed_rows" holds the index values of the rows dropped and "rows"
+the rows added, in full. "changes" holds the columns that changed in the rows
+the versions have in common, in the order of the old version: either
+{"values": ...}, every value of a column added or replaced, or
+{"ranges": [[start, stop], ...], "values": ...}, the new values of the runs of
+rows that changed. "columns" is the order of the columns of the new version,
+and "index" its index if the rows are not in the order the others give (the
+rows kept in their old order, then the rows added).
+
+Only what changed is stored, so a chain of daily deltas of a frame whose
+columns mostly stay the same costs a fraction of the daily snapshots, and
+patching the old version in memory is much faster than decoding the new one.
+"""
+import numpy as np
+import pandas as pd
+
+from pdutils.compare import ndarray_compare
+from pdutils.serialize.json import _values
+
+FORMAT = 'pdutils.delta'
+VERSION = 1
+
+
+def _changed(before, after, rtol, atol):
+    """Returns the mask of the values of `after` that differ from `before`, or None if their dtypes differ.
+
+    NaN (or missing) values equal each other.
+    """
+    if before.dtype != after.dtype:
+        return None
+    if isinstance(before, np.ndarray):
+        if ndarray_compare(before, after, rtol=rtol, atol=atol)[0]:
+            return np.zeros(len(after), dtype=bool)
+        if before.dtype.kind in 'fc':
+            return ~np.isclose(before, after, rtol=rtol, atol=atol, equal_nan=True)
+    equal = before == after
+    if not isinstance(equal, np.ndarray):
+        # The boolean arrays of nullable dtypes, which are missing where either value is.
+        equal = equal.to_numpy(dtype=bool, na_value=False)
+    return ~(equal | (pd.isna(before) & pd.isna(after)))
+
+
+def _ranges(mask):
+    """Returns the [start, stop) runs of the True values of `mask` as an (n, 2) int64 array."""
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.column_stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)]).astype(np.int64)
+
+
+def _positions(ranges):
+    """Returns the positions within the [start, stop) runs of `ranges`, in order."""
+    starts, stops = ranges[:, 0], ranges[:, 1]
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def diff(old, new, rtol=0., atol=0.):
+    """Returns the delta that patch() turns DataFrame `old` into DataFrame `new` with.
+
+    Parameters
+    ----------
+    old : pandas.DataFrame
+        The old version of the frame, with unique index values.
+
+    new : pandas.DataFrame
+        The new version of the frame, with unique index values.
+
+    rtol : float
+        The relative tolerance within which floating point values are taken
+        to be unchanged, as for pdutils.compare.ndarray_compare(). (optional)
+        Default: 0. (any change is recorded)
+
+    atol : float
+        The absolute tolerance within which floating point values are taken
+        to be unchanged. (optional)
+        Default: 0.
+
+    Returns
+    -------
+    delta : dict
+        The delta (see the module docstring).
+    """
+    for frame in (old, new):
+        if not frame.index.is_unique:
+            raise ValueError('frames can only be diffed when their index values are unique')
+    in_new = old.index.isin(new.index)
+    in_old = new.index.isin(old.index)
+    kept = new[in_old]
+    base_index = old.index[in_new]
+    if not kept.index.equals(base_index):
+        kept = kept.reindex(base_index)
+    rows = new[~in_old]
+    order = base_index.append(rows.index)
+    index = None if order.equals(new.index) and order.names == new.index.names else new.index
+    changes = []
+    for name in new.columns:
+        after = _values(kept[name])
+        mask = None
+        if name in old.columns:
+            before = _values(old[name])
+            mask = _changed(before if in_new.all() else before[in_new], after, rtol, atol)
+        if mask is None or 2 * mask.sum() > len(mask):
+            changes.append([name, {'values': after}])
+        elif mask.any():
+            changes.append([name, {'ranges': _ranges(mask), 'values': after[mask]}])
+    return {'format': FORMAT, 'version': VERSION, 'base_shape': list(old.shape), 'columns': list(new.columns),
+            'removed_columns': [name for name in old.columns if name not in new.columns],
+            'removed_rows': old.index[~in_new], 'rows': rows, 'changes': changes, 'index': index}
+
+
+def patch(base, delta):
+    """Returns DataFrame `base` with `delta` (as returned by diff()) applied to it.
+
+    The columns that didn't change are taken from `base` as they are.
+    `base` itself is left unchanged.
+    """
+    if not isinstance(delta, dict) or delta.get('format') != FORMAT:
+        raise ValueError('not a frame delta')
+    if delta['version'] > VERSION:
+        raise ValueError('frame delta version %s is not supported' % delta['version'])
+    if list(base.shape) != list(delta['base_shape']):
+        raise ValueError('the delta applies to a frame of shape %s, not %s'
+                         % (tuple(delta['base_shape']), base.shape))
+    kept = base[~base.index.isin(delta['removed_rows'])] if len(delta['removed_rows']) else base
+    changes = dict((name, change) for name, change in delta['changes'])
+    data = {}
+    for name in delta['columns']:
+        change = changes.get(name)
+        if change is None:
+            data[name] = _values(kept[name])
+        elif 'ranges' in change:
+            values = _values(kept[name]).copy()
+            values[_positions(np.asarray(change['ranges']))] = change['values']
+            data[name] = values
+        else:
+            data[name] = change['values']
+    result = pd.DataFrame(data, index=kept.index, columns=delta['columns'])
+    if len(delta['rows']):
+        result = pd.concat([result, delta['rows'][delta['columns']]])
+        # Without an index in the delta the names are those of the rows kept, whatever the rows added have.
+        result.index.names = kept.index.names
+    if delta['index'] is not None:
+        result = result.reindex(delta['index'])
+    return result
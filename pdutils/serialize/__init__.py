@@ -1 +1,19 @@
+"""Serialising numpy arrays and pandas objects.
 
+The submodules are imported on first use, e.g. pdutils.serialize.json is
+imported (along with pandas and jsonpickle) when it is first referred to as
+an attribute of this package.
+"""
+import importlib
+
+_SUBMODULES = ('aio', 'binary', 'codecs', 'files', 'json', 'store')
+
+
+def __getattr__(name):
+    if name not in _SUBMODULES:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    return importlib.import_module('%s.%s' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -0,0 +1,323 @@
+"""Saving and loading frame files from asyncio code without blocking the event loop.
+
+save() and load() read and write the frame files of pdutils.serialize.files
+in stages: the columns of a frame are encoded (or decoded) one at a time in
+an executor, while the payloads already encoded are written to the file (or
+the next ones read from it) by a second task, through a bounded queue. The
+CPU work of one column therefore overlaps the I/O of the next, and at most
+`queue_size` encoded columns are held in memory at any time.
+
+Both functions report progress per column and can be cancelled like any
+other coroutine. A cancelled save() leaves the file at `path` as it was.
+"""
+import asyncio
+import os
+import shutil
+
+import pandas as pd
+from jsonpickle import tags
+
+from pdutils.serialize.files import TREE_ROWS, _Body, _Copied, _begin, _entry, _complete, _kind, _pickler, \
+    _read_body, _read_header, _split_trees, _verify
+from pdutils.serialize.json import Pickler, Unpickler, decode, _chunk_spans, _concat, _encode_columns, \
+    _flatten_value, _index_bounds, _restore_value, _values
+
+#: The bytes reserved for the header line of a file before its body is written, per column and chunk.
+_HEADER_BYTES = 1024
+_ENTRY_BYTES = 256
+_CHUNK_BYTES = 48
+
+
+def _encode(context, values, spans, name=None, column=False):
+    """Returns the payload of the values of a column (or index) as a _Copied, chunked as per `spans`.
+
+    `column` is True for the values of DataFrame column `name`, whose codec
+    may be chosen by name, and False for the index or a TimeSeries.
+    """
+    chunks = [values] if spans is None else [values[start:stop] for start, stop in spans]
+    if column:
+        _encode_columns(context, [(name, chunk) for chunk in chunks])
+    piece = _Body(context.backend)
+    if spans is None:
+        extents = [piece.fragment(_flatten_value(context, values))]
+    else:
+        _, extents = piece.sequence(chunks, lambda chunk: piece.fragment(_flatten_value(context, chunk)))
+    return _Copied(b''.join(piece.parts), extents)
+
+
+def _reserve(context, names, spans):
+    """Returns the bytes to leave for the header line of a file, which is written once the body is."""
+    chunks = len(spans) if spans else 1
+    size = sum(len(context.backend.encode(Pickler().flatten(name))) for name in names)
+    size += _HEADER_BYTES + (len(names) + 1) * (_ENTRY_BYTES + chunks * _CHUNK_BYTES)
+    return -(-size // 4096) * 4096
+
+
+class _Writer(object):
+    """Writes the parts of a body taken from a bounded queue to a file, in an executor."""
+
+    def __init__(self, loop, executor, f, queue_size, progress, total):
+        self.loop = loop
+        self.executor = executor
+        self.f = f
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.progress = progress
+        self.total = total
+        self.written = 0
+        self.error = None
+        #: The write handed to the executor last, which goes on in its thread even if run() is cancelled.
+        self.pending = None
+
+    async def put(self, body, name=None, column=False):
+        """Queues the parts of `body` written so far, which complete column `name` if `column` is True."""
+        if self.error is not None:
+            raise self.error
+        data = b''.join(body.parts)
+        body.parts = []
+        await self.queue.put((data, name, column))
+
+    async def run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            data, name, column = item
+            if self.error is not None:
+                # Keep taking parts, so that the producer never blocks on a full queue.
+                continue
+            try:
+                self.pending = self.loop.run_in_executor(self.executor, self.f.write, data)
+                await asyncio.shield(self.pending)
+            except Exception as e:
+                self.error = e
+                continue
+            if column:
+                self.written += 1
+                if self.progress is not None:
+                    self.progress(name, self.written, self.total)
+        if self.error is not None:
+            raise self.error
+
+
+def _write_header(f, tmp, reserve, header, backend):
+    """Writes the header line of a file whose body starts `reserve` bytes into `tmp`.
+
+    The header is padded with spaces to fill the bytes reserved, or if it is
+    longer the file is written again with the header first.
+    """
+    line = backend.encode(header).encode('utf-8')
+    if len(line) < reserve:
+        f.seek(0)
+        f.write(line + b' ' * (reserve - len(line) - 1) + b'\n')
+        f.close()
+        return tmp
+    f.close()
+    moved = tmp + '.header'
+    with open(moved, 'wb') as out, open(tmp, 'rb') as body:
+        out.write(line + b'\n')
+        body.seek(reserve)
+        shutil.copyfileobj(body, out)
+    os.remove(tmp)
+    return moved
+
+
+async def save(obj, path, progress=None, executor=None, queue_size=4, tree_rows=TREE_ROWS, **options):
+    """Writes DataFrame or TimeSeries `obj` to a frame file at `path`, like pdutils.serialize.files.save().
+
+    Parameters
+    ----------
+    obj : pandas.DataFrame or pandas.TimeSeries
+        The object to write.
+
+    path : str
+        The frame file to write, which is only replaced once it is complete.
+
+    progress : callable
+        Called as progress(name, done, total) on the event loop once the
+        payload of each column (or of the values of a TimeSeries) is
+        written. (optional)
+
+    executor : concurrent.futures.Executor
+        The executor encoding columns and writing to the file. (optional)
+        Default: None (the default executor of the event loop)
+
+    queue_size : int
+        The most encoded columns waiting to be written at any time. (optional)
+        Default: 4
+
+    tree_rows : int
+        The rows hashed by each leaf of the Merkle trees of the columns, as
+        for pdutils.serialize.files.save(). (optional)
+
+    **options
+        The encoding options of pdutils.serialize.files.save(). Any other
+        option raises TypeError.
+    """
+    kind = _kind(obj)
+    loop = asyncio.get_running_loop()
+    context = _pickler(options)
+    body = _Body(context.backend)
+    if kind == 'DataFrame':
+        # The values of every column are taken up front, a frame changed meanwhile won't mix its versions.
+        names, columns = list(obj.columns), [_values(obj[name]) for name in obj.columns]
+        # The checksums are those of the numpy values, as in pdutils.serialize.files.
+        checked = [obj[name].values for name in obj.columns]
+        spans = _chunk_spans(len(obj), context.chunk_rows)
+        cls = pd.DataFrame
+    else:
+        names, columns, checked, spans, cls = [obj.name], [_values(obj)], [obj.values], None, type(obj)
+    index, checked_index = obj.index, obj.index.values
+    tmp = path + '.tmp'
+    reserve = _reserve(context, names, spans)
+    f = open(tmp, 'wb')
+    writer = _Writer(loop, executor, f, queue_size, progress, len(names))
+    task = asyncio.ensure_future(writer.run())
+    finishing = None
+    try:
+        f.seek(reserve)
+        doc = {tags.OBJECT: '%s.%s' % (type(obj).__module__, type(obj).__name__),
+               '__reduce__': (context.flatten(cls, reset=False), None)}
+        labels = _flatten_value(context, obj.columns.values) if kind == 'DataFrame' else None
+        _begin(body, doc)
+        extents = []
+        if kind == 'DataFrame':
+            body.write('[')
+        for i, (name, values) in enumerate(zip(names, columns)):
+            payload = await loop.run_in_executor(executor, _encode, context, values, spans, name,
+                                                 kind == 'DataFrame')
+            if i:
+                body.write(', ')
+            extents.append(body.copy(payload))
+            await writer.put(body, name, True)
+        if kind == 'DataFrame':
+            body.write(']')
+        body.write(', ')
+        index_extent = body.copy(await loop.run_in_executor(executor, _encode, context, index, spans))
+        header = {'spans': spans or [[0, len(obj)]]}
+        if kind == 'DataFrame':
+            body.write(', ')
+            header['labels'] = body.fragment(labels)
+        else:
+            body.write(', ')
+            body.fragment(context.flatten(obj.name, reset=False))
+        if spans is not None:
+            bounds = await loop.run_in_executor(executor, _index_bounds, _values(index), spans)
+            if bounds is not None:
+                bounds = [_flatten_value(context, bound) for bound in bounds]
+            body.write(', ')
+            header['layout'] = body.fragment({'spans': spans, 'min': bounds and bounds[0],
+                                              'max': bounds and bounds[1]})
+        body.write(']]}')
+        await writer.put(body)
+        await writer.queue.put(None)
+        await task
+
+        def entries():
+            header['columns'] = [_entry(name, values, extent, chunks, tree_rows)
+                                 for name, values, (extent, chunks) in zip(names, checked, extents)]
+            header['index'] = _entry(obj.index.name, checked_index, *index_extent, tree_rows=tree_rows)
+            if tree_rows is not None:
+                header['tree_rows'] = tree_rows
+            _complete(header, obj, kind)
+            _split_trees(header, body)
+            f.write(b''.join(body.parts))
+            return _write_header(f, tmp, reserve, header, context.backend)
+
+        finishing = loop.run_in_executor(executor, entries)
+        written = await asyncio.shield(finishing)
+        os.replace(written, path)
+    except BaseException:
+        task.cancel()
+        # The file is only closed and removed once the writes already in the executor's threads are done.
+        pending = [future for future in (writer.pending, finishing) if future is not None and not future.done()]
+        if pending:
+            await asyncio.wait(pending)
+        f.close()
+        for name in (tmp, tmp + '.header'):
+            if os.path.exists(name):
+                os.remove(name)
+        raise
+
+
+def _read(f, start, extents):
+    """Returns the bytes of the fragments of a file at `extents`."""
+    parts = []
+    for offset, size in extents:
+        f.seek(start + offset)
+        parts.append(f.read(size))
+    return parts
+
+
+def _restore(unpickler, parts):
+    """Restores the values of a column (or index) from the bytes of its chunks."""
+    return _concat([_restore_value(unpickler, unpickler.backend.decode(part.decode('utf-8'))) for part in parts])
+
+
+async def _read_ahead(loop, executor, f, start, jobs, queue):
+    """Reads the fragments of (name, extents) `jobs` in turn into `queue`, followed by None."""
+    for name, extents in jobs:
+        await queue.put((name, await loop.run_in_executor(executor, _read, f, start, extents)))
+    await queue.put(None)
+
+
+async def load(path, columns=None, progress=None, executor=None, queue_size=4, verify=False, workers=None):
+    """Returns the DataFrame or TimeSeries in the frame file at `path`, like pdutils.serialize.files.load().
+
+    The payloads of the columns are read ahead, through a bounded queue,
+    while the ones read already are decoded. See save() for `progress`,
+    `executor` and `queue_size`.
+
+    Parameters
+    ----------
+    columns : list
+        The columns of a DataFrame to load. (optional)
+        Default: None (every column)
+
+    verify : bool
+        If True the columns loaded and the index are checked against the
+        checksums they were written with, raising
+        pdutils.serialize.files.ChecksumError if they don't match. (optional)
+        Default: False
+
+    workers : int
+        The number of threads decoding the chunks of a column. (optional)
+    """
+    loop = asyncio.get_running_loop()
+    with open(path, 'rb') as f:
+        header = await loop.run_in_executor(executor, _read_header, f)
+        start = f.tell()
+        if header['kind'] != 'DataFrame':
+            body = await loop.run_in_executor(executor, _read_body, f, header)
+            obj = await loop.run_in_executor(executor, lambda: decode(body.decode('utf-8'), workers=workers))
+            if progress is not None:
+                progress(obj.name, 1, 1)
+        else:
+            unpickler = Unpickler(workers=workers)
+            labels = await loop.run_in_executor(executor, _read, f, start, [header['labels']])
+            labels = list(_restore(unpickler, labels))
+            selected = labels if columns is None else list(columns)
+            missing = [name for name in selected if name not in labels]
+            if missing:
+                raise KeyError('columns not in the frame: %s' % missing)
+            jobs = [(name, header['columns'][labels.index(name)]['chunks']) for name in selected]
+            jobs.append((None, header['index']['chunks']))
+            queue = asyncio.Queue(maxsize=queue_size)
+            reader = asyncio.ensure_future(_read_ahead(loop, executor, f, start, jobs, queue))
+            try:
+                values = []
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    name, parts = item
+                    values.append(await loop.run_in_executor(executor, _restore, unpickler, parts))
+                    if len(values) <= len(selected) and progress is not None:
+                        progress(name, len(values), len(selected))
+                await reader
+            finally:
+                reader.cancel()
+            index = values.pop()
+            obj = pd.DataFrame(dict(zip(selected, values)), index=index, columns=selected)
+    if verify:
+        await loop.run_in_executor(executor, _verify, header, obj, path)
+    return obj
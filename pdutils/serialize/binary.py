@@ -0,0 +1,302 @@
+"""A binary container format for numpy arrays, pandas objects and containers of them.
+
+The format is a sibling of the JSON documents of pdutils.serialize.json for
+large numeric data: array memory is stored as it is rather than as base64, and
+aligned so that arrays read from a file are memory-mapped rather than copied.
+A container is laid out as
+
+    magic     8 bytes  b'PDUTILS\\x00'
+    header   24 bytes  little endian uint16 version, uint16 flags (0),
+                       uint32 reserved (0), uint64 index offset, uint64 index size
+    sections           the memory of every array, each section starting at a
+                       multiple of ALIGNMENT bytes
+    index              a JSON description of the object stored, referring to
+                       the sections by number, and the [offset, size] of every
+                       section
+
+Object arrays, column and index names and values of other types are flattened
+into the index by jsonpickle. The index of a Series or DataFrame is described
+with its class, name and freq; tz-aware datetime and period values with their
+time zone and frequency, the nullable integer, boolean and float values with
+the mask of the missing ones and intervals with their ends and closed side.
+Values of other pandas extension types can't be stored and raise TypeError.
+"""
+import mmap
+import struct
+
+import numpy as np
+import pandas as pd
+
+import jsonpickle
+import jsonpickle.pickler
+import jsonpickle.unpickler
+
+from pdutils.serialize.json import _restore_items, _values
+
+MAGIC = b'PDUTILS\x00'
+VERSION = 1
+#: The alignment of every section, which suits the widest SIMD loads.
+ALIGNMENT = 64
+
+_HEADER = struct.Struct('<8sHHIQQ')
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _class_name(cls):
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+class _Writer(object):
+    """Lays out an object as an index and the array sections it refers to."""
+
+    def __init__(self):
+        #: The arrays written, in section order, and where each section goes.
+        self.arrays = []
+        self.extents = []
+        #: Maps id(ndarray) to its section, so an array referred to twice is written once.
+        self.sections = {}
+        self.end = _aligned(_HEADER.size)
+
+    def section(self, arr):
+        if id(arr) not in self.sections:
+            self.sections[id(arr)] = len(self.arrays)
+            self.arrays.append(arr)
+            self.extents.append([self.end, arr.nbytes])
+            self.end = _aligned(self.end + arr.nbytes)
+        return self.sections[id(arr)]
+
+    def array(self, arr):
+        node = {'type': 'ndarray', 'shape': list(arr.shape)}
+        if arr.dtype.hasobject:
+            node.update(dtype='object', items=jsonpickle.pickler.Pickler().flatten(arr.ravel().tolist()))
+            return node
+        if not arr.flags.c_contiguous and not arr.flags.f_contiguous:
+            arr = np.ascontiguousarray(arr)
+        order = 'C' if arr.flags.c_contiguous else 'F'
+        node.update(dtype=arr.dtype.str, order=order, section=self.section(arr))
+        return node
+
+    def values(self, values):
+        """Returns the node of the values of a column or index, a numpy or pandas extension array."""
+        if isinstance(values, (np.ndarray, pd.Categorical)):
+            return self.node(values)
+        if isinstance(values, pd.arrays.DatetimeArray) and values.tz is not None:
+            return {'type': 'DatetimeTZArray', 'values': self.array(values.asi8.view('M8[ns]')),
+                    'tz': str(values.tz)}
+        if isinstance(values, pd.arrays.PeriodArray):
+            return {'type': 'PeriodArray', 'ordinals': self.array(values.asi8), 'freq': values.freq.freqstr}
+        if isinstance(values, (pd.arrays.IntegerArray, pd.arrays.BooleanArray, pd.arrays.FloatingArray)):
+            dtype = values.dtype.numpy_dtype
+            return {'type': 'MaskedArray', 'class': _class_name(type(values)),
+                    'values': self.array(values.to_numpy(dtype=dtype, na_value=dtype.type(0))),
+                    'mask': self.array(np.asarray(values.isna()))}
+        if isinstance(values, pd.arrays.IntervalArray):
+            return {'type': 'IntervalArray', 'left': self.values(_values(values.left)),
+                    'right': self.values(_values(values.right)), 'closed': values.closed}
+        raise TypeError('binary containers can not store values of dtype %s' % values.dtype)
+
+    def index(self, index):
+        node = {'type': 'Index', 'class': _class_name(type(index))}
+        if isinstance(index, pd.MultiIndex):
+            node.update(levels=[self.index(level) for level in index.levels],
+                        codes=[self.array(np.asarray(codes)) for codes in index.codes],
+                        names=jsonpickle.pickler.Pickler().flatten(list(index.names)))
+            return node
+        node['name'] = jsonpickle.pickler.Pickler().flatten(index.name)
+        if isinstance(index, pd.RangeIndex):
+            node['range'] = [int(index.start), int(index.stop), int(index.step)]
+            return node
+        node['values'] = self.values(_values(index))
+        if getattr(index, 'freq', None) is not None:
+            node['freq'] = index.freqstr
+        return node
+
+    def node(self, obj):
+        if isinstance(obj, np.ndarray):
+            return self.array(obj)
+        if isinstance(obj, pd.DataFrame):
+            return {'type': 'DataFrame', 'class': _class_name(type(obj)),
+                    'columns': [self.values(_values(obj.iloc[:, i])) for i in range(obj.shape[1])],
+                    'labels': self.node(obj.columns.values), 'index': self.index(obj.index)}
+        if isinstance(obj, pd.Series):
+            return {'type': 'Series', 'class': _class_name(type(obj)), 'values': self.values(_values(obj)),
+                    'index': self.index(obj.index), 'name': self.node(obj.name)}
+        if isinstance(obj, pd.Index):
+            return self.index(obj)
+        if isinstance(obj, pd.Categorical):
+            return {'type': 'Categorical', 'codes': self.node(np.asarray(obj.codes)),
+                    'categories': self.node(obj.categories.values), 'ordered': bool(obj.ordered)}
+        if isinstance(obj, pd.api.extensions.ExtensionArray):
+            return self.values(obj)
+        if isinstance(obj, (tuple, list)):
+            return {'type': type(obj).__name__, 'items': [self.node(item) for item in obj]}
+        if isinstance(obj, dict):
+            return {'type': 'dict', 'items': [[self.node(key), self.node(value)] for key, value in obj.items()]}
+        return {'type': 'object', 'value': jsonpickle.pickler.Pickler().flatten(obj)}
+
+
+class _Reader(object):
+    """Restores an object from the index and sections of a container in `buffer`."""
+
+    def __init__(self, buffer, extents, copy=False):
+        self.buffer = buffer
+        self.extents = extents
+        #: Passed on to the DataFrame and Series constructors, False keeping the columns views of `buffer`.
+        self.copy = copy
+
+    def array(self, node):
+        dtype = np.dtype(node['dtype'])
+        shape = tuple(node['shape'])
+        if 'items' in node:
+            items = jsonpickle.unpickler.Unpickler().restore(node['items'])
+            return _restore_items(items, shape, dtype)
+        offset, size = self.extents[node['section']]
+        arr = np.frombuffer(self.buffer, dtype=dtype, count=size // dtype.itemsize if dtype.itemsize else 0,
+                            offset=offset)
+        return arr.reshape(shape, order=node['order'])
+
+    def index(self, node):
+        restore = jsonpickle.unpickler.Unpickler().restore
+        if 'levels' in node:
+            return pd.MultiIndex(levels=[self.index(level) for level in node['levels']],
+                                 codes=[self.array(codes) for codes in node['codes']],
+                                 names=restore(node['names']))
+        name = restore(node['name'])
+        if 'range' in node:
+            return pd.RangeIndex(*node['range'], name=name)
+        values = self.node(node['values'])
+        if 'freq' in node:
+            return jsonpickle.unpickler.loadclass(node['class'])(values, freq=node['freq'], name=name)
+        return pd.Index(values, dtype=values.dtype, name=name)
+
+    def node(self, node):
+        kind = node['type']
+        if kind == 'ndarray':
+            return self.array(node)
+        if kind == 'Index':
+            return self.index(node)
+        if kind == 'DatetimeTZArray':
+            return pd.arrays.DatetimeArray(self.node(node['values']), dtype=pd.DatetimeTZDtype(tz=node['tz']))
+        if kind == 'PeriodArray':
+            return pd.arrays.PeriodArray(self.node(node['ordinals']), freq=node['freq'])
+        if kind == 'MaskedArray':
+            cls = jsonpickle.unpickler.loadclass(node['class'])
+            return cls(self.node(node['values']), self.node(node['mask']), copy=False)
+        if kind == 'IntervalArray':
+            return pd.arrays.IntervalArray.from_arrays(self.node(node['left']), self.node(node['right']),
+                                                       closed=node['closed'])
+        if kind == 'DataFrame':
+            cls = jsonpickle.unpickler.loadclass(node['class'])
+            labels = self.node(node['labels'])
+            columns = [self.node(column) for column in node['columns']]
+            return cls(dict(zip(labels, columns)), index=self.node(node['index']), columns=labels,
+                       copy=self.copy)
+        if kind == 'Series':
+            cls = jsonpickle.unpickler.loadclass(node['class'])
+            return cls(self.node(node['values']), index=self.node(node['index']), name=self.node(node['name']),
+                       copy=self.copy)
+        if kind == 'Categorical':
+            return pd.Categorical.from_codes(self.node(node['codes']), self.node(node['categories']),
+                                             ordered=node['ordered'])
+        if kind == 'tuple':
+            return tuple(self.node(item) for item in node['items'])
+        if kind == 'list':
+            return [self.node(item) for item in node['items']]
+        if kind == 'dict':
+            return dict((self.node(key), self.node(value)) for key, value in node['items'])
+        if kind == 'object':
+            return jsonpickle.unpickler.Unpickler().restore(node['value'])
+        raise ValueError('unknown node type in container: %r' % kind)
+
+
+def _layout(obj):
+    """Returns the header, the arrays to write and the index of a container for `obj`."""
+    writer = _Writer()
+    root = writer.node(obj)
+    index = jsonpickle.json.encode({'root': root, 'sections': writer.extents}).encode('utf-8')
+    header = _HEADER.pack(MAGIC, VERSION, 0, 0, writer.end, len(index))
+    return header, writer, index
+
+
+def _write(f, layout):
+    header, writer, index = layout
+    f.write(header)
+    position = len(header)
+    for arr, (offset, size) in zip(writer.arrays, writer.extents):
+        f.write(b'\0' * (offset - position))
+        f.write(memoryview(arr.ravel(order='K').view(np.uint8)))
+        position = offset + size
+    f.write(b'\0' * (writer.end - position))
+    f.write(index)
+
+
+def _read(buffer, copy=False):
+    if len(buffer) < _HEADER.size:
+        raise ValueError('not a pdutils binary container')
+    magic, version, _, _, offset, size = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError('not a pdutils binary container')
+    if version > VERSION:
+        raise ValueError('binary container version %s is not supported' % version)
+    index = jsonpickle.json.decode(bytes(buffer[offset:offset + size]).decode('utf-8'))
+    return _Reader(buffer, index['sections'], copy).node(index['root'])
+
+
+class _Buffer(object):
+    """Accumulates written bytes in a list, for dumps()."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+
+
+def dumps(obj):
+    """Returns the binary container of `obj` as bytes.
+
+    `obj` is a numpy array, a pandas Series/TimeSeries, DataFrame, Index or
+    Categorical, or a tuple, list or dict of them.
+    """
+    buf = _Buffer()
+    _write(buf, _layout(obj))
+    return b''.join(buf.parts)
+
+
+def loads(data):
+    """Returns the object in binary container `data`.
+
+    The arrays restored, and the columns of the Series and DataFrames, are
+    read-only views of `data`, which is not copied.
+    """
+    return _read(data)
+
+
+def save(obj, path):
+    """Writes the binary container of `obj` (see dumps()) to a file at `path`."""
+    with open(path, 'wb') as f:
+        _write(f, _layout(obj))
+
+
+def load(path, mmap_mode=True):
+    """Returns the object in the binary container at `path`.
+
+    Parameters
+    ----------
+    path : str
+        The file written by save().
+
+    mmap_mode : bool
+        If True the file is memory-mapped and the arrays restored are
+        read-only views of the mapping, paged in as they are used. The file
+        is then unmapped once nothing refers to the arrays any more. If
+        False the file is read into memory first. (optional)
+        Default: True
+    """
+    with open(path, 'rb') as f:
+        if not mmap_mode:
+            return _read(f.read())
+        return _read(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
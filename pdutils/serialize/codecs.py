@@ -0,0 +1,458 @@
+"""Compression codecs for the raw array buffers written by pdutils.serialize.
+
+A codec specification is a string naming one or more registered codecs joined
+by '+', e.g. 'zlib' or 'shuffle+lzma'. Codecs are applied left to right on
+encode and right to left on decode. Every codec transforms bytes to bytes and
+is given the dtype of the array the bytes came from.
+
+The pseudo-codec 'auto' (e.g. 'auto+zlib') picks whichever of the codecs
+marked as automatic makes the buffer smallest, or none of them if none saves
+space. The codec actually chosen is what gets recorded.
+"""
+
+import bz2
+import lzma
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+
+#: dtype kinds of fixed width numeric data (bool, int, uint, float, complex, timedelta, datetime).
+NUMERIC_KINDS = 'biufcmM'
+
+#: dtype kinds stored as integers (int, uint, timedelta, datetime).
+INTEGER_KINDS = 'iumM'
+
+#: The name of the pseudo-codec that selects an automatic codec per buffer.
+AUTO = 'auto'
+
+_CODECS = {}
+
+
+class Codec(object):
+    """Base class for a reversible transform of an array's raw bytes."""
+
+    #: The name used to select the codec in a codec specification.
+    name = None
+
+    #: The dtype kinds the codec applies to, it is silently skipped for all
+    #: others. None means all dtypes.
+    kinds = None
+
+    #: If True the codec is a candidate for the 'auto' pseudo-codec.
+    auto = False
+
+    def applies(self, dtype):
+        """Returns True if the codec can encode items of `dtype`."""
+        return self.kinds is None or dtype.kind in self.kinds
+
+    def accepts(self, buf, dtype):
+        """Returns True if the codec is worth trying on `buf` during automatic selection.
+
+        This should be much cheaper than encode(), it just rules out buffers
+        the codec cannot possibly shrink.
+        """
+        return True
+
+    def encode(self, buf, dtype):
+        """Returns the encoded form of bytes `buf` holding items of `dtype`."""
+        raise NotImplementedError('You must implement encode() in %s' % self.__class__)
+
+    def decode(self, buf, dtype):
+        """Returns the original bytes for encoded bytes `buf` holding items of `dtype`."""
+        raise NotImplementedError('You must implement decode() in %s' % self.__class__)
+
+
+class ShuffleCodec(Codec):
+    """A byte-shuffle pre-filter.
+
+    Groups the first byte of every item together, followed by the second byte
+    of every item and so on. Neighbouring numeric values usually share their
+    high order bytes, so the shuffled buffer compresses far better.
+    """
+    name = 'shuffle'
+    kinds = NUMERIC_KINDS
+
+    def encode(self, buf, dtype):
+        itemsize = dtype.itemsize
+        if itemsize <= 1 or len(buf) % itemsize:
+            return bytes(buf)
+        return np.frombuffer(buf, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+    def decode(self, buf, dtype):
+        itemsize = dtype.itemsize
+        if itemsize <= 1 or len(buf) % itemsize:
+            return bytes(buf)
+        return np.frombuffer(buf, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def _integer_view(dtype):
+    """Returns the integer dtype with the same size and byte order as `dtype`."""
+    return np.dtype('%s%s%d' % (dtype.str[0], 'u' if dtype.kind == 'u' else 'i', dtype.itemsize))
+
+
+def zigzag_varint_encode(values):
+    """Returns int64 `values` as zigzag encoded LEB128 varint bytes.
+
+    Small magnitudes of either sign take a single byte. The work is done one
+    byte position at a time over the whole array, never per element.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    zigzag = ((values << 1) ^ (values >> 63)).view(np.uint64)
+    sizes = np.ones(len(zigzag), dtype=np.int64)
+    for k in range(1, 10):
+        sizes += zigzag >= np.uint64(1 << (7 * k))
+    starts = np.cumsum(sizes) - sizes
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for k in range(int(sizes.max()) if len(sizes) else 0):
+        mask = sizes > k
+        septet = (zigzag[mask] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = np.where(sizes[mask] > k + 1, 0x80, 0).astype(np.uint64)
+        out[starts[mask] + k] = (septet | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def zigzag_varint_decode(buf):
+    """Reverses zigzag_varint_encode(), returning an int64 array."""
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    sizes = ends - starts + 1
+    zigzag = np.zeros(len(ends), dtype=np.uint64)
+    for k in range(int(sizes.max()) if len(sizes) else 0):
+        mask = sizes > k
+        septet = (data[starts[mask] + k] & 0x7f).astype(np.uint64)
+        zigzag[mask] |= septet << np.uint64(7 * k)
+    return ((zigzag >> np.uint64(1)) ^ (np.uint64(0) - (zigzag & np.uint64(1)))).view(np.int64)
+
+
+class DeltaCodec(Codec):
+    """Delta encoding for integer and datetime data, stored as zigzag varints.
+
+    With `order` 1 successive differences are stored, with `order` 2 the
+    differences of the differences (delta-of-delta), which are mostly zero
+    for a sequence with a nearly constant step. Arithmetic wraps around in
+    int64 so any input round trips exactly.
+    """
+    kinds = INTEGER_KINDS
+    auto = True
+
+    def __init__(self, order=1):
+        self.order = order
+        self.name = 'delta' if order == 1 else 'delta%d' % order
+
+    def accepts(self, buf, dtype):
+        values = np.frombuffer(buf, dtype=_integer_view(dtype))
+        diffs = np.diff(values.astype(np.int64))
+        return bool(np.all(diffs >= 0) or np.all(diffs <= 0))
+
+    def encode(self, buf, dtype):
+        values = np.frombuffer(buf, dtype=_integer_view(dtype)).astype(np.int64)
+        for _ in range(self.order):
+            values = np.concatenate([values[:1], np.diff(values)])
+        return zigzag_varint_encode(values)
+
+    def decode(self, buf, dtype):
+        values = zigzag_varint_decode(buf)
+        for _ in range(self.order):
+            values = np.cumsum(values, dtype=np.int64)
+        return values.astype(_integer_view(dtype)).tobytes()
+
+
+def _unsigned_view(dtype):
+    """Returns the unsigned integer dtype with the same size and byte order as `dtype`."""
+    return np.dtype('%su%d' % (dtype.str[0], dtype.itemsize))
+
+
+def _bit_length(values):
+    """Returns the number of significant bits in each of the uint64 `values`."""
+    # The float64 exponent is exact unless rounding to 53 bits carried into the
+    # next power of two, in which case the value is one bit shorter than that.
+    length = np.frexp(values.astype(np.float64))[1].astype(np.int64)
+    shift = np.maximum(length - 1, 0).astype(np.uint64)
+    return length - ((length > 0) & ((values >> shift) == 0))
+
+
+def _field_positions(widths):
+    """Returns the word index, bit offset within the word and width of every non-empty field."""
+    widths = np.asarray(widths, dtype=np.int64)
+    offsets = np.cumsum(widths) - widths
+    used = widths > 0
+    return used, offsets[used] >> 6, (offsets[used] & 63).astype(np.uint64), widths[used].astype(np.uint64)
+
+
+def pack_bits(values, widths):
+    """Packs the low `widths[i]` bits of each of the uint64 `values` into bytes.
+
+    Fields are written back to back, most significant bit first, and the last
+    byte is zero padded. Each field straddles at most two 64 bit words, so
+    the packing is a couple of shifts per field and a grouped sum per word.
+    """
+    used, word, bit, width = _field_positions(widths)
+    nbytes = -(-int(np.sum(widths)) // 8)
+    words = np.zeros(-(-nbytes // 8) + 1, dtype=np.uint64)
+    aligned = values[used] << (np.uint64(64) - width)
+    for index, part in (
+            (word, aligned >> bit),
+            (word + 1, np.where(bit > 0, aligned << ((np.uint64(64) - bit) & np.uint64(63)), np.uint64(0)))):
+        if len(index):
+            # Fields never share bits, so summing the parts that land in a word ORs them.
+            first = np.flatnonzero(np.diff(index, prepend=-1))
+            words[index[first]] += np.add.reduceat(part, first)
+    return words.astype('>u8').tobytes()[:nbytes]
+
+
+def unpack_bits(buf, widths):
+    """Reverses pack_bits(), returning a uint64 array with one value per width."""
+    used, word, bit, width = _field_positions(widths)
+    values = np.zeros(len(used), dtype=np.uint64)
+    padded = bytes(buf) + b'\0' * (16 - len(buf) % 8)
+    words = np.frombuffer(padded, dtype='>u8').astype(np.uint64)
+    high = words[word] << bit
+    low = np.where(bit > 0, words[word + 1] >> ((np.uint64(64) - bit) & np.uint64(63)), np.uint64(0))
+    values[used] = (high | low) >> (np.uint64(64) - width)
+    return values
+
+
+class XorCodec(Codec):
+    """Lossless compression of slowly changing floating point data.
+
+    In the style of Facebook's Gorilla, every value is XORed with its
+    predecessor; close values share their sign, exponent and leading mantissa
+    bits so the result is mostly zero bits. Rather than tracking a window
+    value by value, which cannot be vectorised, the values are split into
+    blocks of `block_size` and every block records a single window: the bits
+    between the fewest leading and fewest trailing zeros of any value in it.
+    The encoding is then
+
+    - a bitmap of which XORed values are non-zero,
+    - the trailing zero count and window width of every block,
+    - the window bits of every non-zero value, packed back to back.
+    """
+    name = 'xor'
+    kinds = 'f'
+
+    def __init__(self, block_size=64):
+        self.block_size = block_size
+
+    def applies(self, dtype):
+        return dtype.kind == 'f' and dtype.itemsize <= 8
+
+    def encode(self, buf, dtype):
+        values = np.frombuffer(buf, dtype=_unsigned_view(dtype)).astype(np.uint64)
+        size, block_size = len(values), self.block_size
+        xor = values.copy()
+        xor[1:] ^= values[:-1]
+        nonzero = xor != 0
+        lead = np.where(nonzero, 64 - _bit_length(xor), 64)
+        trail = np.where(nonzero, _bit_length(xor & (~xor + np.uint64(1))) - 1, 64)
+        starts = np.arange(0, size, block_size)
+        if size:
+            block_trail = np.minimum(np.minimum.reduceat(trail, starts), 63)
+            block_width = np.maximum(64 - np.minimum.reduceat(lead, starts) - block_trail, 0)
+        else:
+            block_trail = block_width = starts
+        widths = np.repeat(block_width, block_size)[:size] * nonzero
+        window = xor >> np.repeat(block_trail, block_size)[:size].astype(np.uint64)
+        return b''.join([
+            struct.pack('<QI', size, block_size),
+            np.packbits(nonzero).tobytes(),
+            block_trail.astype(np.uint8).tobytes(),
+            block_width.astype(np.uint8).tobytes(),
+            pack_bits(window, widths),
+        ])
+
+    def decode(self, buf, dtype):
+        buf = memoryview(buf)
+        size, block_size = struct.unpack_from('<QI', buf)
+        blocks = -(-size // block_size)
+        offset = struct.calcsize('<QI')
+        nonzero = np.unpackbits(np.frombuffer(buf, dtype=np.uint8, count=-(-size // 8), offset=offset))
+        nonzero = nonzero[:size].astype(bool)
+        offset += -(-size // 8)
+        block_trail = np.frombuffer(buf, dtype=np.uint8, count=blocks, offset=offset).astype(np.uint64)
+        offset += blocks
+        block_width = np.frombuffer(buf, dtype=np.uint8, count=blocks, offset=offset).astype(np.int64)
+        offset += blocks
+        widths = np.repeat(block_width, block_size)[:size] * nonzero
+        window = unpack_bits(buf[offset:], widths)
+        xor = window << np.repeat(block_trail, block_size)[:size]
+        return np.bitwise_xor.accumulate(xor).astype(_unsigned_view(dtype)).tobytes()
+
+
+class RleCodec(Codec):
+    """Run-length encoding for data with long runs of repeated values.
+
+    Runs are found by comparing the raw bit patterns of neighbouring items, so
+    a run of NaNs is detected even though NaN != NaN (and 0. and -0. are kept
+    apart). The encoding is the number of runs, the value of every run and the
+    run lengths as varints. During automatic selection the codec is only tried
+    if there are at most `max_run_ratio` runs per item.
+    """
+    name = 'rle'
+    kinds = NUMERIC_KINDS
+    auto = True
+
+    def __init__(self, max_run_ratio=0.25):
+        self.max_run_ratio = max_run_ratio
+
+    def applies(self, dtype):
+        return dtype.kind in self.kinds and dtype.itemsize in (1, 2, 4, 8)
+
+    def _run_starts(self, items):
+        return np.concatenate([[0], np.flatnonzero(np.diff(items) != 0) + 1]) if len(items) else np.arange(0)
+
+    def accepts(self, buf, dtype):
+        items = np.frombuffer(buf, dtype=_unsigned_view(dtype))
+        return len(self._run_starts(items)) <= self.max_run_ratio * len(items)
+
+    def encode(self, buf, dtype):
+        items = np.frombuffer(buf, dtype=_unsigned_view(dtype))
+        starts = self._run_starts(items)
+        lengths = np.diff(np.append(starts, len(items)))
+        return struct.pack('<Q', len(starts)) + items[starts].tobytes() + zigzag_varint_encode(lengths)
+
+    def decode(self, buf, dtype):
+        buf = memoryview(buf)
+        runs, = struct.unpack_from('<Q', buf)
+        offset = struct.calcsize('<Q')
+        values = np.frombuffer(buf, dtype=_unsigned_view(dtype), count=runs, offset=offset)
+        lengths = zigzag_varint_decode(buf[offset + runs * dtype.itemsize:])
+        return np.repeat(values, lengths).tobytes()
+
+
+class ZlibCodec(Codec):
+    """DEFLATE compression from the zlib module."""
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def encode(self, buf, dtype):
+        return zlib.compress(buf, self.level)
+
+    def decode(self, buf, dtype):
+        return zlib.decompress(buf)
+
+
+class Bz2Codec(Codec):
+    """Burrows-Wheeler compression from the bz2 module."""
+    name = 'bz2'
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def encode(self, buf, dtype):
+        return bz2.compress(buf, self.level)
+
+    def decode(self, buf, dtype):
+        return bz2.decompress(buf)
+
+
+class LzmaCodec(Codec):
+    """LZMA compression from the lzma module."""
+    name = 'lzma'
+
+    def __init__(self, preset=6):
+        self.preset = preset
+
+    def encode(self, buf, dtype):
+        return lzma.compress(buf, preset=self.preset)
+
+    def decode(self, buf, dtype):
+        return lzma.decompress(buf)
+
+
+def register_codec(codec):
+    """Registers a codec instance under its name, replacing any existing one."""
+    _CODECS[codec.name] = codec
+
+
+def get_codec(name):
+    """Returns the codec registered as `name`."""
+    try:
+        return _CODECS[name]
+    except KeyError:
+        raise ValueError('unknown codec %r! available codecs: %s' % (name, ', '.join(sorted(_CODECS))))
+
+
+def _codec_names(spec):
+    return [name for name in (spec or '').split('+') if name]
+
+
+def choose(buf, dtype):
+    """Returns the name and output of the automatic codec that best shrinks `buf`.
+
+    (None, buf) is returned if none of them makes it any smaller.
+    """
+    best, best_buf = None, buf
+    for name in sorted(_CODECS):
+        codec = _CODECS[name]
+        if not (codec.auto and codec.applies(dtype) and codec.accepts(buf, dtype)):
+            continue
+        encoded = codec.encode(buf, dtype)
+        if len(encoded) < len(best_buf):
+            best, best_buf = name, encoded
+    return best, best_buf
+
+
+def encode(buf, dtype, spec):
+    """Encodes raw array bytes using the codec specification `spec`.
+
+    Codecs that do not apply to `dtype` are skipped.
+
+    Returns
+    -------
+    spec, buf : tuple
+        The codec specification that was applied (None if none applied) and
+        the encoded bytes.
+    """
+    dtype = np.dtype(dtype)
+    applied = []
+    for name in _codec_names(spec):
+        if name == AUTO:
+            name, buf = choose(buf, dtype)
+        elif get_codec(name).applies(dtype):
+            buf = get_codec(name).encode(buf, dtype)
+        else:
+            name = None
+        if name is not None:
+            applied.append(name)
+    return '+'.join(applied) or None, buf
+
+
+def decode(buf, dtype, spec):
+    """Reverses encode(), returning the raw array bytes."""
+    if not spec:
+        return buf
+    dtype = np.dtype(dtype)
+    for name in reversed(_codec_names(spec)):
+        buf = get_codec(name).decode(buf, dtype)
+    return buf
+
+
+def map_parallel(func, items, workers=None, processes=False):
+    """Returns [func(item) for item in items], evaluated in a thread pool.
+
+    zlib, bz2 and lzma release the GIL while they work so (de)compressing
+    several buffers at once scales with the number of cores. If `workers` is
+    1, or there is at most one item, everything runs in the calling thread.
+    If `processes` is True a process pool is used instead, for work that
+    holds the GIL (e.g. base64 or the numpy codecs); `func`, the items and
+    the results must then pickle.
+    """
+    items = list(items)
+    if workers == 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+
+for _codec in (ShuffleCodec(), DeltaCodec(1), DeltaCodec(2), XorCodec(), RleCodec(),
+               ZlibCodec(), Bz2Codec(), LzmaCodec()):
+    register_codec(_codec)
+del _codec
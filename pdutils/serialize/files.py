@@ -0,0 +1,736 @@
+"""Frame files: one DataFrame or TimeSeries per file, with a schema header first.
+
+The first line of a frame file is a JSON header like
+
+    {"format": "pdutils.frame", "version": 1, "kind": "DataFrame",
+     "shape": [rows, columns], "spans": [[start, stop], ...],
+     "index": {"type": "DatetimeIndex", "dtype": "datetime64[ns]", "name": ..., "crc32": ...,
+               "offset": ..., "size": ..., "chunks": [[offset, size], ...]},
+     "columns": [{"name": ..., "dtype": "float64", "crc32": ...,
+                  "offset": ..., "size": ..., "chunks": [[offset, size], ...]}, ...],
+     "labels": [offset, size], "layout": [offset, size]}
+
+and the rest of the file is the document written by
+pdutils.serialize.json.encode(). The offsets and sizes locate the payload of
+every column (and of every chunk of rows of a column) within that document,
+counting from its first byte, so inspect() only has to read the header and
+load() only has to read the payloads it needs. Names are stored as flattened
+by jsonpickle. The "layout" entry is only present for frames written in chunks.
+
+"crc32" is the checksum() of the values of the column (or index), which
+load() can verify, update() uses to leave unchanged columns be and compare()
+uses to compare a frame with the one in a file without reading it. "sketch"
+is its pdutils.compare.sketch(), with which compare() and compare_files()
+reject columns that differ without reading them.
+
+Unless saved with tree_rows=None, the header also has a "tree_rows" entry
+and every column (and the index) a "tree": a Merkle tree of the hashes of
+its blocks of `tree_rows` rows, as a list of levels from the root down to
+the leaves, [[root], [hash, hash], ..., [leaf, ...]]. The children of node i
+of a level are nodes 2i and 2i + 1 of the next. locate() walks the trees of
+two files to the blocks of rows that differ, so that compare_files() (and
+compare()) only read and compare those.
+
+Only the top TREE_HEADER_LEVELS levels of a deeper tree are kept in the
+header, so that the header stays small whatever the size of the frame. The
+entry of such a tree also has "tree_levels", the [offset, size] of each of
+the levels below, in a section written after the document. Each of those
+levels is its hashes written back to back, all of the same length, so that
+any node can be read by itself. The header then has a "trees"
+[offset, size] entry locating that section, which the document ends before.
+Walks of the trees only read the pages of nodes along their way down.
+"""
+import hashlib
+import os
+import zlib
+
+import jsonpickle
+import jsonpickle.pickler
+import jsonpickle.unpickler
+import numpy as np
+import pandas as pd
+from jsonpickle import tags
+
+from pdutils.compare import df_compare, ts_compare, ndarray_compare, sketch, sketch_compare
+from pdutils.serialize.json import Pickler, Unpickler, decode, read, _read_frame, _typeref, _row_mask, \
+    _selected_rows, _chunk_spans, _flatten_value
+
+FORMAT = 'pdutils.frame'
+VERSION = 1
+
+#: The rows in each block hashed by the leaves of the Merkle trees of the columns of a file.
+TREE_ROWS = 65536
+#: The encoding options of save(), which update() and pdutils.serialize.aio.save() take too.
+_OPTIONS = ('codec', 'dtype_codecs', 'column_codecs', 'workers', 'chunk_rows')
+#: The top levels of the Merkle trees kept in the header of a file, the levels below are written after the body.
+TREE_HEADER_LEVELS = 4
+#: The nodes of a level below the header read at a time.
+_TREE_PAGE = 64
+#: The hex characters of every node of a Merkle tree, an 8 byte BLAKE2b digest.
+_NODE_CHARS = 16
+
+
+class ChecksumError(ValueError):
+    """Raised when values read from a frame file don't match the checksum they were written with."""
+
+
+def _crc(values, crc=0):
+    if isinstance(values, pd.Categorical):
+        crc = _crc(np.asarray(values.codes).astype(np.int64), crc)
+        return _crc(np.asarray(values.categories), crc)
+    values = np.asarray(values)
+    crc = zlib.crc32(values.dtype.str.encode('ascii'), crc)
+    if values.dtype.hasobject:
+        items = jsonpickle.pickler.Pickler().flatten(values.ravel().tolist())
+        return zlib.crc32(jsonpickle.json.encode(items).encode('utf-8'), crc)
+    return zlib.crc32(memoryview(np.ascontiguousarray(values).ravel().view(np.uint8)), crc)
+
+
+def checksum(values):
+    """Returns the CRC32 of the values of a column or index, an ndarray or a Categorical.
+
+    The checksum covers the dtype and the values, whatever their memory
+    layout or the encoding they are written with.
+    """
+    return _crc(values) & 0xffffffff
+
+
+def _digest(values):
+    """Returns the hex digest of the dtype and values of a block of a column or index."""
+    h = hashlib.blake2b(digest_size=8)
+    if isinstance(values, pd.Categorical):
+        h.update(_digest(np.asarray(values.codes).astype(np.int64)).encode('ascii'))
+        h.update(_digest(np.asarray(values.categories)).encode('ascii'))
+        return h.hexdigest()
+    values = np.asarray(values)
+    h.update(values.dtype.str.encode('ascii'))
+    if values.dtype.hasobject:
+        items = jsonpickle.pickler.Pickler().flatten(values.ravel().tolist())
+        h.update(jsonpickle.json.encode(items).encode('utf-8'))
+    else:
+        h.update(memoryview(np.ascontiguousarray(values).ravel().view(np.uint8)))
+    return h.hexdigest()
+
+
+def _tree(values, tree_rows):
+    """Returns the Merkle tree of the blocks of `tree_rows` rows of `values`, from the root down."""
+    levels = [[_digest(values[start:start + tree_rows]) for start in range(0, max(len(values), 1), tree_rows)]]
+    while len(levels[0]) > 1:
+        level = levels[0]
+        # A node without a sibling is carried up as it is.
+        levels.insert(0, [hashlib.blake2b(bytes.fromhex(level[i]) + bytes.fromhex(level[i + 1]),
+                                          digest_size=8).hexdigest() if i + 1 < len(level) else level[i]
+                          for i in range(0, len(level), 2)])
+    return levels
+
+
+class _Level(object):
+    """A level of a Merkle tree below the header of a file, whose nodes are read a page at a time when indexed."""
+
+    def __init__(self, path, offset, size):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.pages = {}
+
+    def __len__(self):
+        return self.size // _NODE_CHARS
+
+    def _page(self, page):
+        offset = page * _TREE_PAGE * _NODE_CHARS
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset + offset)
+            data = f.read(min(_TREE_PAGE * _NODE_CHARS, self.size - offset)).decode('ascii')
+        return [data[i:i + _NODE_CHARS] for i in range(0, len(data), _NODE_CHARS)]
+
+    def __getitem__(self, i):
+        page = i // _TREE_PAGE
+        if page not in self.pages:
+            self.pages[page] = self._page(page)
+        return self.pages[page][i % _TREE_PAGE]
+
+
+class _Tree(object):
+    """The Merkle tree of a header entry, as a list of levels whose levels below the header are _Levels."""
+
+    def __init__(self, entry, path, start):
+        self.levels = list(entry['tree']) + [_Level(path, start + offset, size)
+                                             for offset, size in entry.get('tree_levels', ())]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, level):
+        return self.levels[level]
+
+
+def _walk(left, right):
+    """Returns the positions of the leaves that differ between Merkle trees `left` and `right` of one shape."""
+    leaves = []
+    pending = [(0, 0)]
+    while pending:
+        level, i = pending.pop()
+        if left[level][i] == right[level][i]:
+            continue
+        if level == len(left) - 1:
+            leaves.append(i)
+        else:
+            pending.extend((level + 1, j) for j in (2 * i + 1, 2 * i) if j < len(left[level + 1]))
+    return sorted(leaves)
+
+
+class _Copied(object):
+    """The bytes of a column payload copied from another frame file, with the extents of its chunks in them."""
+
+    def __init__(self, data, chunks):
+        self.data = data
+        self.chunks = chunks
+
+
+class _Body(object):
+    """Accumulates the bytes of a document, recording where its fragments go."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.parts.append(data)
+        self.size += len(data)
+
+    def fragment(self, obj):
+        """Writes the JSON of `obj`, returning its [offset, size]."""
+        offset = self.size
+        self.write(self.backend.encode(obj))
+        return [offset, self.size - offset]
+
+    def copy(self, copied):
+        """Writes a _Copied payload, returning its [offset, size] and those of its chunks."""
+        offset = self.size
+        self.parts.append(copied.data)
+        self.size += len(copied.data)
+        return [offset, len(copied.data)], [[offset + chunk, size] for chunk, size in copied.chunks]
+
+    def sequence(self, items, write):
+        """Writes a JSON array of `items` with write(item), returning its [offset, size] and theirs."""
+        offset = self.size
+        self.write('[')
+        extents = []
+        for i, item in enumerate(items):
+            if i:
+                self.write(', ')
+            extents.append(write(item))
+        self.write(']')
+        return [offset, self.size - offset], extents
+
+
+def _begin(body, doc):
+    """Writes the start of the document of DataFrame or TimeSeries `doc`, up to its first payload argument."""
+    body.write('{"%s": %s, "__reduce__": [%s, [' % (tags.OBJECT, body.backend.encode(doc[tags.OBJECT]),
+                                                    body.backend.encode(doc['__reduce__'][0])))
+
+
+def _entry(name, values, extent, chunks, tree_rows=None):
+    entry = {'name': jsonpickle.pickler.Pickler().flatten(name), 'dtype': str(values.dtype),
+             'crc32': checksum(values), 'sketch': sketch(values), 'offset': extent[0], 'size': extent[1],
+             'chunks': chunks}
+    if tree_rows is not None:
+        entry['tree'] = _tree(values, tree_rows)
+    return entry
+
+
+def _write_frame(body, obj, doc, tree_rows=TREE_ROWS):
+    args = doc['__reduce__'][1]
+    chunked = len(args) > 3
+
+    def payload(value):
+        if isinstance(value, _Copied):
+            return body.copy(value)
+        if chunked:
+            return body.sequence(value, body.fragment)
+        extent = body.fragment(value)
+        return extent, [extent]
+
+    _begin(body, doc)
+    extent, columns = body.sequence(args[0], payload)
+    body.write(', ')
+    index, index_chunks = payload(args[1])
+    body.write(', ')
+    header = {'labels': body.fragment(args[2])}
+    if chunked:
+        body.write(', ')
+        header['layout'] = body.fragment(args[3])
+        header['spans'] = args[3]['spans']
+    else:
+        header['spans'] = [[0, len(obj)]]
+    body.write(']]}')
+    header['columns'] = [_entry(name, obj[name].values, column, chunks, tree_rows)
+                         for name, (column, chunks) in zip(obj.columns, columns)]
+    header['index'] = _entry(obj.index.name, obj.index.values, index, index_chunks, tree_rows)
+    if tree_rows is not None:
+        header['tree_rows'] = tree_rows
+    return header
+
+
+def _write_series(body, obj, doc, tree_rows=TREE_ROWS):
+    args = doc['__reduce__'][1]
+    _begin(body, doc)
+    values = body.fragment(args[0])
+    body.write(', ')
+    index = body.fragment(args[1])
+    for arg in args[2:]:
+        body.write(', ')
+        body.fragment(arg)
+    body.write(']]}')
+    header = {'spans': [[0, len(obj)]],
+              'columns': [_entry(obj.name, obj.values, values, [values], tree_rows)],
+              'index': _entry(obj.index.name, obj.index.values, index, [index], tree_rows)}
+    if tree_rows is not None:
+        header['tree_rows'] = tree_rows
+    return header
+
+
+def _kind(obj):
+    if isinstance(obj, pd.DataFrame):
+        return 'DataFrame'
+    elif isinstance(obj, pd.Series):
+        return 'TimeSeries'
+    raise TypeError('expected a DataFrame or TimeSeries, got %s' % type(obj).__name__)
+
+
+def _complete(header, obj, kind):
+    """Adds the entries describing the whole of `obj` to its header."""
+    header['index']['type'] = type(obj.index).__name__
+    header.update(format=FORMAT, version=VERSION, kind=kind, shape=list(obj.shape))
+    return header
+
+
+def _split_trees(header, body):
+    """Moves the levels of the Merkle trees of `header` below TREE_HEADER_LEVELS into a section after `body`."""
+    entries = [entry for entry in [header['index']] + header['columns']
+               if len(entry.get('tree', ())) > TREE_HEADER_LEVELS]
+    if not entries:
+        return
+    body.write('\n')
+    start = body.size
+    for entry in entries:
+        extents = []
+        for level in entry['tree'][TREE_HEADER_LEVELS:]:
+            offset = body.size
+            body.write(''.join(level))
+            extents.append([offset, body.size - offset])
+        entry.update(tree=entry['tree'][:TREE_HEADER_LEVELS], tree_levels=extents)
+    header['trees'] = [start, body.size - start]
+
+
+def _write(path, obj, kind, body, header):
+    _complete(header, obj, kind)
+    _split_trees(header, body)
+    # Written aside and moved into place, so that a reader never sees half a file.
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(body.backend.encode(header).encode('utf-8'))
+        f.write(b'\n')
+        for part in body.parts:
+            f.write(part)
+    os.replace(tmp, path)
+
+
+def save(obj, path, codec=None, dtype_codecs=None, column_codecs=None, workers=None, chunk_rows=None,
+         tree_rows=TREE_ROWS):
+    """Writes DataFrame or TimeSeries `obj` to a frame file at `path`.
+
+    The encoding options are those of pdutils.serialize.json.encode().
+    `tree_rows` is the number of rows hashed by each leaf of the Merkle trees
+    of the columns, or None to write no trees.
+    """
+    kind = _kind(obj)
+    write = _write_frame if kind == 'DataFrame' else _write_series
+    context = Pickler(codec=codec, dtype_codecs=dtype_codecs, column_codecs=column_codecs, workers=workers,
+                      chunk_rows=chunk_rows)
+    body = _Body(context.backend)
+    _write(path, obj, kind, body, write(body, obj, context.flatten(obj), tree_rows))
+
+
+def _pickler(options):
+    """Returns the Pickler for the encoding `options` of save(), raising TypeError for any other option."""
+    unknown = sorted(set(options) - set(_OPTIONS))
+    if unknown:
+        raise TypeError('unexpected encoding options for a frame file: %s' % ', '.join(unknown))
+    return Pickler(**options)
+
+
+def _name_key(flattened):
+    return jsonpickle.json.encode(flattened)
+
+
+def _unchanged(entry, values):
+    """Returns True if the header `entry` of a column (or index) matches its `values`."""
+    return entry is not None and entry['dtype'] == str(values.dtype) and entry.get('crc32') == checksum(values)
+
+
+def update(obj, path, tree_rows=TREE_ROWS, **options):
+    """Writes DataFrame `obj` to the frame file at `path`, leaving the columns that haven't changed be.
+
+    Columns (and the index) whose checksum, dtype and chunks match those in
+    the file are copied over as they are written there, without being
+    encoded again. The file isn't touched at all if nothing changed. Any
+    other object, or a file that doesn't exist yet, is written by save().
+
+    Parameters
+    ----------
+    obj : pandas.DataFrame
+        The frame to write.
+
+    path : str
+        The frame file to update.
+
+    tree_rows : int
+        The rows hashed by each leaf of the Merkle trees, as for save(). (optional)
+
+    **options
+        The encoding options of save(), for the columns that changed. Any
+        other option raises TypeError.
+
+    Returns
+    -------
+    written : list
+        The names of the columns encoded anew.
+    """
+    context = _pickler(options)
+    if not isinstance(obj, pd.DataFrame) or not os.path.exists(path):
+        save(obj, path, tree_rows=tree_rows, **options)
+        return list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+        start = f.tell()
+        spans = _chunk_spans(len(obj), context.chunk_rows)
+        old = {}
+        if header['kind'] == 'DataFrame' and ('layout' in header) == (spans is not None) and \
+                header['spans'] == (spans or [[0, len(obj)]]):
+            old = dict((_name_key(entry['name']), entry) for entry in header['columns'])
+            old[None] = header['index']
+        entries = [old.get(_name_key(jsonpickle.pickler.Pickler().flatten(name))) for name in obj.columns]
+        written = [name for name, entry in zip(obj.columns, entries) if not _unchanged(entry, obj[name].values)]
+        index = old.get(None)
+        index_unchanged = _unchanged(index, obj.index.values) and index['type'] == type(obj.index).__name__
+        if not written and index_unchanged and entries == header['columns']:
+            return []
+
+        def copied(entry):
+            f.seek(start + entry['offset'])
+            chunks = [[offset - entry['offset'], size] for offset, size in entry['chunks']]
+            return _Copied(f.read(entry['size']), chunks)
+
+        doc = context.flatten(obj[written])
+        args = list(doc['__reduce__'][1])
+        values = dict(zip(written, args[0]))
+        args[0] = [values[name] if name in values else copied(entry) for name, entry in zip(obj.columns, entries)]
+        if index_unchanged:
+            args[1] = copied(index)
+        args[2] = _flatten_value(Pickler(), obj.columns.values)
+        doc['__reduce__'] = (doc['__reduce__'][0], args)
+        body = _Body(context.backend)
+        new_header = _write_frame(body, obj, doc, tree_rows)
+    _write(path, obj, 'DataFrame', body, new_header)
+    return written
+
+
+def _read_header(f):
+    header = jsonpickle.json.decode(f.readline().decode('utf-8'))
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ValueError('not a frame file')
+    if header['version'] > VERSION:
+        raise ValueError('frame file version %s is not supported' % header['version'])
+    return header
+
+
+def _read_body(f, header):
+    """Returns the bytes of the document of a file from its start, where `f` is, on."""
+    return f.read(header['trees'][0]) if 'trees' in header else f.read()
+
+
+def _schema(f):
+    header = _read_header(f)
+    restore = jsonpickle.unpickler.Unpickler().restore
+    for entry in [header['index']] + header['columns']:
+        entry['name'] = restore(entry['name'])
+    return header
+
+
+def _inspect(path):
+    """Returns the schema of the frame file at `path` as inspect() does, with its Merkle trees as _Trees."""
+    with open(path, 'rb') as f:
+        header = _schema(f)
+        start = f.tell()
+    for entry in [header['index']] + header['columns']:
+        if 'tree' in entry:
+            entry['tree'] = _Tree(entry, path, start)
+    return header
+
+
+def inspect(path):
+    """Returns the schema of the frame file at `path`, reading nothing but its header.
+
+    Returns
+    -------
+    schema : dict
+        The header (see the module docstring), with the index and column
+        names restored.
+    """
+    with open(path, 'rb') as f:
+        return _schema(f)
+
+
+class _Fragments(object):
+    """The JSON fragments at a list of [offset, size] extents of a file, read and parsed when indexed."""
+
+    def __init__(self, f, start, extents, backend):
+        self.f = f
+        self.start = start
+        self.extents = extents
+        self.backend = backend
+
+    def __len__(self):
+        return len(self.extents)
+
+    def __getitem__(self, i):
+        offset, size = self.extents[i]
+        self.f.seek(self.start + offset)
+        return self.backend.decode(self.f.read(size).decode('utf-8'))
+
+
+def _load(f, header, columns, rows, index_range, workers):
+    start = f.tell()
+    if header['kind'] != 'DataFrame' or (columns is None and rows is None and index_range is None):
+        body = _read_body(f, header).decode('utf-8')
+        if columns is None and rows is None and index_range is None:
+            return decode(body, workers=workers)
+        return read(body, columns=columns, rows=rows, index_range=index_range, workers=workers)
+    context = Unpickler(workers=workers)
+    if 'layout' in header:
+        layout = _Fragments(f, start, [header['layout']], context.backend)[0]
+    else:
+        layout = {'spans': header['spans'], 'min': None, 'max': None}
+    values = [_Fragments(f, start, column['chunks'], context.backend) for column in header['columns']]
+    index = _Fragments(f, start, header['index']['chunks'], context.backend)
+    labels = _Fragments(f, start, [header['labels']], context.backend)[0]
+    cls = _typeref(pd.DataFrame)
+    doc = {tags.OBJECT: cls[tags.TYPE], '__reduce__': [cls, [values, index, labels, layout]]}
+    return _read_frame(context, doc, columns, rows, index_range)
+
+
+def _verify(header, obj, path):
+    """Raises ChecksumError unless the columns and index of `obj` match their checksums in `header`."""
+    restore = jsonpickle.unpickler.Unpickler().restore
+    if isinstance(obj, pd.DataFrame):
+        entries = dict((restore(entry['name']), entry) for entry in header['columns'])
+        pairs = [(entries[name], obj[name].values, 'column %r' % (name,)) for name in obj.columns]
+    else:
+        pairs = [(header['columns'][0], obj.values, 'values')]
+    pairs.append((header['index'], obj.index.values, 'index'))
+    for entry, values, what in pairs:
+        if 'crc32' in entry and checksum(values) != entry['crc32']:
+            raise ChecksumError('the %s of %s do not match their checksum' % (what, path))
+
+
+def load(path, columns=None, rows=None, index_range=None, workers=None, verify=False):
+    """Returns the DataFrame or TimeSeries in the frame file at `path`, or part of it.
+
+    The arguments select parts as for pdutils.serialize.json.read(). Only
+    the payloads of the columns selected, and of the chunks of rows needed,
+    are read from a DataFrame file.
+
+    If `verify` is True the columns selected (all of their rows) and the
+    index are checked against the checksums they were written with, raising
+    ChecksumError if they don't match.
+    """
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+        if not verify:
+            return _load(f, header, columns, rows, index_range, workers)
+        obj = _load(f, header, columns, None, None, workers)
+    _verify(header, obj, path)
+    mask = _row_mask(obj.index.values, _selected_rows(len(obj), rows), index_range)
+    return obj if mask is None else obj[mask]
+
+
+def _blocks(leaves, tree_rows, size):
+    """Returns the [start, stop) row ranges of the blocks at positions `leaves` of a Merkle tree, merged."""
+    ranges = []
+    for leaf in leaves:
+        start, stop = leaf * tree_rows, min((leaf + 1) * tree_rows, size)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = stop
+        else:
+            ranges.append([start, stop])
+    return ranges
+
+
+def _rows(ranges):
+    return np.concatenate([np.arange(start, stop) for start, stop in ranges] or [np.arange(0)])
+
+
+def _pairs(lheader, rheader):
+    """Returns the (name, left entry, right entry) of the columns of two headers, or None if their names differ."""
+    if lheader['kind'] != 'DataFrame':
+        return [(lheader['columns'][0]['name'], lheader['columns'][0], rheader['columns'][0])]
+    lentries = dict((entry['name'], entry) for entry in lheader['columns'])
+    rentries = dict((entry['name'], entry) for entry in rheader['columns'])
+    if set(lentries) != set(rentries):
+        return None
+    return [(name, lentries[name], rentries[name]) for name in lentries]
+
+
+def _locate(lheader, rheader):
+    tree_rows = lheader.get('tree_rows')
+    if tree_rows is None or tree_rows != rheader.get('tree_rows') or lheader['kind'] != rheader['kind'] or \
+            lheader['shape'] != rheader['shape']:
+        return None
+    size = lheader['shape'][0]
+    pairs = _pairs(lheader, rheader)
+    if pairs is None:
+        return None
+    columns = {}
+    for name, lentry, rentry in pairs:
+        leaves = _walk(lentry['tree'], rentry['tree'])
+        if leaves:
+            columns[name] = _blocks(leaves, tree_rows, size)
+    return {'index': _blocks(_walk(lheader['index']['tree'], rheader['index']['tree']), tree_rows, size),
+            'columns': columns}
+
+
+def locate(left, right):
+    """Returns the blocks of rows in which the frame files at `left` and `right` differ, from their headers.
+
+    The Merkle trees of the columns (and index) of the two files are walked
+    from the root to the leaves that differ, so only the hashes along the
+    way are compared, whatever the size of the frames. Of the levels below
+    the header only the pages of nodes along the way are read.
+
+    Returns
+    -------
+    blocks : dict
+        {"index": ranges, "columns": {name: ranges}}, where ranges are the
+        [start, stop) rows of the blocks that differ, only for the index and
+        columns that differ somewhere. None if the files can't be compared
+        that way: they hold frames of different kinds, shapes or columns, or
+        weren't written with trees of the same `tree_rows`.
+    """
+    return _locate(_inspect(left), _inspect(right))
+
+
+def compare_files(left, right, rtol=1.e-5, atol=1.e-8):
+    """Compares the DataFrames (or TimeSeries) in the frame files at `left` and `right`.
+
+    Only the blocks of rows that locate() finds to differ are read, from the
+    columns they differ in, and compared by
+    pdutils.compare.ndarray_compare(), as their values may still be
+    equivalent within the tolerances. Columns whose sketches in the headers
+    already show them to differ are reported without reading anything.
+    Files that locate() can't compare are loaded and compared by
+    pdutils.compare.df_compare() (or ts_compare()).
+
+    Returns
+    -------
+    equivalent, status : tuple
+        As returned by pdutils.compare.df_compare().
+    """
+    lheader, rheader = _inspect(left), _inspect(right)
+    if lheader['kind'] != rheader['kind']:
+        return False, 'type mismatch! left is a %s, right is a %s' % (lheader['kind'], rheader['kind'])
+    if lheader['shape'] != rheader['shape']:
+        return False, 'shape mismatch! left has shape %s, right has shape %s' \
+            % (tuple(lheader['shape']), tuple(rheader['shape']))
+    frame = lheader['kind'] == 'DataFrame'
+    blocks = _locate(lheader, rheader)
+    if blocks is None:
+        return (df_compare if frame else ts_compare)(load(left), load(right), rtol=rtol, atol=atol)
+    if lheader['index']['type'] != rheader['index']['type']:
+        return False, 'index type mismatch! left index type %s, right index type %s' \
+            % (lheader['index']['type'], rheader['index']['type'])
+    if blocks['index']:
+        rows = _rows(blocks['index'])
+        selected = dict(columns=[]) if frame else {}
+        lindex = load(left, rows=rows, **selected).index.values
+        rindex = load(right, rows=rows, **selected).index.values
+        if lindex.dtype != rindex.dtype or not np.all(lindex == rindex):
+            return False, 'index values are not the same!'
+    def failed(name, msg):
+        if not frame:
+            return False, 'comparison of values failed! %s' % msg
+        return False, 'comparison of column %r failed! %s' % (name, msg)
+
+    entries = dict((name, (lentry, rentry)) for name, lentry, rentry in _pairs(lheader, rheader))
+    for name in sorted(blocks['columns']):
+        lentry, rentry = entries[name]
+        if 'sketch' in lentry and 'sketch' in rentry:
+            equivalent, msg = sketch_compare(lentry['sketch'], rentry['sketch'], rtol=rtol, atol=atol)
+            if not equivalent:
+                return failed(name, msg)
+    for name in sorted(blocks['columns']):
+        rows = _rows(blocks['columns'][name])
+        selected = dict(columns=[name]) if frame else {}
+        lvalues, rvalues = [load(path, rows=rows, **selected) for path in (left, right)]
+        if frame:
+            lvalues, rvalues = lvalues[name], rvalues[name]
+        equivalent, msg = ndarray_compare(lvalues.values, rvalues.values, rtol=rtol, atol=atol)
+        if not equivalent:
+            return failed(name, msg)
+    return True, '%s contents are equivalent' % lheader['kind']
+
+
+def compare(obj, path, rtol=1.e-5, atol=1.e-8):
+    """Compares DataFrame or TimeSeries `obj` with the one in the frame file at `path`, e.g. a golden copy.
+
+    The checksums of the values of `obj` are compared with those in the file
+    first. Only the columns (and index) whose checksums differ are read, and
+    compared by pdutils.compare.df_compare() (or ts_compare()), as their
+    values may still be equivalent within the tolerances, unless their
+    sketches in the file already show them to differ. If the file has
+    Merkle trees and the index matches, only the blocks of rows whose hashes
+    differ are read from those columns, and compared by
+    pdutils.compare.ndarray_compare().
+
+    Returns
+    -------
+    equivalent, status : tuple
+        As returned by pdutils.compare.df_compare(), with `obj` on the left.
+    """
+    header = _inspect(path)
+    kind = _kind(obj)
+    if kind != header['kind']:
+        return False, 'type mismatch! left is a %s, right is a %s' % (kind, header['kind'])
+    if list(obj.shape) != header['shape']:
+        return False, 'shape mismatch! left has shape %s, right has shape %s' % (obj.shape, tuple(header['shape']))
+    index = header['index']
+    index_matches = index['type'] == type(obj.index).__name__ and index.get('crc32') == checksum(obj.index.values)
+    if kind == 'TimeSeries':
+        if index_matches and header['columns'][0].get('crc32') == checksum(obj.values):
+            return True, 'TimeSeries contents are equivalent'
+        return ts_compare(obj, load(path), rtol=rtol, atol=atol)
+    entries = dict((entry['name'], entry) for entry in header['columns'])
+    if set(entries) != set(obj.columns):
+        return df_compare(obj, load(path), rtol=rtol, atol=atol)
+    differ = [name for name in obj.columns if entries[name].get('crc32') != checksum(obj[name].values)]
+    if index_matches and not differ:
+        return True, 'DataFrame contents are equivalent'
+    for name in sorted(differ):
+        if 'sketch' in entries[name]:
+            equivalent, msg = sketch_compare(sketch(obj[name].values, distinct=False), entries[name]['sketch'],
+                                             rtol=rtol, atol=atol)
+            if not equivalent:
+                return False, 'comparison of column %r failed! %s' % (name, msg)
+    tree_rows = header.get('tree_rows')
+    if index_matches and tree_rows is not None:
+        for name in sorted(differ):
+            values = obj[name].values
+            rows = _rows(_blocks(_walk(_tree(values, tree_rows), entries[name]['tree']), tree_rows, len(obj)))
+            equivalent, msg = ndarray_compare(values[rows], load(path, columns=[name], rows=rows)[name].values,
+                                              rtol=rtol, atol=atol)
+            if not equivalent:
+                return False, 'comparison of column %r failed! %s' % (name, msg)
+        return True, 'DataFrame contents are equivalent'
+    return df_compare(obj[differ], load(path, columns=differ), rtol=rtol, atol=atol)
@@ -1,23 +1,563 @@
+import binascii
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
 
-from jsonpickle import util
+import jsonpickle.backend
+import jsonpickle.pickler
+import jsonpickle.unpickler
+from jsonpickle import handlers, util, tags
 from jsonpickle.handlers import BaseHandler
 
+from pdutils.serialize import codecs
+
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class Pickler(jsonpickle.pickler.Pickler):
+    """A jsonpickle Pickler carrying the pdutils encoding options (see encode())."""
+
+    def __init__(self, codec=None, dtype_codecs=None, column_codecs=None, workers=None, dedupe=False,
+                 chunk_rows=None, canonical=False, cache=None, batch=False, **kwargs):
+        if canonical:
+            kwargs['backend'] = _canonical_backend()
+        super(Pickler, self).__init__(**kwargs)
+        self.canonical = canonical
+        self.codec = codec
+        self.dtype_codecs = dtype_codecs or {}
+        self.column_codecs = column_codecs or {}
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.cache = cache
+        #: Maps id(ndarray) to its (codec, buffer, digest) payload when encoded ahead of time.
+        self.payloads = {}
+        #: The digests of the buffers written so far, if buffers are deduplicated.
+        self.shared = set() if dedupe else None
+        #: The (ndarray, codec, payload arguments) of every buffer left for encode_batch() to encode.
+        self.jobs = [] if batch else None
+        #: Maps id(ndarray) to the codec of the DataFrame column it holds, when encoding in a batch.
+        self.specs = {}
+        #: Maps id(ndarray) to (ndarray, payload arguments) for arrays stored in
+        #: place, so later views of them can refer to their buffer. Views are
+        #: stored like any other array in canonical documents.
+        self.bases = None if canonical else {}
+
+    def _flatten_obj_instance(self, obj):
+        # Finds (and registers with jsonpickle) the handler of a subclass of a class handled.
+        _handler(type(obj))
+        return super(Pickler, self)._flatten_obj_instance(obj)
+
+    def _mkref(self, obj):
+        if self.canonical:
+            # Repeated objects are written in full rather than referenced by id, so
+            # that the document doesn't depend on object identity. Canonical
+            # documents therefore can't hold reference cycles.
+            self._objs.setdefault(id(obj), len(self._objs))
+            return True
+        return super(Pickler, self)._mkref(obj)
+
+
+class EncodeCache(object):
+    """An LRU cache of encoded array payloads, bounded by the size of the payloads.
+
+    encode() looks up the payload of every array buffer it writes in the cache
+    first. Entries are keyed on the memory of the array (its address, shape,
+    strides and dtype) and the codec applied, and only returned if the
+    BLAKE2b digest of the memory (as used to deduplicate buffers) still
+    matches the one it was encoded from. Arrays mutated in place, or new
+    arrays allocated where old ones were, are therefore encoded again: unlike
+    a checksum such as CRC32, the digest can't be kept by a deliberate edit.
+    Computing the digest costs a fraction of encoding the array.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The most bytes of base64 payloads kept, the least recently used
+        payloads being evicted first. (optional)
+        Default: 256 MiB
+    """
+
+    def __init__(self, max_bytes=256 << 20):
+        self.max_bytes = max_bytes
+        #: The bytes of the payloads cached.
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, digest):
+        """Returns the payload cached for `key`, if it was encoded from memory with digest `digest`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, digest, payload):
+        size = len(payload[1])
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1][1])
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (digest, payload)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_CANONICAL_BACKEND = []
+
+
+def _canonical_backend():
+    """Returns the jsonpickle backend writing canonical documents: sorted keys, no whitespace, ASCII only."""
+    if not _CANONICAL_BACKEND:
+        backend = jsonpickle.backend.JSONBackend()
+        backend.set_preferred_backend('json')
+        backend.set_encoder_options('json', sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+        _CANONICAL_BACKEND.append(backend)
+    return _CANONICAL_BACKEND[0]
+
+
+class BufferPool(object):
+    """A pool of reusable array buffers, keyed by dtype and size in bytes.
+
+    decode() decodes uncompressed array payloads straight into buffers taken
+    from a pool, and the base64 text of compressed payloads into scratch
+    buffers handed back as soon as they are decompressed. Once done with the
+    objects decoded, give() hands their buffers back for the next decode() of
+    the same shapes to reuse.
+
+    Parameters
+    ----------
+    max_free : int
+        The most free buffers kept of each dtype and size, any more handed
+        back are left to the garbage collector. (optional)
+        Default: None (no limit)
+    """
+
+    def __init__(self, max_free=None):
+        self.max_free = max_free
+        self._free = {}
+        #: Maps id(buffer) to the key and buffer of every buffer taken and not handed back yet.
+        self._taken = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns the number of free buffers."""
+        return sum(len(free) for free in self._free.values())
+
+    def take(self, dtype, nbytes):
+        """Returns a writable buffer (a bytearray) of `nbytes` bytes for items of `dtype`."""
+        key = (np.dtype(dtype).str, nbytes)
+        with self._lock:
+            free = self._free.get(key)
+            buf = free.pop() if free else bytearray(nbytes)
+            self._taken[id(buf)] = (key, buf)
+        return buf
+
+    def give_buffer(self, buf):
+        """Hands buffer `buf` taken from the pool back to it."""
+        with self._lock:
+            key, buf = self._taken.pop(id(buf), (None, None))
+            if key is None:
+                return
+            free = self._free.setdefault(key, [])
+            if self.max_free is None or len(free) < self.max_free:
+                free.append(buf)
+
+    def give(self, obj):
+        """Hands the buffers of the arrays in `obj` back to the pool.
+
+        `obj` is an ndarray, Series/TimeSeries, DataFrame or Categorical, or a
+        tuple, list or dict of them, typically decoded with this pool. Neither
+        `obj` nor any view of its arrays may be used afterwards. Buffers that
+        didn't come from the pool are ignored.
+        """
+        for arr in _arrays(obj):
+            base = arr
+            while isinstance(base, np.ndarray):
+                base = base.base
+            if base is not None:
+                self.give_buffer(base)
+
+
+def _arrays(obj):
+    """Yields the arrays of a (container of) numpy and pandas objects."""
+    if isinstance(obj, np.ndarray):
+        yield obj
+    elif isinstance(obj, pd.DataFrame):
+        for col in obj.columns:
+            for arr in _arrays(obj[col].values):
+                yield arr
+        yield obj.index.values
+    elif isinstance(obj, pd.Series):
+        for arr in _arrays(obj.values):
+            yield arr
+        yield obj.index.values
+    elif isinstance(obj, pd.Categorical):
+        yield np.asarray(obj.codes)
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            for arr in _arrays(value):
+                yield arr
+    elif isinstance(obj, (tuple, list)):
+        for value in obj:
+            for arr in _arrays(value):
+                yield arr
+
+
+class Unpickler(jsonpickle.unpickler.Unpickler):
+    """A jsonpickle Unpickler carrying the pdutils decoding options (see decode())."""
+
+    def __init__(self, workers=None, pool=None, batch=False, **kwargs):
+        super(Unpickler, self).__init__(**kwargs)
+        self.workers = workers
+        self.pool = pool
+        #: Maps id(flattened ndarray) to its raw buffer when decoded ahead of time.
+        self.buffers = {}
+        #: Maps the digest of a deduplicated buffer to its raw buffer once decoded.
+        self.shared = {}
+        #: Maps the digest of a deduplicated buffer to the arguments of the ndarray storing it.
+        self.definitions = {}
+        #: Every flattened ndarray, for decode_batch() to decode their buffers ahead of time.
+        self.docs = [] if batch else None
+
+    def _restore_object(self, obj):
+        _handler(jsonpickle.unpickler.loadclass(obj[tags.OBJECT]))
+        return super(Unpickler, self)._restore_object(obj)
+
+    def index(self, obj):
+        """Records where every deduplicated buffer in flattened `obj` is stored.
+
+        Buffers can then be resolved whichever order the references are
+        restored in.
+        """
+        if _is_ndarray_doc(obj):
+            args = obj['__reduce__'][1]
+            if self.docs is not None:
+                self.docs.append(obj)
+            if isinstance(args[3], dict) and 'data' in args[3]:
+                self.definitions[args[3]['id']] = args
+        elif isinstance(obj, dict):
+            for value in obj.values():
+                self.index(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                self.index(value)
+
+
+def _select_codec(pickler, arr, column=None):
+    """Returns the codec specification that applies to `arr`, the most specific option winning."""
+    column_codecs = getattr(pickler, 'column_codecs', None) or {}
+    if column is not None and column in column_codecs:
+        return column_codecs[column]
+    dtype_codecs = getattr(pickler, 'dtype_codecs', None) or {}
+    for key in (str(arr.dtype), arr.dtype.kind):
+        if key in dtype_codecs:
+            return dtype_codecs[key]
+    return getattr(pickler, 'codec', None)
+
+
+def _stored(arr, canonical=False):
+    """Returns the array whose memory is written for `arr`.
+
+    C and Fortran contiguous arrays are written as they are, anything else is
+    compacted into a C contiguous copy first. Canonical documents always store
+    C contiguous little endian memory.
+    """
+    if canonical:
+        if arr.dtype.byteorder == '>' or (arr.dtype.byteorder == '=' and not _LITTLE_ENDIAN):
+            arr = arr.astype(arr.dtype.newbyteorder('<'))
+        return np.ascontiguousarray(arr)
+    if arr.flags.c_contiguous or arr.flags.f_contiguous:
+        return arr
+    return np.ascontiguousarray(arr)
+
+
+def _raw(arr):
+    """Returns the memory of contiguous `arr` in memory order, without copying it."""
+    return memoryview(arr.ravel(order='K').view(np.uint8))
+
+
+def _digest(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _cache_key(arr, codec, deduped):
+    """Returns the EncodeCache key of the buffer of contiguous `arr` encoded with `codec`."""
+    return arr.__array_interface__['data'][0], arr.shape, arr.strides, arr.dtype.str, codec, deduped
+
+
+def _encode_job(job):
+    """Returns the (codec, base64 buffer) of the memory of contiguous ndarray `job[0]` encoded with codec `job[1]`."""
+    arr, codec = job
+    applied, buffer = codecs.encode(_raw(arr), arr.dtype, codec)
+    return applied, util.b64encode(buffer)
+
+
+def _encode_buffer(arr, codec, shared=None, cache=None):
+    """Returns the (codec, base64 buffer, digest) payload of contiguous `arr`.
+
+    The content digest is only computed when buffers are deduplicated, i.e.
+    `shared` is the set of digests written so far. A buffer found in there
+    is not encoded again, nor is one found in EncodeCache `cache`.
+    """
+    raw = _raw(arr)
+    digest = _digest(raw) if cache is not None or shared is not None else None
+    if cache is not None:
+        key = _cache_key(arr, codec, shared is not None)
+        payload = cache.get(key, digest)
+        if payload is not None:
+            if payload[2] in (shared or ()):
+                return None, None, payload[2]
+            return payload
+    if shared is not None and digest in shared:
+        return None, None, digest
+    payload = _encode_job((arr, codec)) + (digest if shared is not None else None,)
+    if cache is not None:
+        cache.put(key, digest, payload)
+    return payload
+
+
+#: The number of base64 characters decoded at a time into a pooled buffer, a multiple of 4.
+_B64_STEP = 1 << 16
+
+
+def _b64decode_into(text, buf):
+    """Decodes base64 `text` into writable buffer `buf`, a step at a time so no full size copy is made."""
+    out = memoryview(buf)
+    position = 0
+    for start in range(0, len(text), _B64_STEP):
+        chunk = binascii.a2b_base64(text[start:start + _B64_STEP])
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+
+
+def _b64_size(text):
+    return len(text) // 4 * 3 - text[-2:].count('=')
+
+
+def _decode_buffer(args, pool=None):
+    buffer = args[3]
+    buffer = buffer['data'] if isinstance(buffer, dict) else buffer
+    if pool is None:
+        buffer = util.b64decode(buffer)
+        if len(args) > 4:
+            buffer = codecs.decode(buffer, args[1], args[4])
+        return buffer
+    if len(args) <= 4:
+        out = pool.take(args[1], _b64_size(buffer))
+        _b64decode_into(buffer, out)
+        return out
+    scratch = pool.take(np.uint8, _b64_size(buffer))
+    try:
+        _b64decode_into(buffer, scratch)
+        raw = codecs.decode(memoryview(scratch), args[1], args[4])
+    finally:
+        pool.give_buffer(scratch)
+    # Codecs return new bytes, which are copied over so that every array decoded is pooled (and writable).
+    return _pooled(pool, args[1], raw)
+
+
+def _pooled(pool, dtype, raw):
+    """Returns a copy of bytes `raw` in a buffer of BufferPool `pool`."""
+    out = pool.take(dtype, len(raw))
+    out[:] = raw
+    return out
+
+
+def _shared_buffer(unpickler, digest, args):
+    """Returns the one raw buffer restored for deduplicated (or viewed) buffer `digest`."""
+    if not hasattr(unpickler, 'shared'):
+        # A plain jsonpickle Unpickler, which hasn't indexed the definitions (see Unpickler.index()). It
+        # may come across a reference before its definition, e.g. when restoring dicts with int keys.
+        unpickler.shared = {}
+    if digest not in unpickler.shared:
+        if 'data' not in args[3]:
+            definitions = getattr(unpickler, 'definitions', {})
+            if digest not in definitions:
+                raise ValueError('buffer %s is referred to before it is stored, documents with shared buffers '
+                                 'decode with pdutils.serialize.json.decode()' % digest)
+            args = definitions[digest]
+        unpickler.shared[digest] = _decode_buffer(args, getattr(unpickler, 'pool', None))
+    return unpickler.shared[digest]
+
+
+#: Maps the classes registered by register_handlers() to their handlers.
+_HANDLERS = {}
+#: Maps every class looked up by _handler() to its handler, or None.
+_DISPATCH = {}
+
+
+def _handler(cls):
+    """Returns the handler for instances of `cls`, or None.
+
+    jsonpickle only finds handlers registered for the exact class of an
+    object. Subclasses of the classes registered by register_handlers() are
+    handled by the handler of their nearest registered base class, which is
+    looked up along the MRO once per class and then registered with
+    jsonpickle for the class itself.
+    """
+    handler = handlers.get(cls)
+    if handler is not None:
+        return handler
+    try:
+        return _DISPATCH[cls]
+    except KeyError:
+        pass
+    handler = next((_HANDLERS[base] for base in getattr(cls, '__mro__', ())[1:] if base in _HANDLERS), None)
+    if handler is not None:
+        handlers.register(cls, handler)
+    _DISPATCH[cls] = handler
+    return handler
+
+
+def _flatten_value(pickler, value):
+    """Flattens a value nested inside the payload of one of the handlers below.
+
+    Values with a registered handler are flattened by calling the handler
+    directly rather than through the pickler. jsonpickle numbers referenced
+    objects parent first when pickling but child first when a handler
+    restores them, so nested objects must stay out of its reference tracking.
+    """
+    handler = _handler(type(value))
+    if handler is None:
+        return pickler.flatten(value, reset=False)
+    cls = type(value)
+    return handler(pickler).flatten(value, {tags.OBJECT: '%s.%s' % (cls.__module__, cls.__name__)})
+
+
+def _restore_value(unpickler, obj):
+    """Restores a value flattened by _flatten_value()."""
+    if isinstance(obj, dict) and tags.OBJECT in obj:
+        handler = _handler(jsonpickle.unpickler.loadclass(obj[tags.OBJECT]))
+        if handler is not None:
+            return handler(unpickler).restore(obj)
+    return unpickler.restore(obj, reset=False)
+
+
+def _base_view(pickler, arr):
+    """Returns the buffer entry describing `arr` as a view of an array already written, or None."""
+    base = arr.base
+    bases = getattr(pickler, 'bases', None)
+    if not bases or not isinstance(base, np.ndarray) or id(base) not in bases:
+        return None
+    base, args = bases[id(base)]
+    if not isinstance(args[3], dict):
+        args[3] = {'id': _digest(_raw(base)), 'data': args[3]}
+    offset = arr.__array_interface__['data'][0] - base.__array_interface__['data'][0]
+    return {'id': args[3]['id'], 'offset': offset}
+
+
+def _c_strides(shape, itemsize):
+    strides = [itemsize]
+    for size in reversed(shape[1:]):
+        strides.insert(0, strides[0] * size)
+    return tuple(strides[-len(shape):]) if shape else ()
+
+
+def _flatten_items(arr, canonical=False):
+    """Flattens the items of object array `arr`, in C order.
+
+    The items are flattened in a context of their own so that they stay out
+    of the enclosing document's reference tracking (see _flatten_value()).
+    """
+    pickler = Pickler(canonical=True) if canonical else jsonpickle.pickler.Pickler()
+    return pickler.flatten(arr.ravel().tolist())
+
+
+def _restore_items(obj, shape, dtype):
+    items = jsonpickle.unpickler.Unpickler().restore(obj)
+    arr = np.empty(len(items), dtype=dtype)
+    for i, item in enumerate(items):
+        arr[i] = item
+    return arr.reshape(shape)
+
+
+def _is_ndarray_doc(obj):
+    return isinstance(obj, dict) and obj.get(tags.OBJECT) == 'numpy.ndarray' and '__reduce__' in obj
+
 
 class NumpyArrayHandler(BaseHandler):
-    """A jsonpickle handler for numpy (de)serialising arrays."""
+    """A jsonpickle handler for numpy (de)serialising arrays.
+
+    The payload arguments are the shape, dtype and strides of the array
+    followed by an entry for its buffer, which is one of
+
+    - the (optionally compressed) memory of the array as base64, followed
+      by the codec specification if a codec was applied. C and Fortran
+      contiguous arrays are written straight from their memory, other
+      arrays are compacted to C order first. The strides always describe
+      the memory written.
+    - {'id': digest, 'data': base64} when buffers are deduplicated or viewed
+      by a later array, and {'id': digest} for every later array with the
+      same content.
+    - {'id': digest, 'offset': bytes} for a view of an array written earlier
+      in the same document.
+    - {'items': [...]} for object arrays, whose items are flattened in turn.
+    """
 
     def flatten(self, obj, data):
         pickler = self.context
         flatten = pickler.flatten
-        buffer = util.b64encode(obj.tostring())
-        #TODO: should probably also consider including other parameters in future such as byteorder, etc.
-        #TODO: see numpy.info(obj) and obj.__reduce__() for details.
-        shape = flatten(obj.shape)
-        dtype = str(obj.dtype)
-        strides = flatten(obj.strides)
-        args = [shape, dtype, strides, buffer]
+        canonical = getattr(pickler, 'canonical', False)
+        shape = flatten(obj.shape, reset=False)
+        dtype = obj.dtype.str if canonical else str(obj.dtype)
+        codec = stored = jobs = None
+        view = None if obj.dtype.hasobject else _base_view(pickler, obj)
+        if obj.dtype.hasobject:
+            strides = _c_strides(obj.shape, obj.dtype.itemsize)
+            buffer = {'items': _flatten_items(obj, canonical)}
+        elif view is not None:
+            strides, buffer = obj.strides, view
+        else:
+            shared = getattr(pickler, 'shared', None)
+            stored = _stored(obj, canonical)
+            if canonical:
+                dtype = stored.dtype.str
+            payload = getattr(pickler, 'payloads', {}).pop(id(obj), None)
+            jobs = getattr(pickler, 'jobs', None)
+            if jobs is not None:
+                # Encoded along with every other buffer once the document is flattened, see encode_batch().
+                spec = pickler.specs.pop(id(obj), None) or _select_codec(pickler, obj)
+                payload = None, None, None
+            elif payload is None:
+                payload = _encode_buffer(stored, _select_codec(pickler, obj), shared,
+                                         getattr(pickler, 'cache', None))
+            codec, buffer, digest = payload
+            if digest in (shared or ()):
+                codec, buffer = None, {'id': digest}
+            elif digest is not None:
+                shared.add(digest)
+                buffer = {'id': digest, 'data': buffer}
+            strides = stored.strides
+        args = [shape, dtype, flatten(strides, reset=False), buffer]
+        if codec is not None:
+            args.append(codec)
+        if stored is not None and jobs is not None:
+            jobs.append((stored, spec, args))
+        if stored is obj and getattr(pickler, 'bases', None) is not None:
+            pickler.bases[id(obj)] = (obj, args)
         data['__reduce__'] = (flatten(np.ndarray, reset=False), args)
         return data
 
@@ -26,23 +566,340 @@ class NumpyArrayHandler(BaseHandler):
         unpickler = self.context
         restore = unpickler.restore
         cls = restore(cls, reset=False)
-        shape = restore(args[0])
-        dtype = np.dtype(restore(args[1]))
-        strides = restore(args[2])
-        buffer = util.b64decode(args[3])
-        return cls(shape=shape, dtype=dtype, buffer=buffer, strides=strides)
+        shape = restore(args[0], reset=False)
+        dtype = np.dtype(restore(args[1], reset=False))
+        strides = restore(args[2], reset=False)
+        offset = 0
+        if isinstance(args[3], dict) and 'items' in args[3]:
+            return _restore_items(args[3]['items'], shape, dtype)
+        elif isinstance(args[3], dict):
+            buffer = _shared_buffer(unpickler, args[3]['id'], args)
+            offset = args[3].get('offset', 0)
+        else:
+            buffer = getattr(unpickler, 'buffers', {}).pop(id(obj), None)
+            if buffer is None:
+                buffer = _decode_buffer(args, getattr(unpickler, 'pool', None))
+        return cls(shape=shape, dtype=dtype, buffer=buffer, offset=offset, strides=strides)
+
+
+def _encode_columns(pickler, items):
+    """Encodes the buffers of a frame's (column, ndarray) `items` ahead of time, in parallel."""
+    payloads = getattr(pickler, 'payloads', None)
+    if payloads is None:
+        return
+    jobs = [(arr, _select_codec(pickler, arr, col)) for col, arr in items
+            if isinstance(arr, np.ndarray) and not arr.dtype.hasobject and _base_view(pickler, arr) is None]
+    if pickler.jobs is not None:
+        # Only the codecs of the columns are needed, the buffers are encoded with the rest of the batch.
+        pickler.specs.update((id(arr), codec) for arr, codec in jobs if codec)
+        return
+    if not any(codec for _, codec in jobs):
+        return
+    canonical = getattr(pickler, 'canonical', False)
+    results = codecs.map_parallel(
+        lambda job: _encode_buffer(_stored(job[0], canonical), job[1], pickler.shared, pickler.cache), jobs,
+        pickler.workers)
+    payloads.update((id(arr), payload) for (arr, _), payload in zip(jobs, results))
+
+
+def _decode_columns(unpickler, docs):
+    """Decodes the compressed buffers of a frame's ndarray columns ahead of time, in parallel."""
+    buffers = getattr(unpickler, 'buffers', None)
+    if buffers is None:
+        return
+    jobs = []
+    for doc in docs:
+        if not _is_ndarray_doc(doc) or len(doc['__reduce__'][1]) <= 4:
+            continue
+        buffer = doc['__reduce__'][1][3]
+        decoded = buffer['id'] in unpickler.shared if isinstance(buffer, dict) else id(doc) in buffers
+        if not decoded:
+            jobs.append(doc)
+    results = codecs.map_parallel(lambda doc: _decode_buffer(doc['__reduce__'][1], unpickler.pool), jobs,
+                                  unpickler.workers)
+    for doc, buffer in zip(jobs, results):
+        args = doc['__reduce__'][1]
+        if isinstance(args[3], dict):
+            unpickler.shared[args[3]['id']] = buffer
+        else:
+            buffers[id(doc)] = buffer
+
+
+def _encode_payloads(jobs, cache=None, workers=None, processes=False):
+    """Returns the (codec, base64 buffer) payloads of (contiguous ndarray, codec) `jobs`, encoded in parallel."""
+    if not processes:
+        return codecs.map_parallel(lambda job: _encode_buffer(job[0], job[1], None, cache)[:2], jobs, workers)
+    # The cache lives in this process, so it is looked up (and filled) here.
+    keys = [(_cache_key(arr, codec, False), _digest(_raw(arr))) if cache is not None else None
+            for arr, codec in jobs]
+    payloads = [cache.get(*key) if key else None for key in keys]
+    misses = [i for i, payload in enumerate(payloads) if payload is None]
+    for i, payload in zip(misses, codecs.map_parallel(_encode_job, [jobs[i] for i in misses], workers, True)):
+        payloads[i] = payload + (None,)
+        if cache is not None:
+            cache.put(keys[i][0], keys[i][1], payloads[i])
+    return [payload[:2] for payload in payloads]
+
+
+def _encode_jobs(pickler, processes=False):
+    """Encodes the buffers left in `pickler.jobs` in parallel, filling in their payloads in document order.
+
+    When buffers are deduplicated their digests are computed first (hashlib
+    releases the GIL), so only the first buffer with any content is encoded.
+    """
+    jobs = pickler.jobs
+    shared = pickler.shared
+    digests = [None] * len(jobs)
+    if shared is not None:
+        digests = codecs.map_parallel(lambda job: _digest(_raw(job[0])), jobs, pickler.workers)
+    first = []
+    for i, digest in enumerate(digests):
+        if digest is None or digest not in shared:
+            first.append(i)
+            if digest is not None:
+                shared.add(digest)
+    payloads = _encode_payloads([jobs[i][:2] for i in first], pickler.cache, pickler.workers, processes)
+    payloads = dict(zip(first, payloads))
+    for i, ((_, _, args), digest) in enumerate(zip(jobs, digests)):
+        if i not in payloads:
+            args[3] = {'id': digest}
+            continue
+        applied, buffer = payloads[i]
+        if digest is not None:
+            buffer = {'id': digest, 'data': buffer}
+        elif isinstance(args[3], dict):
+            # The buffer of an array viewed by a later one (see _base_view()).
+            args[3]['data'] = buffer
+            buffer = args[3]
+        args[3] = buffer
+        if applied is not None:
+            args.append(applied)
+    del jobs[:]
+
+
+def _decode_docs(unpickler, processes=False):
+    """Decodes the buffers of every ndarray in `unpickler.docs` ahead of time, in parallel."""
+    jobs = []
+    for doc in unpickler.docs:
+        buffer = doc['__reduce__'][1][3]
+        if not isinstance(buffer, dict) or 'data' in buffer and buffer['id'] not in unpickler.shared:
+            jobs.append(doc)
+    pool = unpickler.pool
+    if processes:
+        results = codecs.map_parallel(_decode_buffer, [doc['__reduce__'][1] for doc in jobs], unpickler.workers,
+                                      True)
+        if pool is not None:
+            results = [_pooled(pool, doc['__reduce__'][1][1], raw) for doc, raw in zip(jobs, results)]
+    else:
+        results = codecs.map_parallel(lambda doc: _decode_buffer(doc['__reduce__'][1], pool), jobs,
+                                      unpickler.workers)
+    for doc, buffer in zip(jobs, results):
+        args = doc['__reduce__'][1]
+        if isinstance(args[3], dict):
+            unpickler.shared[args[3]['id']] = buffer
+        else:
+            unpickler.buffers[id(doc)] = buffer
+
+
+def _typeref(cls):
+    """Returns a jsonpickle type reference for `cls`.
+
+    Older jsonpickle releases only recognise classes whose metaclass is `type`,
+    which rules out the ABCMeta based pandas array types.
+    """
+    return {tags.TYPE: '%s.%s' % (cls.__module__, cls.__name__)}
+
+
+def _smallest_int_dtype(size):
+    """Returns the narrowest signed integer dtype that can index `size` items (and -1)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class PandasCategoricalHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas Categorical objects.
+
+    Only the integer codes (in the narrowest dtype that holds them) and the
+    categories are stored, so the values are never expanded into a full object
+    array.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        flatten = pickler.flatten
+        categories = obj.categories
+        codes = _flatten_value(pickler, np.asarray(obj.codes).astype(_smallest_int_dtype(len(categories))))
+        if categories.dtype == object:
+            categories = flatten(tuple(categories.tolist()), reset=False)
+        else:
+            categories = _flatten_value(pickler, categories.values)
+        args = [codes, categories, bool(obj.ordered)]
+        data['__reduce__'] = (_typeref(pd.Categorical), args)
+        return data
+
+    def restore(self, obj):
+        cls, args = obj['__reduce__']
+        unpickler = self.context
+        restore = unpickler.restore
+        cls = restore(cls, reset=False)
+        codes = _restore_value(unpickler, args[0])
+        categories = _restore_value(unpickler, args[1])
+        return cls.from_codes(codes, categories, ordered=args[2])
+
+
+class PandasDatetimeArrayHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas DatetimeArrays, e.g. of timezone aware datetimes.
+
+    The payload arguments are the UTC datetimes (as a datetime64 ndarray) and
+    the dtype, e.g. 'datetime64[ns, Europe/London]'.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        values = np.asarray(obj.asi8).view('M8[%s]' % getattr(obj, 'unit', 'ns'))
+        data['__reduce__'] = (_typeref(type(obj)), [_flatten_value(pickler, values), str(obj.dtype)])
+        return data
+
+    def restore(self, obj):
+        _, args = obj['__reduce__']
+        index = pd.DatetimeIndex(_restore_value(self.context, args[0]))
+        tz = getattr(pd.api.types.pandas_dtype(args[1]), 'tz', None)
+        if tz is not None:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        return index.array
+
+
+class PandasPeriodArrayHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas PeriodArrays.
+
+    The payload arguments are the int64 period ordinals and the frequency.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        args = [_flatten_value(pickler, np.asarray(obj.asi8)), obj.freq.freqstr]
+        data['__reduce__'] = (_typeref(type(obj)), args)
+        return data
+
+    def restore(self, obj):
+        cls, args = obj['__reduce__']
+        unpickler = self.context
+        cls = unpickler.restore(cls, reset=False)
+        return cls(_restore_value(unpickler, args[0]), dtype=pd.PeriodDtype(args[1]))
+
+
+class PandasMaskedArrayHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas nullable integer, boolean and float arrays.
+
+    The payload arguments are the values (with 0 where they are missing) as
+    a numpy array and the boolean mask of the missing values.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        dtype = obj.dtype.numpy_dtype
+        values = obj.to_numpy(dtype=dtype, na_value=dtype.type(0))
+        args = [_flatten_value(pickler, values), _flatten_value(pickler, np.asarray(obj.isna()))]
+        data['__reduce__'] = (_typeref(type(obj)), args)
+        return data
+
+    def restore(self, obj):
+        cls, args = obj['__reduce__']
+        unpickler = self.context
+        cls = unpickler.restore(cls, reset=False)
+        return cls(_restore_value(unpickler, args[0]), _restore_value(unpickler, args[1]))
+
+
+class PandasIntervalArrayHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas IntervalArrays.
+
+    The payload arguments are the left and the right ends of the intervals
+    (see _values()) and the side they are closed on.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        left, right = (_flatten_value(pickler, _values(end)) for end in (obj.left, obj.right))
+        args = [left, right, obj.closed]
+        data['__reduce__'] = (_typeref(type(obj)), args)
+        return data
+
+    def restore(self, obj):
+        cls, args = obj['__reduce__']
+        unpickler = self.context
+        cls = unpickler.restore(cls, reset=False)
+        return cls.from_arrays(_restore_value(unpickler, args[0]), _restore_value(unpickler, args[1]),
+                               closed=args[2])
+
+
+def _values(obj):
+    """Returns the values of a Series, DataFrame column or Index, as a pandas extension array if they are one.
+
+    .values turns timezone aware datetimes into naive UTC ones, which the
+    extension arrays (see the handlers above) keep.
+    """
+    if pd.api.types.is_extension_array_dtype(obj.dtype):
+        return obj.array
+    return obj.values
+
+
+class PandasIndexHandler(BaseHandler):
+    """A jsonpickle handler for (de)serialising pandas Index objects of any type.
+
+    The payload arguments are the values of the index (see _values()), its
+    name and the frequency of a DatetimeIndex or TimedeltaIndex. A RangeIndex
+    stores {'range': [start, stop, step]} in place of its values and a
+    MultiIndex {'levels': [...]}, the Index of the values of every level, and
+    the list of its names.
+    """
+
+    def flatten(self, obj, data):
+        pickler = self.context
+        flatten = pickler.flatten
+        if isinstance(obj, pd.RangeIndex):
+            values = {'range': [int(obj.start), int(obj.stop), int(obj.step)]}
+        elif isinstance(obj, pd.MultiIndex):
+            values = {'levels': [_flatten_value(pickler, obj.get_level_values(i)) for i in range(obj.nlevels)]}
+        else:
+            values = _flatten_value(pickler, _values(obj))
+        name = flatten(list(obj.names) if isinstance(obj, pd.MultiIndex) else obj.name, reset=False)
+        freq = obj.freqstr if isinstance(obj, (pd.DatetimeIndex, pd.TimedeltaIndex)) else None
+        data['__reduce__'] = (_typeref(type(obj)), [values, name, freq])
+        return data
+
+    def restore(self, obj):
+        cls, args = obj['__reduce__']
+        unpickler = self.context
+        restore = unpickler.restore
+        cls = restore(cls, reset=False)
+        values, name, freq = args
+        name = restore(name, reset=False)
+        if isinstance(values, dict) and 'range' in values:
+            return cls(*values['range'], name=name)
+        if isinstance(values, dict) and 'levels' in values:
+            return cls.from_arrays([_restore_value(unpickler, level) for level in values['levels']], names=name)
+        values = _restore_value(unpickler, values)
+        if freq is not None:
+            return cls(values, name=name, freq=freq)
+        return cls(values, name=name)
 
 
 class PandasTimeSeriesHandler(BaseHandler):
-    """A jsonpickle handler for numpy (de)serialising pandas TimeSeries objects."""
+    """A jsonpickle handler for numpy (de)serialising pandas TimeSeries (and other Series) objects.
+
+    The payload arguments are the values (see _values()), the index (see
+    PandasIndexHandler) and the name of the series.
+    """
 
     def flatten(self, obj, data):
         pickler = self.context
         flatten = pickler.flatten
-        values = flatten(obj.values)
-        index = flatten(obj.index.values)
-        args = [values, index]
-        data['__reduce__'] = (flatten(pd.TimeSeries), args)
+        values = _flatten_value(pickler, _values(obj))
+        index = _flatten_value(pickler, obj.index)
+        args = [values, index, flatten(obj.name, reset=False)]
+        data['__reduce__'] = (flatten(type(obj), reset=False), args)
         return data
 
     def restore(self, obj):
@@ -50,22 +907,95 @@ class PandasTimeSeriesHandler(BaseHandler):
         unpickler = self.context
         restore = unpickler.restore
         cls = restore(cls, reset=False)
-        values = restore(args[0])
-        index = restore(args[1])
-        return cls(data=values, index=index)
+        values = _restore_value(unpickler, args[0])
+        index = _restore_value(unpickler, args[1])
+        name = restore(args[2], reset=False) if len(args) > 2 else None
+        return cls(data=values, index=index, name=name)
+
+
+def _chunk_spans(size, chunk_rows):
+    """Returns the [start, stop) row spans of the chunks `size` rows are written in, or None for one chunk."""
+    if not chunk_rows or not size:
+        return None
+    return [[start, min(start + chunk_rows, size)] for start in range(0, size, chunk_rows)]
+
+
+def _index_bounds(index, spans):
+    """Returns the smallest and the largest index value of every chunk, or None if the values don't order."""
+    starts = [start for start, _ in spans]
+    try:
+        if not isinstance(index, np.ndarray):
+            # Pandas extension arrays, whose bounds are kept in an array of the same type.
+            return tuple(index.take([start + getattr(index[start:stop], arg)() for start, stop in spans])
+                         for arg in ('argmin', 'argmax'))
+        return np.minimum.reduceat(index, starts), np.maximum.reduceat(index, starts)
+    except (TypeError, ValueError):
+        return None
+
+
+def _concat(parts, pool=None):
+    """Joins the chunks of a column (or index) back together.
+
+    With a BufferPool the chunks are joined into a pooled buffer, and their
+    own buffers handed back.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if isinstance(parts[0], pd.Index):
+        return parts[0].append(parts[1:])
+    if isinstance(parts[0], pd.Categorical):
+        # Every chunk of a Categorical column shares the categories of the column.
+        codes = np.concatenate([np.asarray(part.codes) for part in parts])
+        return pd.Categorical.from_codes(codes, parts[0].categories, ordered=parts[0].ordered)
+    if not isinstance(parts[0], np.ndarray):
+        # The other pandas extension arrays.
+        return type(parts[0])._concat_same_type(parts)
+    if pool is None or parts[0].dtype.hasobject:
+        return np.concatenate(parts)
+    dtype = parts[0].dtype
+    shape = (sum(len(part) for part in parts),) + parts[0].shape[1:]
+    out = np.ndarray(shape, dtype=dtype, buffer=pool.take(dtype, int(np.prod(shape)) * dtype.itemsize))
+    np.concatenate(parts, out=out)
+    pool.give(parts)
+    return out
 
 
 class PandasDataFrameHandler(BaseHandler):
-    """A jsonpickle handler for numpy (de)serialising pandas DataFrame objects."""
+    """A jsonpickle handler for numpy (de)serialising pandas DataFrame objects.
+
+    The payload arguments are the columns' values, the index (see
+    PandasIndexHandler) and the column labels. A frame encoded with `chunk_rows` stores every column and the index
+    as a list of row chunks instead, followed by a layout entry
+
+        {'spans': [[start, stop], ...], 'min': ndarray, 'max': ndarray}
+
+    giving the rows and the smallest and largest index value of every chunk
+    (the bounds are null if the index values don't order), which lets read()
+    skip the chunks it doesn't need.
+    """
 
     def flatten(self, obj, data):
         pickler = self.context
         flatten = pickler.flatten
-        values = [flatten(obj[col].values) for col in obj.columns]
-        index = flatten(obj.index.values)
-        columns = flatten(obj.columns.values)
-        args = [values, index, columns]
-        data['__reduce__'] = (flatten(pd.DataFrame), args)
+        arrays = [_values(obj[col]) for col in obj.columns]
+        columns = _flatten_value(pickler, obj.columns.values)
+        spans = _chunk_spans(len(obj), getattr(pickler, 'chunk_rows', None))
+        if spans is None:
+            _encode_columns(pickler, zip(obj.columns, arrays))
+            values = [_flatten_value(pickler, arr) for arr in arrays]
+            args = [values, _flatten_value(pickler, obj.index), columns]
+        else:
+            chunks = [[arr[start:stop] for start, stop in spans] for arr in arrays]
+            _encode_columns(pickler, [(col, chunk) for col, column in zip(obj.columns, chunks)
+                                      for chunk in column])
+            values = [[_flatten_value(pickler, chunk) for chunk in column] for column in chunks]
+            index_chunks = [_flatten_value(pickler, obj.index[start:stop]) for start, stop in spans]
+            bounds = _index_bounds(_values(obj.index), spans)
+            if bounds is not None:
+                bounds = [_flatten_value(pickler, bound) for bound in bounds]
+            layout = {'spans': spans, 'min': bounds and bounds[0], 'max': bounds and bounds[1]}
+            args = [values, index_chunks, columns, layout]
+        data['__reduce__'] = (flatten(pd.DataFrame, reset=False), args)
         return data
 
     def restore(self, obj):
@@ -73,13 +1003,337 @@ class PandasDataFrameHandler(BaseHandler):
         unpickler = self.context
         restore = unpickler.restore
         cls = restore(cls, reset=False)
-        values = restore(args[0])
-        index = restore(args[1])
-        columns = restore(args[2])
+        pool = getattr(unpickler, 'pool', None)
+        if len(args) > 3:
+            # Chunks may share buffers with other chunks when buffers are deduplicated,
+            # so they are only handed back to the pool when joined if none do.
+            joining = None if getattr(unpickler, 'definitions', None) else pool
+            _decode_columns(unpickler, [doc for column in args[0] for doc in column])
+            values = [_concat([_restore_value(unpickler, doc) for doc in column], joining) for column in args[0]]
+            index = _concat([_restore_value(unpickler, doc) for doc in args[1]], joining)
+        else:
+            _decode_columns(unpickler, args[0])
+            values = [_restore_value(unpickler, value) for value in args[0]]
+            index = _restore_value(unpickler, args[1])
+        columns = _restore_value(unpickler, args[2])
+        if pool is not None:
+            # Keep the columns in their pooled buffers, rather than copying them into new blocks.
+            return cls(dict(zip(columns, values)), index=index, copy=False)
         return cls(dict(zip(columns, values)), index=index)
 
+
+def _register(handler, *classes):
+    for cls in classes:
+        _HANDLERS[cls] = handler
+        handler.handles(cls)
+    _DISPATCH.clear()
+
+
 def register_handlers():
-    """Call this function to register handlers with jsonpickle module."""
-    NumpyArrayHandler.handles(np.ndarray)
-    PandasTimeSeriesHandler.handles(pd.TimeSeries)
-    PandasDataFrameHandler.handles(pd.DataFrame)
+    """Call this function to register handlers with jsonpickle module.
+
+    Subclasses of the classes handled (e.g. every pandas Index type) are
+    handled too when encoding with encode() and decoding with decode(). The
+    jsonpickle functions only find the handlers of the classes registered
+    here and of subclasses that encode() or decode() came across before.
+    """
+    _register(NumpyArrayHandler, np.ndarray)
+    _register(PandasCategoricalHandler, pd.Categorical)
+    _register(PandasTimeSeriesHandler, pd.TimeSeries, pd.Series)
+    _register(PandasDataFrameHandler, pd.DataFrame)
+    _register(PandasIndexHandler, pd.Index, pd.RangeIndex, pd.DatetimeIndex, pd.TimedeltaIndex, pd.PeriodIndex,
+              pd.CategoricalIndex, pd.IntervalIndex, pd.MultiIndex)
+    _register(PandasDatetimeArrayHandler, pd.arrays.DatetimeArray)
+    _register(PandasPeriodArrayHandler, pd.arrays.PeriodArray)
+    _register(PandasMaskedArrayHandler, pd.arrays.IntegerArray, pd.arrays.BooleanArray, pd.arrays.FloatingArray)
+    _register(PandasIntervalArrayHandler, pd.arrays.IntervalArray)
+
+
+def encode(obj, codec=None, dtype_codecs=None, column_codecs=None, workers=None, dedupe=False,
+           chunk_rows=None, canonical=False, cache=None):
+    """Returns a JSON string representation of `obj`, compressing array buffers as requested.
+
+    The handlers must have been registered with register_handlers() first.
+
+    Parameters
+    ----------
+    obj : object
+        the object to encode (typically a numpy array, pandas object or a
+        container of them).
+
+    codec : str
+        The codec specification applied to every array buffer, e.g. 'zlib'
+        or 'shuffle+lzma' (see pdutils.serialize.codecs). (optional)
+        Default: None (buffers are stored uncompressed)
+
+    dtype_codecs : dict
+        Maps a dtype name (e.g. 'float64') or dtype kind (e.g. 'f') to the
+        codec specification for arrays of that dtype. (optional)
+
+    column_codecs : dict
+        Maps DataFrame column names to the codec specification for that
+        column, overriding `dtype_codecs` and `codec`. (optional)
+
+    workers : int
+        The number of threads used to encode DataFrame columns. (optional)
+        Default: None (a thread pool sized for the machine)
+
+    dedupe : bool
+        If True array buffers with identical content are stored once and
+        referenced by their content digest everywhere else. The arrays restored
+        by decode() then share one buffer. Such documents need decode(), as
+        jsonpickle.decode() may restore a reference before the buffer it
+        refers to. (optional)
+        Default: False
+
+    chunk_rows : int
+        If given DataFrames are written in chunks of this many rows, with the
+        index bounds of every chunk, so that read() can skip the chunks
+        outside the rows it is asked for. (optional)
+        Default: None (one chunk)
+
+    canonical : bool
+        If True equal data always encodes to the same bytes: keys are sorted,
+        there is no whitespace, objects are written in full wherever they are
+        repeated rather than referenced by id (so they can't hold reference
+        cycles), dtypes are written as explicit type strings (e.g. '<f8') and
+        arrays as C ordered little endian memory. (optional)
+        Default: False
+
+    cache : EncodeCache
+        A cache of the payloads of arrays encoded before, e.g. by earlier
+        calls encoding the same frames. (optional)
+        Default: None (every array is encoded)
+
+    Returns
+    -------
+    string : str
+        The JSON document. It decodes with decode(), or unless `dedupe` is
+        True with jsonpickle.decode() too.
+    """
+    context = Pickler(codec=codec, dtype_codecs=dtype_codecs, column_codecs=column_codecs, workers=workers,
+                      dedupe=dedupe, chunk_rows=chunk_rows, canonical=canonical, cache=cache)
+    return jsonpickle.pickler.encode(obj, context=context, backend=context.backend)
+
+
+def content_hash(obj, **options):
+    """Returns a hex digest of the content of `obj`, e.g. to use as a cache key.
+
+    The digest is that of the canonical encoding of `obj` (see encode()), so
+    equal data always has the same digest whatever its memory layout, byte
+    order or the identity of the objects holding it. `options` are the other
+    encoding options of encode(), which change the digest when they change
+    the document.
+    """
+    string = encode(obj, canonical=True, **options)
+    return hashlib.blake2b(string.encode('ascii'), digest_size=32).hexdigest()
+
+
+def decode(string, workers=None, pool=None):
+    """Returns the object encoded in JSON `string`.
+
+    Parameters
+    ----------
+    string : str
+        A JSON document produced by encode() or jsonpickle.encode().
+
+    workers : int
+        The number of threads used to decode compressed DataFrame columns. (optional)
+        Default: None (a thread pool sized for the machine)
+
+    pool : BufferPool
+        If given array buffers are taken from (and decoded straight into)
+        buffers of this pool, which the caller hands back with pool.give()
+        once done with the object returned. DataFrame columns then stay in
+        their pooled buffers rather than being copied. (optional)
+        Default: None (new buffers are allocated)
+    """
+    context = Unpickler(workers=workers, pool=pool)
+    obj = context.backend.decode(string)
+    context.index(obj)
+    return context.restore(obj)
+
+
+def encode_batch(obj, workers=None, processes=False, **options):
+    """Returns the JSON document of `obj`, as encode() does, encoding its array buffers in parallel.
+
+    encode() writes the buffers one after the other as it walks `obj`, only
+    compressing the columns of a DataFrame in parallel. encode_batch() first
+    lays out the whole document, then encodes every array buffer in it (e.g.
+    of every frame in a tuple, list or dict) in a pool of workers, and fills
+    the payloads in in document order. The document is identical to the one
+    encode() returns with the same options.
+
+    Parameters
+    ----------
+    obj : object
+        the object to encode (typically a container of numpy and pandas
+        objects).
+
+    workers : int
+        The number of threads or processes encoding buffers. (optional)
+        Default: None (a pool sized for the machine)
+
+    processes : bool
+        If True the buffers are encoded in a process pool. base64 encoding
+        and the numpy based codecs hold the GIL, so only buffers compressed
+        with zlib, bz2 or lzma are encoded in parallel by threads. Processes
+        scale with the number of cores whatever the codec, but every buffer
+        is copied to the process encoding it. (optional)
+        Default: False
+
+    **options
+        The other encoding options of encode().
+    """
+    context = Pickler(workers=workers, batch=True, **options)
+    data = context.flatten(obj)
+    _encode_jobs(context, processes)
+    return context.backend.encode(data)
+
+
+def decode_batch(string, workers=None, processes=False, pool=None):
+    """Returns the object encoded in JSON `string`, decoding its array buffers in parallel.
+
+    Every array buffer in the document is decoded up front in a pool of
+    workers, before the objects are restored (see encode_batch() for
+    `workers` and `processes`). `pool` is a BufferPool as for decode().
+    """
+    context = Unpickler(workers=workers, pool=pool, batch=True)
+    obj = context.backend.decode(string)
+    context.index(obj)
+    _decode_docs(context, processes)
+    return context.restore(obj)
+
+
+def _index_key(bound, dtype):
+    """Returns index range `bound` as a value comparable with an index of `dtype`."""
+    if bound is None or not isinstance(dtype, np.dtype) or dtype.kind not in 'mM':
+        # Extension arrays (e.g. of timezone aware datetimes) compare with the bound as it is.
+        return bound
+    return np.array(bound).astype(dtype)[()]
+
+
+def _outside(lows, highs, index_range):
+    """Returns True for every chunk whose index bounds lie entirely outside `index_range`.
+
+    Chunks with NaN (or NaT) bounds are never outside, as every comparison with
+    them is False.
+    """
+    lo, hi = (_index_key(bound, lows.dtype) for bound in index_range)
+    outside = np.zeros(len(lows), dtype=bool)
+    if lo is not None:
+        outside |= highs < lo
+    if hi is not None:
+        outside |= lows > hi
+    return outside
+
+
+def _row_mask(index, selected, index_range):
+    """Returns the mask of the rows of `index` within `selected` rows and `index_range`, or None for all rows."""
+    mask = np.ones(len(index), dtype=bool) if selected is None else selected
+    if index_range is not None:
+        lo, hi = (_index_key(bound, index.dtype) for bound in index_range)
+        if lo is not None:
+            mask &= index >= lo
+        if hi is not None:
+            mask &= index <= hi
+    return None if mask.all() else mask
+
+
+def _selected_rows(size, rows):
+    if rows is None:
+        return None
+    selected = np.zeros(size, dtype=bool)
+    selected[rows] = True
+    return selected
+
+
+def _is_frame_doc(obj):
+    if not isinstance(obj, dict) or tags.OBJECT not in obj or '__reduce__' not in obj:
+        return False
+    cls = jsonpickle.unpickler.loadclass(obj[tags.OBJECT])
+    return isinstance(cls, type) and issubclass(cls, pd.DataFrame)
+
+
+def _read_frame(unpickler, obj, columns, rows, index_range):
+    cls, args = obj['__reduce__']
+    cls = unpickler.restore(cls, reset=False)
+    labels = list(_restore_value(unpickler, args[2]))
+    if columns is None:
+        columns = labels
+    missing = [col for col in columns if col not in labels]
+    if missing:
+        raise KeyError('columns not in the frame: %s' % missing)
+    index_parts = {}
+    if len(args) > 3:
+        chunks, index_docs, layout = args[0], args[1], args[3]
+        spans = layout['spans']
+        lows, highs = (None if layout[key] is None else _restore_value(unpickler, layout[key])
+                       for key in ('min', 'max'))
+    else:
+        chunks, index_docs = [[doc] for doc in args[0]], [args[1]]
+        index_parts[0] = _restore_value(unpickler, args[1])
+        spans, lows, highs = [[0, len(index_parts[0])]], None, None
+    selected = _selected_rows(spans[-1][1], rows)
+    keep = np.ones(len(spans), dtype=bool)
+    if selected is not None:
+        keep &= [selected[start:stop].any() for start, stop in spans]
+    if index_range is not None and lows is not None:
+        keep &= ~_outside(lows, highs, index_range)
+    # At least one chunk is read so that an empty result keeps the column dtypes.
+    keep = list(np.flatnonzero(keep)) or [0]
+    index = _concat([index_parts[i] if i in index_parts else _restore_value(unpickler, index_docs[i])
+                     for i in keep])
+    if selected is not None:
+        selected = np.concatenate([selected[spans[i][0]:spans[i][1]] for i in keep])
+    docs = [[chunks[labels.index(col)][i] for i in keep] for col in columns]
+    _decode_columns(unpickler, [doc for column in docs for doc in column])
+    values = [_concat([_restore_value(unpickler, doc) for doc in column]) for column in docs]
+    mask = _row_mask(index, selected, index_range)
+    if mask is not None:
+        index = index[mask]
+        values = [value[mask] for value in values]
+    return cls(dict(zip(columns, values)), index=index, columns=columns)
+
+
+def read(string, columns=None, rows=None, index_range=None, workers=None):
+    """Returns part of the DataFrame (or TimeSeries) encoded in JSON `string`.
+
+    Only the buffers of the columns selected are decoded. For a DataFrame
+    encoded with `chunk_rows` the chunks of rows outside `rows` and
+    `index_range` are skipped entirely too.
+
+    Parameters
+    ----------
+    string : str
+        A JSON document produced by encode() for a DataFrame or TimeSeries.
+
+    columns : list
+        The labels of the DataFrame columns to read, in the order wanted. (optional)
+        Default: None (every column)
+
+    rows : slice
+        The positions of the rows to read, e.g. slice(1000, 2000). (optional)
+        Default: None (every row)
+
+    index_range : tuple
+        The (lo, hi) bounds, both inclusive, of the index values of the rows
+        to read. Either bound may be None. (optional)
+        Default: None (every row)
+
+    workers : int
+        The number of threads used to decode compressed columns. (optional)
+        Default: None (a thread pool sized for the machine)
+    """
+    context = Unpickler(workers=workers)
+    obj = context.backend.decode(string)
+    context.index(obj)
+    if _is_frame_doc(obj):
+        return _read_frame(context, obj, columns, rows, index_range)
+    value = context.restore(obj)
+    if not isinstance(value, pd.Series):
+        raise TypeError('expected a DataFrame or TimeSeries document, got %s' % type(value).__name__)
+    if columns is not None:
+        raise ValueError('columns can only be selected from a DataFrame')
+    mask = _row_mask(value.index.values, _selected_rows(len(value), rows), index_range)
+    return value if mask is None else value[mask]
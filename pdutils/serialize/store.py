@@ -0,0 +1,222 @@
+"""An append-only store of a growing DataFrame or TimeSeries.
+
+A store is a directory of immutable frame files (see
+pdutils.serialize.files), one per appended chunk of rows, listed in order by a
+manifest:
+
+    {"format": "pdutils.store", "version": 1, "kind": "TimeSeries",
+     "columns": [...], "next": 3,
+     "chunks": [{"file": "chunk-000000.frame", "rows": 100, "bounds": ndarray}, ...]}
+
+"bounds" holds the smallest and largest index value of the chunk (or is null
+if the index values don't order), so reads can skip chunks outside the index
+range asked for. Appending writes one new chunk file and then replaces the
+manifest, which is only ever replaced atomically: a reader sees the chunks of
+one manifest, i.e. a consistent snapshot, however appends and compactions
+interleave with it.
+"""
+import os
+import threading
+
+import jsonpickle
+import jsonpickle.pickler
+import jsonpickle.unpickler
+import numpy as np
+import pandas as pd
+
+from pdutils.serialize import files
+from pdutils.serialize.json import Pickler, _flatten_value, _restore_value, _index_bounds, _outside, \
+    _selected_rows
+
+FORMAT = 'pdutils.store'
+VERSION = 1
+MANIFEST = 'manifest.json'
+
+#: The number of times a read starts over from a new manifest when a
+#: compaction removes the chunks of the one it started from.
+READ_ATTEMPTS = 5
+
+
+class AppendStore(object):
+    """An append-only store of a DataFrame or TimeSeries in directory `path`.
+
+    Appends and compactions must all be made through one AppendStore
+    instance, while any number of processes may read the store.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store. It is created if it does not exist.
+
+    **options
+        The encoding options used to write chunks, as for
+        pdutils.serialize.files.save() (codec, dtype_codecs, column_codecs,
+        workers and chunk_rows).
+    """
+
+    def __init__(self, path, **options):
+        self.path = path
+        self.options = options
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        if not os.path.exists(self._file(MANIFEST)):
+            self._write_manifest({'format': FORMAT, 'version': VERSION, 'kind': None, 'columns': None,
+                                  'next': 0, 'chunks': []})
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_manifest(self):
+        with open(self._file(MANIFEST), 'rb') as f:
+            manifest = jsonpickle.json.decode(f.read().decode('utf-8'))
+        if manifest.get('format') != FORMAT:
+            raise ValueError('not a frame store: %s' % self.path)
+        if manifest['version'] > VERSION:
+            raise ValueError('frame store version %s is not supported' % manifest['version'])
+        return manifest
+
+    def _write_manifest(self, manifest):
+        tmp = self._file(MANIFEST + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(jsonpickle.json.encode(manifest).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file(MANIFEST))
+
+    @staticmethod
+    def _claim(manifest):
+        """Returns the name of a new chunk file, recording it as used in `manifest`."""
+        name = 'chunk-%06d.frame' % manifest['next']
+        manifest['next'] += 1
+        return name
+
+    def _write_chunk(self, name, obj):
+        """Writes `obj` to chunk file `name`, returning its manifest entry."""
+        files.save(obj, self._file(name), **self.options)
+        index = obj.index.values
+        bounds = _index_bounds(index, [[0, len(index)]]) if len(index) else None
+        if bounds is not None:
+            bounds = _flatten_value(Pickler(), np.concatenate(bounds))
+        return {'file': name, 'rows': len(obj), 'bounds': bounds}
+
+    def __len__(self):
+        return sum(chunk['rows'] for chunk in self._read_manifest()['chunks'])
+
+    def chunks(self):
+        """Returns the number of rows of every chunk, in order."""
+        return [chunk['rows'] for chunk in self._read_manifest()['chunks']]
+
+    def append(self, obj):
+        """Appends the rows of DataFrame or TimeSeries `obj` as a new chunk.
+
+        Only the new rows are written. Every append must have the same kind
+        of object, and DataFrames the same columns, as the first.
+        """
+        if isinstance(obj, pd.DataFrame):
+            kind, columns = 'DataFrame', jsonpickle.pickler.Pickler().flatten(list(obj.columns))
+        elif isinstance(obj, pd.Series):
+            kind, columns = 'TimeSeries', None
+        else:
+            raise TypeError('expected a DataFrame or TimeSeries, got %s' % type(obj).__name__)
+        with self._lock:
+            manifest = self._read_manifest()
+            if manifest['kind'] is None:
+                manifest['kind'], manifest['columns'] = kind, columns
+            elif (kind, columns) != (manifest['kind'], manifest['columns']):
+                raise ValueError('cannot append a %s with columns %s to a store of %s with columns %s'
+                                 % (kind, columns, manifest['kind'], manifest['columns']))
+            manifest['chunks'].append(self._write_chunk(self._claim(manifest), obj))
+            self._write_manifest(manifest)
+
+    def read(self, columns=None, rows=None, index_range=None, workers=None):
+        """Returns the rows appended so far, or part of them.
+
+        The arguments select parts as for pdutils.serialize.json.read(),
+        `rows` counting from the first row of the store. Chunks outside
+        `rows` and `index_range` are not read at all.
+        """
+        for attempt in range(READ_ATTEMPTS):
+            manifest = self._read_manifest()
+            if not manifest['chunks']:
+                raise ValueError('the store is empty: %s' % self.path)
+            try:
+                return self._read(manifest, columns, rows, index_range, workers)
+            except (IOError, OSError):
+                # A compaction removed chunks of the manifest read, start over from the new one.
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    def _read(self, manifest, columns, rows, index_range, workers):
+        chunks = manifest['chunks']
+        stops = np.cumsum([chunk['rows'] for chunk in chunks])
+        selected = _selected_rows(int(stops[-1]), rows)
+        parts = []
+        for chunk, stop in zip(chunks, stops):
+            start = stop - chunk['rows']
+            local = None if selected is None else np.flatnonzero(selected[start:stop])
+            if local is not None and not len(local):
+                continue
+            if index_range is not None and chunk['bounds'] is not None:
+                bounds = _restore_value(jsonpickle.unpickler.Unpickler(), chunk['bounds'])
+                if _outside(bounds[:1], bounds[1:], index_range)[0]:
+                    continue
+            if local is not None and len(local) == chunk['rows']:
+                local = None
+            parts.append(files.load(self._file(chunk['file']), columns=columns, rows=local,
+                                    index_range=index_range, workers=workers))
+        if not parts:
+            # Nothing is selected, read none of the first chunk to keep its dtypes.
+            return files.load(self._file(chunks[0]['file']), columns=columns, rows=[], workers=workers)
+        return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+    def compact(self, target_rows=100000, wait=True):
+        """Merges runs of adjacent chunks into chunks of up to `target_rows` rows.
+
+        Appends and reads carry on while a compaction runs. The chunk files
+        merged are removed once the manifest no longer lists them.
+
+        Parameters
+        ----------
+        target_rows : int
+            Chunks are merged while the merged chunk has no more rows than this.
+
+        wait : bool
+            If False the compaction runs in a background thread, which is
+            returned (e.g. to join it). (optional)
+            Default: True
+        """
+        if not wait:
+            thread = threading.Thread(target=self.compact, args=(target_rows,))
+            thread.daemon = True
+            thread.start()
+            return thread
+        with self._compacting:
+            runs, run = [], []
+            for chunk in self._read_manifest()['chunks']:
+                if run and sum(c['rows'] for c in run) + chunk['rows'] > target_rows:
+                    runs.append(run)
+                    run = []
+                run.append(chunk)
+            runs.append(run)
+            for run in runs:
+                if len(run) > 1:
+                    self._merge(run)
+
+    def _merge(self, run):
+        names = [chunk['file'] for chunk in run]
+        merged = pd.concat([files.load(self._file(name)) for name in names])
+        with self._lock:
+            manifest = self._read_manifest()
+            name = self._claim(manifest)
+            self._write_manifest(manifest)
+        # Appends only add chunks after the ones merged, which carry on while it is written.
+        entry = self._write_chunk(name, merged)
+        with self._lock:
+            manifest = self._read_manifest()
+            start = [chunk['file'] for chunk in manifest['chunks']].index(names[0])
+            manifest['chunks'][start:start + len(names)] = [entry]
+            self._write_manifest(manifest)
+        for name in names:
+            os.remove(self._file(name))
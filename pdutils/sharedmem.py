@@ -0,0 +1,150 @@
+"""Passing DataFrames to worker processes through shared memory, without copying them.
+
+share() copies the column buffers, index and metadata of a DataFrame once into
+a block of shared memory, laid out as a pdutils.serialize.binary container,
+and returns a small picklable handle to it. Worker processes turn the handle
+back into a DataFrame whose columns view the shared buffers:
+
+    def work(handle):
+        df = handle.frame()
+        ...
+
+    with share(df) as handle:
+        pool.map(work, [handle] * n)
+
+The process calling share() owns the block, which lives until the handle is
+unlinked (leaving the with block unlinks it) however the workers end. Workers
+only ever attach to blocks, so a worker crashing leaks nothing. Blocks still
+owned by a process when it exits are unlinked then, or by the multiprocessing
+resource tracker if it crashes.
+
+The frames of a shared block are read-only, and are views of its memory on
+pandas releases that can construct a DataFrame without consolidating its
+columns (0.23 and later). Older releases copy the columns once in every worker.
+"""
+import atexit
+import os
+from multiprocessing import shared_memory
+
+from pdutils.serialize import binary
+
+#: Maps the name of every block created by this process, and not unlinked yet, to its handle.
+_owned = {}
+
+
+class SharedFrame(object):
+    """A handle to a block of shared memory holding a DataFrame (see share()).
+
+    Handles pickle to their block's name and size, so they can be passed to
+    worker processes.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._shm = None
+        self._view = None
+        self._owner = None
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (type(self).__name__, self.name, self.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def frame(self):
+        """Returns the DataFrame in the block, attaching this process to it first if need be."""
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        if self._view is None:
+            self._view = self._shm.buf.toreadonly()
+        return binary._read(self._view, copy=False)
+
+    def close(self):
+        """Detaches this process from the block, which stays for other processes to use.
+
+        Raises BufferError while frames returned by frame() still refer to the
+        block, as the block can't be unmapped under them.
+        """
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """Frees the block once every process has detached from it. Only the owner may unlink a block.
+
+        The owner is detached too, unless frames of the block are still in use
+        in it, in which case the memory is released when they are garbage
+        collected.
+        """
+        if self._owner != os.getpid():
+            raise ValueError('only the process that shared %s can unlink it' % self.name)
+        shm = self._shm or shared_memory.SharedMemory(name=self.name)
+        try:
+            shm.unlink()
+        finally:
+            _owned.pop(self.name, None)
+            self._owner = None
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+def share(df):
+    """Copies DataFrame `df` into a new block of shared memory, returning the SharedFrame handle to it.
+
+    Any other object pdutils.serialize.binary stores can be shared as well.
+    The calling process owns the block and must unlink it when the workers are
+    done with it, e.g. by using the handle as a context manager.
+    """
+    layout = binary._layout(df)
+    _, writer, index = layout
+    size = writer.end + len(index)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        binary._write(_MemoryWriter(shm.buf), layout)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    handle = SharedFrame(shm.name, size)
+    handle._shm = shm
+    handle._owner = os.getpid()
+    _owned[shm.name] = handle
+    return handle
+
+
+class _MemoryWriter(object):
+    """Writes sequentially into memoryview `buf`."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.position = 0
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self.buf[self.position:self.position + len(data)] = data
+        self.position += len(data)
+
+
+@atexit.register
+def _unlink_owned():
+    for handle in list(_owned.values()):
+        if handle._owner == os.getpid():
+            try:
+                handle.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdutils.serialize.json import register_handlers
+from pdutils.serialize import aio, files
+from pdutils.compare import ts_compare, df_compare
+from pdutils.assert_funcs import assert_
+
+register_handlers()
+
+
+def _frame(size=100):
+    index = pd.date_range('2000-01-01', periods=size, freq='D')
+    index.name = 'when'
+    return pd.DataFrame({'a': np.arange(size, dtype=float), 'b': np.arange(size) * 2,
+                         'c': np.arange(size) % 3 == 0}, index=index)
+
+
+def _body(path):
+    with open(path, 'rb') as f:
+        f.readline()
+        return f.read()
+
+
+@pytest.mark.parametrize('options', [{}, {'codec': 'zlib'}, {'chunk_rows': 7},
+                                     {'codec': 'auto+zlib', 'chunk_rows': 50, 'column_codecs': {'a': 'xor'}},
+                                     {'chunk_rows': 7, 'tree_rows': 4}])
+def test_save_writes_frame_files(tmpdir, options):
+    df = _frame()
+    df['d'] = pd.Categorical(['x', 'y'] * 50)
+    path, expected = str(tmpdir.join('frame')), str(tmpdir.join('expected'))
+    asyncio.run(aio.save(df, path, **options))
+    files.save(df, expected, **options)
+    assert _body(path) == _body(expected)
+    assert files.inspect(path) == files.inspect(expected)
+    assert files.load(path, verify=True).equals(df)
+    assert asyncio.run(aio.load(path, verify=True)).equals(df)
+
+
+def test_time_series_round_trip(tmpdir):
+    ts = pd.TimeSeries(np.arange(10.), pd.date_range('2000-01-01', periods=10), name='v')
+    path = str(tmpdir.join('ts'))
+    progress = []
+    asyncio.run(aio.save(ts, path, progress=lambda *args: progress.append(args), codec='zlib', tree_rows=1))
+    assert progress == [('v', 1, 1)]
+    assert_(ts_compare(ts, files.load(path)))
+    assert_(ts_compare(ts, asyncio.run(aio.load(path))))
+    assert files.load(path).name == asyncio.run(aio.load(path)).name == 'v'
+
+
+def test_progress_per_column(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    saved, loaded = [], []
+    asyncio.run(aio.save(df, path, progress=lambda *args: saved.append(args), queue_size=1))
+    assert saved == [('a', 1, 3), ('b', 2, 3), ('c', 3, 3)]
+    df_after = asyncio.run(aio.load(path, columns=['c', 'a'], progress=lambda *args: loaded.append(args)))
+    assert loaded == [('c', 1, 2), ('a', 2, 2)]
+    assert_(df_compare(df[['c', 'a']], df_after))
+
+
+def test_load_missing_column(tmpdir):
+    path = str(tmpdir.join('frame'))
+    asyncio.run(aio.save(_frame(), path))
+    with pytest.raises(KeyError):
+        asyncio.run(aio.load(path, columns=['a', 'z']))
+
+
+def test_header_longer_than_reserved(tmpdir, monkeypatch):
+    monkeypatch.setattr(aio, '_reserve', lambda *args: 16)
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    asyncio.run(aio.save(df, path, chunk_rows=10))
+    assert_(df_compare(df, files.load(path, verify=True)))
+    assert os.listdir(str(tmpdir)) == ['frame']
+
+
+def test_event_loop_keeps_running(tmpdir):
+    df = pd.DataFrame(np.random.RandomState(0).normal(size=(100000, 8)), index=np.arange(100000))
+    path = str(tmpdir.join('frame'))
+    ticks = []
+
+    async def main():
+        saving = asyncio.ensure_future(aio.save(df, path, codec='zlib'))
+        while not saving.done():
+            ticks.append(None)
+            await asyncio.sleep(0)
+        await saving
+
+    asyncio.run(main())
+    assert len(ticks) > 1
+    assert_(df_compare(df, files.load(path)))
+
+
+def test_cancelled_save_leaves_file_be(tmpdir):
+    path = str(tmpdir.join('frame'))
+    files.save(_frame(10), path)
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    async def main():
+        saving = asyncio.ensure_future(aio.save(_frame(), path, progress=lambda *args: saving.cancel()))
+        with pytest.raises(asyncio.CancelledError):
+            await saving
+
+    asyncio.run(main())
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    assert os.listdir(str(tmpdir)) == ['frame']
+
+
+class _SlowWrites(ThreadPoolExecutor):
+    """Runs the writes to files slowly, recording any that fails."""
+
+    def __init__(self):
+        ThreadPoolExecutor.__init__(self, 2)
+        self.errors = []
+
+    def submit(self, fn, *args):
+        if getattr(fn, '__name__', None) != 'write':
+            return ThreadPoolExecutor.submit(self, fn, *args)
+
+        def write(*args):
+            time.sleep(0.2)
+            try:
+                return fn(*args)
+            except Exception as e:
+                self.errors.append(e)
+                raise
+        return ThreadPoolExecutor.submit(self, write, *args)
+
+
+def test_cancelled_save_waits_for_writes_in_flight(tmpdir):
+    path = str(tmpdir.join('frame'))
+    executor = _SlowWrites()
+
+    async def main():
+        saving = asyncio.ensure_future(aio.save(_frame(), path, executor=executor))
+        await asyncio.sleep(0.1)
+        saving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await saving
+
+    asyncio.run(main())
+    executor.shutdown(wait=True)
+    assert executor.errors == []
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_unsupported_options(tmpdir):
+    path = str(tmpdir.join('frame'))
+    with pytest.raises(TypeError):
+        asyncio.run(aio.save(_frame(), path, dedupe=True))
+    assert os.listdir(str(tmpdir)) == []
+    files.save(_frame(), path)
+    with pytest.raises(TypeError):
+        files.update(_frame(), path, dedupe=True)
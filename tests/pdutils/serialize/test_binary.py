@@ -0,0 +1,170 @@
+import datetime as dt
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdutils.serialize import binary
+from pdutils.serialize.json import register_handlers
+from pdutils.compare import ndarray_compare, ts_compare, df_compare
+from pdutils.assert_funcs import assert_
+
+register_handlers()
+
+
+def _frame():
+    index = pd.date_range('2000-01-01', periods=5)
+    return pd.DataFrame({'a': np.arange(5, dtype=float), 'b': np.arange(5), 'c': list('vwxyz'),
+                         'd': pd.Categorical(list('xyxyx'))}, index=index)
+
+
+@pytest.mark.parametrize('arr', [
+    np.array([1, 2, 3]),
+    np.array([1., 2., np.nan]),
+    np.array([True, False]),
+    np.array(['foo', 'bar', 'baz']),
+    np.array([1 + 2j]),
+    np.array(7.),
+    np.zeros((0, 3)),
+    np.arange(12.).reshape(3, 4),
+    np.asfortranarray(np.arange(12.).reshape(3, 4)),
+    np.arange(24).reshape(4, 6)[::2, 1::2],
+    np.arange(12.).reshape(3, 4).T,
+    np.array(['1970-01-01', '2000-01-01'], dtype='M8[ns]'),
+    np.array([dt.datetime(1970, 1, 1, 12, 57), dt.date(1970, 1, 2), 'x', None], dtype=object),
+    np.arange(4, dtype='>i4'),
+])
+def test_array_round_trip(tmpdir, arr):
+    path = str(tmpdir.join('arr'))
+    binary.save(arr, path)
+    for arr_after in (binary.load(path), binary.load(path, mmap_mode=False), binary.loads(binary.dumps(arr))):
+        assert arr_after.shape == arr.shape
+        assert arr_after.dtype == arr.dtype
+        assert_(ndarray_compare(arr.ravel(), arr_after.ravel()))
+
+
+def test_time_series_round_trip():
+    ts = pd.TimeSeries([1., 2., 3.], pd.date_range('1970-01-01', periods=3, freq='S'), name='ts')
+    ts_after = binary.loads(binary.dumps(ts))
+    assert_(ts_compare(ts, ts_after))
+    assert ts_after.name == 'ts'
+
+
+def test_frame_round_trip():
+    df = _frame()
+    df_after = binary.loads(binary.dumps(df))
+    assert list(df_after.columns) == ['a', 'b', 'c', 'd']
+    assert_(df_compare(df[['a', 'b', 'c']], df_after[['a', 'b', 'c']]))
+    assert df_after['d'].tolist() == df['d'].tolist()
+
+
+def test_containers_round_trip():
+    arr = np.arange(3.)
+    obj = {'arrays': (arr, arr), 'frame': _frame()[['a']], 1: [None, 'x', 2.5]}
+    obj_after = binary.loads(binary.dumps(obj))
+    assert sorted(obj_after, key=str) == sorted(obj, key=str)
+    assert isinstance(obj_after['arrays'], tuple)
+    assert_(ndarray_compare(arr, obj_after['arrays'][1]))
+    assert obj_after[1] == [None, 'x', 2.5]
+    # An array referred to twice is stored once.
+    assert len(binary.dumps((arr, arr))) < len(binary.dumps((arr, arr.copy())))
+    assert obj_after['arrays'][0].__array_interface__['data'] == obj_after['arrays'][1].__array_interface__['data']
+
+
+def test_sections_are_aligned():
+    data = binary.dumps((np.arange(3, dtype=np.int8), np.arange(5.), np.arange(7, dtype=np.int16)))
+    arrays = binary.loads(data)
+    base = np.frombuffer(data, dtype=np.uint8).__array_interface__['data'][0]
+    for arr in arrays:
+        assert (arr.__array_interface__['data'][0] - base) % binary.ALIGNMENT == 0
+
+
+def test_load_maps_arrays_without_copying(tmpdir):
+    path = str(tmpdir.join('arr'))
+    binary.save(np.arange(1000.), path)
+    arr = binary.load(path)
+    assert not arr.flags.owndata
+    assert not arr.flags.writeable
+    assert arr.sum() == np.arange(1000.).sum()
+
+
+def test_header():
+    data = binary.dumps(np.arange(3.))
+    magic, version = struct.unpack_from('<8sH', data)
+    assert magic == binary.MAGIC
+    assert version == binary.VERSION
+
+
+@pytest.mark.parametrize('data', [b'', b'not a pdutils container', binary.MAGIC + b'\xff\xff' + b'\0' * 22])
+def test_bad_containers(data):
+    with pytest.raises(ValueError):
+        binary.loads(data)
+
+
+def test_load_maps_frame_columns_without_copying(tmpdir):
+    df = pd.DataFrame({'a': np.arange(1000.), 'b': np.arange(1000), 'c': np.arange(1000.) * 2})
+    path = str(tmpdir.join('frame'))
+    binary.save(df, path)
+    df_after = binary.load(path)
+    for name in df.columns:
+        values = df_after[name].values
+        assert not values.flags.writeable
+        assert values.base is not None and not values.flags.owndata
+    data = binary.dumps(df)
+    mapped = np.frombuffer(data, dtype=np.uint8)
+    df_after = binary.loads(data)
+    assert all(np.shares_memory(df_after[name].values, mapped) for name in df.columns)
+    data = binary.dumps(df['a'])
+    assert np.shares_memory(binary.loads(data).values, np.frombuffer(data, dtype=np.uint8))
+
+
+@pytest.mark.parametrize('index', [
+    pd.date_range('2000-01-01', periods=4, freq='D', name='when'),
+    pd.date_range('2000-01-01', periods=4, freq='H', tz='US/Eastern', name='when'),
+    pd.period_range('2000-01', periods=4, freq='M', name='month'),
+    pd.timedelta_range('1s', periods=4, freq='s'),
+    pd.RangeIndex(10, 50, 10, name='r'),
+    pd.Index(['w', 'x', 'y', 'z'], name=('a', 1)),
+    pd.CategoricalIndex(list('xyxy'), name='cat'),
+    pd.MultiIndex.from_product([['a', 'b'], [1, 2]], names=['letter', 'number']),
+])
+def test_index_round_trip(index):
+    df = pd.DataFrame({'a': np.arange(4.)}, index=index)
+    for obj in (df, df['a'], index):
+        obj_after = binary.loads(binary.dumps(obj))
+        index_after = obj_after if isinstance(obj, pd.Index) else obj_after.index
+        assert type(index_after) is type(index)
+        assert index_after.equals(index)
+        assert list(index_after.names) == list(index.names)
+        assert getattr(index_after, 'freq', None) == getattr(index, 'freq', None)
+        assert index_after.dtype == index.dtype
+
+
+def test_extension_columns_round_trip():
+    df = pd.DataFrame({'tz': pd.date_range('2000-01-01', periods=3, tz='Europe/London'),
+                       'p': pd.period_range('2000-01-01', periods=3, freq='D'),
+                       'i': pd.array([1, None, 3], dtype='Int64'), 'b': pd.array([True, None, False]),
+                       'f': pd.array([1.5, 2., None], dtype='Float64'),
+                       'iv': pd.arrays.IntervalArray.from_arrays([0., np.nan, 2.], [1., np.nan, 4.],
+                                                                 closed='left'),
+                       'ivtz': pd.interval_range(pd.Timestamp('2000-01-01', tz='UTC'), periods=3)})
+    df_after = binary.loads(binary.dumps(df))
+    assert list(df_after.dtypes) == list(df.dtypes)
+    assert df_after.equals(df)
+    for name in df.columns:
+        assert binary.loads(binary.dumps(df[name])).equals(df[name])
+        assert binary.loads(binary.dumps(df[name].array)).equals(df[name].array)
+        index = pd.Index(df[name].array, name='x')
+        index_after = binary.loads(binary.dumps(index))
+        assert type(index_after) is type(index) and index_after.equals(index) and index_after.dtype == index.dtype
+    data = binary.dumps(df[['i']])
+    assert np.shares_memory(binary.loads(data)['i'].array._data, np.frombuffer(data, np.uint8))
+
+
+def test_unsupported_extension_types():
+    values = pd.array(['x', None], dtype='string')
+    with pytest.raises(TypeError):
+        binary.dumps(pd.DataFrame({'a': values}))
+    with pytest.raises(TypeError):
+        binary.dumps(pd.Index(values))
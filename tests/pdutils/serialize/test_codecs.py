@@ -0,0 +1,152 @@
+import pytest
+import numpy as np
+
+from pdutils.serialize import codecs
+
+
+@pytest.mark.parametrize('spec', ['zlib', 'bz2', 'lzma', 'shuffle', 'shuffle+zlib', 'shuffle+lzma',
+                                  'delta', 'delta2+zlib', 'xor', 'xor+zlib', 'rle', 'rle+zlib',
+                                  'auto', 'auto+zlib'])
+@pytest.mark.parametrize('arr', [
+    np.arange(1000, dtype=np.int64),
+    np.linspace(0., 1., 1000),
+    np.array([True, False] * 500),
+    np.array(['foo', 'bar', 'baz']),
+])
+def test_codec_round_trip(spec, arr):
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, spec)
+    assert codecs.decode(buf, arr.dtype, applied) == arr.tostring()
+
+
+def test_shuffle_improves_compression():
+    raw = np.arange(10000, dtype=np.int64).tostring()
+    _, plain = codecs.encode(raw, np.int64, 'zlib')
+    _, shuffled = codecs.encode(raw, np.int64, 'shuffle+zlib')
+    assert len(shuffled) < len(plain) < len(raw)
+
+
+def test_codecs_are_skipped_for_other_dtypes():
+    buf = np.array([1., 2., 3.]).tostring()
+    assert codecs.encode(buf, np.float64, 'shuffle+zlib')[0] == 'shuffle+zlib'
+    assert codecs.encode(buf, np.float64, 'delta+zlib')[0] == 'zlib'
+    assert codecs.encode(buf, object, 'shuffle+zlib')[0] == 'zlib'
+    assert codecs.encode(buf, object, 'shuffle') == (None, buf)
+    assert codecs.encode(buf, np.float64, None) == (None, buf)
+
+
+@pytest.mark.parametrize('values', [
+    [],
+    [0],
+    [0, 1, -1, 63, -64, 64, -65, 2 ** 62, -2 ** 62],
+    [np.iinfo(np.int64).min, np.iinfo(np.int64).max, 0, np.iinfo(np.int64).max],
+])
+def test_zigzag_varint_round_trip(values):
+    values = np.array(values, dtype=np.int64)
+    buf = codecs.zigzag_varint_encode(values)
+    assert np.array_equal(codecs.zigzag_varint_decode(buf), values)
+
+
+def test_zigzag_varint_small_values_take_one_byte():
+    assert len(codecs.zigzag_varint_encode(np.array([0, 1, -1, 63, -64]))) == 5
+    assert len(codecs.zigzag_varint_encode(np.array([64, -65]))) == 4
+
+
+@pytest.mark.parametrize('arr', [
+    np.arange(1000, dtype=np.int64) * 7 + 3,
+    np.arange(1000, 0, -1, dtype=np.int32),
+    np.array([np.iinfo(np.int64).min, np.iinfo(np.int64).max, 0]),
+    np.array([np.iinfo(np.uint64).max, 0, 1], dtype=np.uint64),
+    np.array([5, 5, 5], dtype=np.int8),
+    np.arange('2000-01-01', '2000-02-01', dtype='datetime64[m]'),
+    np.array([1, 2, 3], dtype='timedelta64[s]'),
+    np.arange(100, dtype='>i8'),
+])
+@pytest.mark.parametrize('spec', ['delta', 'delta2'])
+def test_delta_codec_round_trip(arr, spec):
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, spec)
+    assert applied == spec
+    assert codecs.decode(buf, arr.dtype, applied) == arr.tostring()
+
+
+def test_auto_codec_picks_delta_for_regular_series():
+    arr = np.arange('2000-01-01', '2000-02-01', dtype='datetime64[s]').astype('datetime64[ns]')
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, 'auto+zlib')
+    assert applied == 'delta2+zlib'
+    assert len(buf) < len(arr.tostring()) // 100
+    assert codecs.decode(buf, arr.dtype, applied) == arr.tostring()
+
+
+def test_auto_codec_leaves_unsuitable_data_alone():
+    arr = np.random.RandomState(0).randint(-2 ** 62, 2 ** 62, 1000)
+    assert codecs.encode(arr.tostring(), arr.dtype, 'auto')[0] is None
+    assert codecs.encode(np.linspace(0., 1.).tostring(), np.float64, 'auto+zlib')[0] == 'zlib'
+
+
+@pytest.mark.parametrize('trial', range(10))
+def test_pack_bits_round_trip(trial):
+    rs = np.random.RandomState(trial)
+    widths = rs.randint(0, 65, 100)
+    values = rs.randint(0, 2 ** 63, 100).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+    values = np.where(widths == 64, values, values & ((np.uint64(1) << widths.astype(np.uint64)) - np.uint64(1)))
+    buf = codecs.pack_bits(values, widths)
+    assert len(buf) == -(-widths.sum() // 8)
+    assert np.array_equal(codecs.unpack_bits(buf, widths), values)
+
+
+@pytest.mark.parametrize('arr', [
+    np.array([]),
+    np.array([1.5]),
+    np.array([0., -0., np.nan, np.inf, -np.inf, 1e-300, 1e300, 0.]),
+    100. + np.cumsum(np.random.RandomState(0).normal(0., 0.05, 1000)),
+    np.random.RandomState(0).rand(1000).astype(np.float32),
+    np.random.RandomState(0).rand(1000).astype(np.float16),
+    np.sin(np.linspace(0., 10., 1000)).astype('>f8'),
+])
+def test_xor_codec_round_trip(arr):
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, 'xor')
+    assert applied == 'xor'
+    assert codecs.decode(buf, arr.dtype, applied) == arr.tostring()
+
+
+def test_xor_codec_compresses_smooth_series():
+    arr = np.repeat(np.sin(np.linspace(0., 10., 100)), 100)
+    _, buf = codecs.encode(arr.tostring(), arr.dtype, 'xor')
+    assert len(buf) < len(arr.tostring()) // 10
+
+
+@pytest.mark.parametrize('arr', [
+    np.array([], dtype=np.float64),
+    np.array([1.5]),
+    np.array([np.nan] * 10 + [1.] * 5 + [np.nan] * 3),
+    np.array([0., -0., -0., 0.]),
+    np.repeat(np.arange(10, dtype=np.int8), 50),
+    np.array([True] * 100 + [False]),
+    np.repeat(np.arange('2000-01-01', '2000-01-05', dtype='datetime64[D]'), 1000),
+    np.arange(100, dtype='>i4'),
+])
+def test_rle_codec_round_trip(arr):
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, 'rle')
+    assert applied == 'rle'
+    assert codecs.decode(buf, arr.dtype, applied) == arr.tostring()
+
+
+def test_rle_codec_treats_nan_runs_as_runs():
+    arr = np.array([np.nan] * 1000 + [1.] * 1000 + [np.nan] * 1000)
+    applied, buf = codecs.encode(arr.tostring(), arr.dtype, 'auto')
+    assert applied == 'rle'
+    assert len(buf) < 50
+
+
+def test_auto_codec_skips_rle_for_short_runs():
+    arr = np.repeat(np.random.RandomState(0).rand(500), 2)
+    assert codecs.encode(arr.tostring(), arr.dtype, 'auto')[0] is None
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        codecs.encode(b'abc', np.uint8, 'snappy')
+
+
+def test_map_parallel_preserves_order():
+    assert codecs.map_parallel(lambda x: x * 2, range(100), workers=4) == list(range(0, 200, 2))
+    assert codecs.map_parallel(lambda x: x * 2, range(3), workers=1) == [0, 2, 4]
@@ -0,0 +1,414 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdutils.serialize.json import register_handlers, decode
+from pdutils.serialize.files import save, load, inspect, update, compare, checksum, ChecksumError, locate, \
+    compare_files
+from pdutils.compare import ts_compare, df_compare
+from pdutils.assert_funcs import assert_
+
+register_handlers()
+
+
+def _frame(size=100):
+    index = pd.date_range('2000-01-01', periods=size, freq='D')
+    index.name = 'when'
+    return pd.DataFrame({'a': np.arange(size, dtype=float), 'b': np.arange(size) * 2,
+                         'c': np.arange(size) % 3 == 0}, index=index)
+
+
+@pytest.mark.parametrize('options', [{}, {'codec': 'zlib'}, {'chunk_rows': 7}, {'codec': 'auto+zlib', 'chunk_rows': 50}])
+def test_frame_round_trip(tmpdir, options):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, **options)
+    assert_(df_compare(df, load(path)))
+
+
+def test_time_series_round_trip(tmpdir):
+    ts = pd.TimeSeries(np.arange(10.), pd.date_range('2000-01-01', periods=10))
+    path = str(tmpdir.join('ts'))
+    save(ts, path, codec='zlib')
+    assert_(ts_compare(ts, load(path)))
+    assert load(path, rows=slice(8, None)).tolist() == [8., 9.]
+
+
+def test_body_is_a_json_document(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, chunk_rows=30)
+    with open(path, 'rb') as f:
+        f.readline()
+        assert_(df_compare(df, decode(f.read().decode('utf-8'))))
+
+
+def test_inspect(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path)
+    schema = inspect(path)
+    assert schema['kind'] == 'DataFrame'
+    assert schema['shape'] == [100, 3]
+    assert [column['name'] for column in schema['columns']] == ['a', 'b', 'c']
+    assert [column['dtype'] for column in schema['columns']] == ['float64', 'int64', 'bool']
+    assert schema['index']['type'] == 'DatetimeIndex'
+    assert schema['index']['dtype'] == 'datetime64[ns]'
+    assert schema['index']['name'] == 'when'
+
+
+def test_inspect_reads_only_the_header(tmpdir):
+    path = str(tmpdir.join('frame'))
+    save(_frame(), path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+    # Truncating the payloads leaves the schema readable.
+    with open(path, 'wb') as f:
+        f.write(header)
+    assert inspect(path)['shape'] == [100, 3]
+
+
+def test_column_offsets_locate_payloads(tmpdir):
+    path = str(tmpdir.join('frame'))
+    save(_frame(), path, chunk_rows=40)
+    schema = inspect(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        body = f.read()
+    for column in schema['columns']:
+        assert body[column['offset']:column['offset'] + 1] == b'['
+        assert len(column['chunks']) == 3
+        for offset, size in column['chunks']:
+            assert body[offset:offset + size].startswith(b'{"py/object": "numpy.ndarray"')
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 10])
+def test_load_selection(tmpdir, chunk_rows):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, codec='zlib', chunk_rows=chunk_rows)
+    df_after = load(path, columns=['b'], rows=slice(20, 30))
+    assert list(df_after.columns) == ['b']
+    assert df_after['b'].tolist() == df['b'].values[20:30].tolist()
+    df_after = load(path, index_range=('2000-01-10', '2000-01-12'))
+    assert df_after['a'].tolist() == [9., 10., 11.]
+
+
+def test_load_reads_only_selected_payloads(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, chunk_rows=10)
+    schema = inspect(path)
+    # Corrupt every payload load() is not expected to read.
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    start = data.index(b'\n') + 1
+    for column in schema['columns'][:2]:
+        for offset, size in column['chunks']:
+            data[start + offset:start + offset + size] = b'x' * size
+    for offset, size in schema['columns'][2]['chunks'][:5] + schema['columns'][2]['chunks'][6:]:
+        data[start + offset:start + offset + size] = b'x' * size
+    with open(path, 'wb') as f:
+        f.write(data)
+    df_after = load(path, columns=['c'], rows=slice(50, 60))
+    assert df_after['c'].tolist() == df['c'].values[50:60].tolist()
+
+
+def test_not_a_frame_file(tmpdir):
+    path = str(tmpdir.join('other'))
+    with open(path, 'w') as f:
+        f.write('{"py/tuple": [1]}\n')
+    with pytest.raises(ValueError):
+        inspect(path)
+    with pytest.raises(TypeError):
+        save([1, 2], path)
+
+
+def test_checksums_in_header(tmpdir):
+    df = _frame()
+    df['d'] = pd.Categorical(['x', 'y'] * 50)
+    path = str(tmpdir.join('frame'))
+    save(df, path, codec='zlib')
+    schema = inspect(path)
+    for column in schema['columns']:
+        assert column['crc32'] == checksum(df[column['name']].values)
+    assert schema['index']['crc32'] == checksum(df.index.values)
+
+
+def test_checksum_ignores_memory_layout():
+    arr = np.arange(12.).reshape(3, 4)
+    assert checksum(arr) == checksum(np.asfortranarray(arr))
+    assert checksum(np.arange(3.)) != checksum(np.arange(3))
+    assert checksum(np.array(['a', None], dtype=object)) == checksum(np.array(['a', None], dtype=object))
+
+
+def _corrupt(path, column):
+    schema = inspect(path)
+    entry = schema['columns'][column]
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    start = data.index(b'\n') + 1
+    # Flip one base64 character of the payload, which still decodes.
+    payload = data[start + entry['offset']:start + entry['offset'] + entry['size']]
+    position = start + entry['offset'] + payload.rindex(b'"]]}') - 20
+    data[position:position + 1] = b'B' if data[position:position + 1] != b'B' else b'C'
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_load_verifies_checksums(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path)
+    assert_(df_compare(df, load(path, verify=True)))
+    assert load(path, columns=['b'], rows=slice(2, 4), verify=True)['b'].tolist() == [4, 6]
+    _corrupt(path, 0)
+    load(path)
+    with pytest.raises(ChecksumError):
+        load(path, verify=True)
+    # Only the columns read are verified.
+    load(path, columns=['b'], verify=True)
+
+
+def test_update_skips_unchanged_columns(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    assert update(df, path, codec='zlib') == ['a', 'b', 'c']
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime - 10, mtime - 10))
+    assert update(df.copy(), path, codec='zlib') == []
+    assert os.path.getmtime(path) == mtime - 10
+
+    changed = df.copy()
+    changed['b'] = changed['b'] + 1
+    assert update(changed, path, codec='zlib') == ['b']
+    assert_(df_compare(changed, load(path, verify=True)))
+
+    added = changed.copy()
+    added['e'] = 1.5
+    assert update(added, path, codec='zlib', chunk_rows=None) == ['e']
+    assert_(df_compare(added, load(path, verify=True)))
+
+    shifted = added.copy()
+    shifted.index = shifted.index + pd.Timedelta(days=1)
+    assert update(shifted, path, codec='zlib') == []
+    assert_(df_compare(shifted, load(path, verify=True)))
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 30, 200])
+def test_update_chunked(tmpdir, chunk_rows):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, chunk_rows=30)
+    changed = df.copy()
+    changed['a'] = -changed['a']
+    written = update(changed, path, chunk_rows=chunk_rows)
+    assert written == (['a'] if chunk_rows == 30 else ['a', 'b', 'c'])
+    assert_(df_compare(changed, load(path, verify=True)))
+    assert load(path, columns=['c'], rows=slice(40, 45))['c'].tolist() == df['c'].values[40:45].tolist()
+
+
+def test_compare_with_golden_file(tmpdir, monkeypatch):
+    df = _frame()
+    path = str(tmpdir.join('golden'))
+    save(df, path, codec='zlib')
+    from pdutils.serialize import files
+    loaded = []
+    load = files.load
+    monkeypatch.setattr(files, 'load', lambda *args, **kwargs: loaded.append(kwargs) or load(*args, **kwargs))
+
+    assert compare(df.copy(), path)[0]
+    assert loaded == []
+
+    changed = df.copy()
+    changed['b'] = changed['b'] + 1
+    equivalent, msg = compare(changed, path)
+    assert not equivalent
+    assert "'b'" in msg and 'sum' in msg
+    assert loaded == []
+
+    # Swapped values have the same sketch, the column is read to find out.
+    changed = df.copy()
+    changed.iloc[[0, 1], 1] = changed.iloc[[1, 0], 1].values
+    equivalent, msg = compare(changed, path)
+    assert not equivalent
+    assert "'b'" in msg
+    assert loaded[-1]['columns'] == ['b']
+
+    close = df.copy()
+    close['a'] = close['a'] + 1e-12
+    assert compare(close, path)[0]
+
+    assert not compare(df[['a', 'b']], path)[0]
+    assert not compare(df.iloc[:10], path)[0]
+    assert not compare(df['a'], path)[0]
+
+
+def test_compare_time_series(tmpdir):
+    ts = pd.TimeSeries(np.arange(10.), pd.date_range('2000-01-01', periods=10))
+    path = str(tmpdir.join('golden'))
+    save(ts, path)
+    assert compare(ts, path)[0]
+    assert not compare(ts * 2, path)[0]
+
+
+def test_merkle_trees_in_header(tmpdir):
+    df = _frame()
+    path = str(tmpdir.join('frame'))
+    save(df, path, tree_rows=16)
+    schema = inspect(path)
+    assert schema['tree_rows'] == 16
+    tree = schema['columns'][0]['tree']
+    assert [len(level) for level in tree] == [1, 2, 4, 7]
+    assert [len(level) for level in schema['index']['tree']] == [1, 2, 4, 7]
+    changed = df.copy()
+    changed.iloc[99, 0] = -1.
+    save(changed, path, tree_rows=16)
+    after = inspect(path)['columns'][0]['tree']
+    assert [[a == b for a, b in zip(*levels)] for levels in zip(tree, after)] == \
+        [[False], [True, False], [True, True, True, False], [True] * 6 + [False]]
+    save(df, path, tree_rows=None)
+    assert 'tree_rows' not in inspect(path)
+    assert 'tree' not in inspect(path)['columns'][0]
+
+
+def test_lower_tree_levels_after_body(tmpdir, monkeypatch):
+    df = _frame()
+    path, other = str(tmpdir.join('frame')), str(tmpdir.join('other'))
+    save(df, path, tree_rows=4, chunk_rows=30)
+    schema = inspect(path)
+    assert [len(level) for level in schema['columns'][0]['tree']] == [1, 2, 4, 7]
+    assert [size // 16 for _, size in schema['columns'][0]['tree_levels']] == [13, 25]
+    assert 'trees' in schema
+    with open(path, 'rb') as f:
+        f.readline()
+        assert_(df_compare(df, decode(f.read(schema['trees'][0]).decode('utf-8'))))
+    assert_(df_compare(df, load(path)))
+    assert_(df_compare(df.iloc[5:10], load(path, rows=slice(5, 10))))
+
+    from pdutils.serialize import files
+    pages = []
+    page = files._Level._page
+    monkeypatch.setattr(files._Level, '_page', lambda self, i: pages.append(i) or page(self, i))
+    save(df, other, tree_rows=4)
+    assert locate(path, other) == {'index': [], 'columns': {}}
+    assert pages == []
+    changed = df.copy()
+    changed.iloc[97, 1] = -1
+    save(changed, other, tree_rows=4)
+    assert locate(path, other) == {'index': [], 'columns': {'b': [[96, 100]]}}
+    assert len(pages) == 4
+    assert not compare_files(path, other)[0]
+    assert not compare(changed, path)[0]
+
+
+def test_tree_walks_read_pages_along_the_way(tmpdir, monkeypatch):
+    df = _frame(5000)
+    left, right = str(tmpdir.join('left')), str(tmpdir.join('right'))
+    save(df, left, tree_rows=1)
+    changed = df.copy()
+    changed.iloc[4321, 0] = -1.
+    save(changed, right, tree_rows=1)
+    from pdutils.serialize import files
+    read = []
+    page = files._Level._page
+    monkeypatch.setattr(files._Level, '_page', lambda self, i: read.append(len(self)) or page(self, i))
+    assert locate(left, right) == {'index': [], 'columns': {'a': [[4321, 4322]]}}
+    # One page of each of the 10 levels below the header of both trees, of some 10000 nodes each.
+    assert len(read) == 20
+
+
+def test_locate(tmpdir):
+    df = _frame()
+    left, right = str(tmpdir.join('left')), str(tmpdir.join('right'))
+    save(df, left, tree_rows=16)
+    changed = df.copy()
+    changed.iloc[[40, 41, 90], 0] = -1.
+    changed.iloc[0, 2] = not changed.iloc[0, 2]
+    save(changed, right, tree_rows=16, chunk_rows=30, codec='zlib')
+    assert locate(left, right) == {'index': [], 'columns': {'a': [[32, 48], [80, 96]], 'c': [[0, 16]]}}
+    save(df, right, tree_rows=16)
+    assert locate(left, right) == {'index': [], 'columns': {}}
+    save(df, right, tree_rows=32)
+    assert locate(left, right) is None
+    save(df.iloc[:50], right, tree_rows=16)
+    assert locate(left, right) is None
+
+
+def test_compare_files(tmpdir, monkeypatch):
+    df = _frame(1000)
+    left, right = str(tmpdir.join('left')), str(tmpdir.join('right'))
+    save(df, left, tree_rows=100, chunk_rows=100)
+    from pdutils.serialize import files
+    loaded = []
+    load = files.load
+    monkeypatch.setattr(files, 'load', lambda *args, **kwargs: loaded.append(kwargs) or load(*args, **kwargs))
+
+    save(df, right, tree_rows=100, chunk_rows=100, codec='zlib')
+    assert compare_files(left, right) == (True, 'DataFrame contents are equivalent')
+    assert loaded == []
+
+    close = df.copy()
+    close['a'] = close['a'] + 1e-12
+    close.iloc[550, 1] = -1
+    save(close, right, tree_rows=100, chunk_rows=100)
+    equivalent, msg = compare_files(left, right)
+    assert not equivalent
+    assert "'b'" in msg and 'min' in msg
+    assert loaded == []
+
+    close.iloc[[550, 551], 1] = df.iloc[[551, 550], 1].values
+    save(close, right, tree_rows=100, chunk_rows=100)
+    equivalent, msg = compare_files(left, right)
+    assert not equivalent
+    assert "'b'" in msg
+    assert [kwargs['columns'] for kwargs in loaded] == [['a'], ['a'], ['b'], ['b']]
+    assert len(loaded[-1]['rows']) == 100
+
+    close.iloc[[550, 551], 1] = df.iloc[[550, 551], 1].values
+    save(close, right, tree_rows=100)
+    assert compare_files(left, right)[0]
+    assert not compare_files(left, right, rtol=0., atol=0.)[0]
+
+    moved = df.copy()
+    moved.index = moved.index + pd.Timedelta('1s')
+    save(moved, right, tree_rows=100)
+    assert compare_files(left, right) == (False, 'index values are not the same!')
+    save(df.iloc[:10], right)
+    assert not compare_files(left, right)[0]
+    save(df[['a', 'b']], right)
+    assert not compare_files(left, right)[0]
+    save(df, right, tree_rows=None)
+    assert compare_files(left, right)[0]
+
+
+def test_compare_files_time_series(tmpdir):
+    ts = pd.TimeSeries(np.arange(10.), pd.date_range('2000-01-01', periods=10))
+    left, right = str(tmpdir.join('left')), str(tmpdir.join('right'))
+    save(ts, left, tree_rows=4)
+    save(ts, right, tree_rows=4)
+    assert compare_files(left, right) == (True, 'TimeSeries contents are equivalent')
+    save(ts * 2, right, tree_rows=4)
+    assert not compare_files(left, right)[0]
+    assert locate(left, right)['columns'] == {None: [[0, 10]]}
+    save(ts, right)
+    assert compare_files(left, right)[0]
+
+
+def test_compare_reads_only_differing_blocks(tmpdir, monkeypatch):
+    df = _frame(1000)
+    path = str(tmpdir.join('golden'))
+    save(df, path, tree_rows=100, chunk_rows=100)
+    from pdutils.serialize import files
+    loaded = []
+    load = files.load
+    monkeypatch.setattr(files, 'load', lambda *args, **kwargs: loaded.append(kwargs) or load(*args, **kwargs))
+    changed = df.copy()
+    changed.iloc[[10, 999], 0] = changed.iloc[[10, 999], 0] + 1e-12
+    assert compare(changed, path)[0]
+    assert loaded[-1]['columns'] == ['a']
+    assert loaded[-1]['rows'].tolist() == list(range(100)) + list(range(900, 1000))
+    changed.iloc[999, 0] = -1.
+    assert not compare(changed, path)[0]
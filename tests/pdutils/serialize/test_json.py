@@ -1,11 +1,13 @@
 import datetime as dt
+import zlib
 
 import pytest
 import jsonpickle
 import numpy as np
 import pandas as pd
 
-from pdutils.serialize.json import register_handlers
+from pdutils.serialize.json import register_handlers, encode, decode, encode_batch, decode_batch, read, \
+    BufferPool, EncodeCache, content_hash
 from pdutils.compare import ndarray_compare, ts_compare, df_compare
 from pdutils.assert_funcs import assert_
 
@@ -60,3 +62,640 @@ def test_mixed_python_and_pandas_types():
     assert_(ndarray_compare(data[0], data_after[0]))
     assert_(ts_compare(data[1], data_after[1]))
     assert_(df_compare(data[2], data_after[2]))
+
+
+def test_pandas_categorical_dataframe_handler():
+    df = pd.DataFrame({
+        'a': pd.Categorical(['foo', 'bar', 'foo', None]),
+        'b': [1, 2, 3, 4],
+    }, index=pd.date_range('1970-01-01', periods=4, freq='S'))
+    buf = jsonpickle.encode(df)
+    df_after = jsonpickle.decode(buf)
+
+    assert str(df_after['a'].dtype) == 'category'
+    assert df_after['a'].cat.categories.tolist() == ['bar', 'foo']
+    assert df_after['a'].cat.codes.tolist() == [1, 0, 1, -1]
+    assert_(ndarray_compare(df['b'].values, df_after['b'].values))
+    assert_(ndarray_compare(df.index.values, df_after.index.values))
+
+
+def test_pandas_categorical_handler_uses_narrow_codes():
+    cat = pd.Categorical(['foo', 'bar', 'baz'] * 1000, ordered=True)
+    buf = jsonpickle.encode(cat)
+    assert '"int8"' in buf
+
+    cat_after = jsonpickle.decode(buf)
+    assert cat_after.ordered
+    assert cat_after.categories.tolist() == cat.categories.tolist()
+    assert_(ndarray_compare(np.asarray(cat.codes), np.asarray(cat_after.codes)))
+
+
+@pytest.mark.parametrize('options', [
+    {'codec': 'zlib'},
+    {'codec': 'shuffle+lzma', 'workers': 1},
+    {'dtype_codecs': {'f': 'shuffle+zlib', 'int64': 'bz2'}},
+    {'codec': 'zlib', 'column_codecs': {1: 'shuffle+bz2'}},
+])
+def test_compressed_encoding(options):
+    df = pd.DataFrame({0: np.arange(1000), 1: np.linspace(0., 1., 1000)},
+                      index=pd.date_range('1970-01-01', periods=1000, freq='S'))
+    buf = encode(df, **options)
+    assert len(buf) < len(jsonpickle.encode(df))
+    assert_(df_compare(df, decode(buf)))
+    assert_(df_compare(df, jsonpickle.decode(buf)))
+
+
+def test_codec_is_recorded_in_payload():
+    buf = encode(np.arange(100), dtype_codecs={'i': 'zlib'}, column_codecs={0: 'bz2'})
+    assert '"zlib"' in buf and '"bz2"' not in buf
+
+    df = pd.DataFrame({0: np.arange(100), 1: np.arange(100)})
+    buf = encode(df, dtype_codecs={'i': 'zlib'}, column_codecs={0: 'bz2'})
+    assert '"zlib"' in buf and '"bz2"' in buf
+
+
+def test_uncompressed_payloads_decode_with_decode():
+    data = (np.array([1., 2., 3.]), pd.DataFrame({0: [1, 2, 3]}, index=[0, 1, 2]))
+    data_after = decode(jsonpickle.encode(data))
+    assert_(ndarray_compare(data[0], data_after[0]))
+    assert_(df_compare(data[1], data_after[1]))
+
+
+def test_auto_codec_shrinks_time_series_index():
+    ts = pd.TimeSeries(np.arange(10000), pd.date_range('1970-01-01', periods=10000, freq='S'))
+    buf = encode(ts, codec='auto')
+    assert '"delta2"' in buf
+    assert len(buf) < len(jsonpickle.encode(ts)) // 5
+    assert_(ts_compare(ts, decode(buf)))
+
+
+def test_xor_codec_selected_per_column():
+    df = pd.DataFrame({'price': 100. + np.cumsum(np.random.RandomState(0).normal(0., 0.05, 1000)),
+                       'size': np.arange(1000.)}, index=pd.date_range('1970-01-01', periods=1000, freq='S'))
+    buf = encode(df, column_codecs={'price': 'xor+zlib'})
+    assert buf.count('"xor+zlib"') == 1
+    assert_(df_compare(df, decode(buf), rtol=0, atol=0))
+
+
+def test_auto_codec_run_length_encodes_forward_filled_columns():
+    index = pd.date_range('1970-01-01', periods=10000, freq='S')
+    df = pd.DataFrame({'flag': np.repeat([True, False], 5000),
+                       'price': np.repeat([np.nan, 1.5, np.nan, 2.5], 2500)}, index=index)
+    buf = encode(df, codec='auto+zlib')
+    assert buf.count('"rle+zlib"') == 2
+    assert len(buf) < 2000
+    assert_(df_compare(df, decode(buf), rtol=0, atol=0))
+
+
+@pytest.mark.parametrize('codec', [None, 'zlib'])
+def test_dedupe_stores_shared_buffers_once(codec):
+    index = pd.date_range('1970-01-01', periods=1000, freq='S')
+    values = np.linspace(0., 1., 1000)
+    data = {
+        'a': pd.DataFrame({0: values, 1: values * 2}, index=index),
+        'b': pd.DataFrame({0: values, 2: np.arange(1000.)}, index=index),
+        'c': pd.TimeSeries(values, index=index),
+        'd': values,
+    }
+    buf = encode(data, codec=codec, dedupe=True)
+    assert len(buf) < len(encode(data, codec=codec)) * 0.7
+    assert buf.count('"data"') == 6  # values, values * 2, arange, index and two column labels
+
+    data_after = decode(buf)
+    assert_(df_compare(data['a'], data_after['a']))
+    assert_(df_compare(data['b'], data_after['b']))
+    assert_(ts_compare(data['c'], data_after['c']))
+    assert_(ndarray_compare(data['d'], data_after['d']))
+    assert np.shares_memory(data_after['a'].index.values, data_after['b'].index.values)
+    assert np.shares_memory(data_after['c'].index.values, data_after['b'].index.values)
+
+
+def test_dedupe_resolves_references_in_any_order():
+    values = np.arange(10.)
+    # Integer keys are sorted differently once they have been turned into strings.
+    data = {10: values, 2: values}
+    data_after = decode(encode(data, dedupe=True))
+    assert_(ndarray_compare(values, data_after['10']))
+    assert_(ndarray_compare(values, data_after['2']))
+    assert np.shares_memory(data_after['10'], data_after['2'])
+    # Swapped, so that a plain jsonpickle Unpickler comes across the reference first.
+    doc = jsonpickle.json.decode(encode({'a': values, 'b': values.copy()}, dedupe=True))
+    doc['a'], doc['b'] = doc['b'], doc['a']
+    assert 'data' in doc['b']['__reduce__'][1][3]
+    string = jsonpickle.json.encode(doc)
+    assert np.shares_memory(*decode(string).values())
+    with pytest.raises(ValueError, match='decode'):
+        jsonpickle.decode(string)
+
+
+def test_dict_with_repeated_references():
+    arr = np.array([1., 2., 3.])
+    df = pd.DataFrame({0: [1, 2, 3]}, index=[0, 1, 2])
+    data = {'arr': arr, 'df': df, 'both': [arr, df, arr, df]}
+    data_after = jsonpickle.decode(jsonpickle.encode(data))
+
+    assert_(ndarray_compare(arr, data_after['arr']))
+    assert_(df_compare(df, data_after['df']))
+    assert data_after['both'][0] is data_after['arr']
+    assert data_after['both'][3] is data_after['df']
+
+
+BASE = np.arange(24.).reshape(4, 6)
+
+
+@pytest.mark.parametrize('arr', [
+    BASE.T,
+    BASE[:, ::2],
+    BASE[::-1],
+    BASE[1:3, 2:5],
+    np.asfortranarray(BASE),
+    np.array(5.),
+    np.empty((0, 3)),
+    np.arange(6, dtype='>i4').reshape(2, 3).T,
+])
+def test_numpy_array_handler_views(arr):
+    for arr_after in (jsonpickle.decode(jsonpickle.encode(arr)), decode(encode(arr, codec='zlib'))):
+        assert arr_after.shape == arr.shape
+        assert arr_after.dtype == arr.dtype
+        assert np.array_equal(arr_after, arr)
+
+
+def test_numpy_array_handler_keeps_fortran_order():
+    arr_after = decode(encode(np.asfortranarray(BASE)))
+    assert arr_after.flags.f_contiguous and not arr_after.flags.c_contiguous
+
+
+def test_views_refer_to_their_base():
+    base = BASE.copy()
+    data = (base, base[:, 1], base.T, base[::-1, ::2])
+    buf = encode(data)
+    assert buf.count('"data"') == 1
+    assert buf.count('"offset"') == 3
+
+    data_after = decode(buf)
+    for arr, arr_after in zip(data, data_after):
+        assert np.array_equal(arr, arr_after)
+        assert np.shares_memory(data_after[0], arr_after)
+
+
+def test_object_arrays_store_their_items():
+    arr = np.array(['foo', 1, None, dt.date(1970, 1, 1)], dtype=object).reshape(2, 2)
+    buf = jsonpickle.encode(arr)
+    assert '"items"' in buf and '"foo"' in buf
+
+    arr_after = jsonpickle.decode(buf)
+    assert arr_after.shape == (2, 2)
+    assert arr_after.tolist() == arr.tolist()
+
+
+def _frame(size=100):
+    index = pd.date_range('2000-01-01', periods=size, freq='D')
+    return pd.DataFrame({'a': np.arange(size, dtype=float), 'b': np.arange(size) * 2,
+                         'c': np.arange(size) % 3 == 0}, index=index)
+
+
+def _count_decoded(monkeypatch):
+    from pdutils.serialize import json as json_module
+    calls = []
+    decode_buffer = json_module._decode_buffer
+
+    def counting(args, *rest):
+        calls.append(args)
+        return decode_buffer(args, *rest)
+    monkeypatch.setattr(json_module, '_decode_buffer', counting)
+    return calls
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 100, 1000])
+def test_chunked_frames_round_trip(chunk_rows):
+    df = _frame()
+    assert_(df_compare(df, decode(encode(df, codec='zlib', chunk_rows=chunk_rows))))
+    assert_(df_compare(df, jsonpickle.decode(encode(df, chunk_rows=chunk_rows))))
+
+
+def test_chunked_categorical_column_round_trips():
+    df = pd.DataFrame({'a': pd.Categorical(['x', 'y', 'z', 'x', 'y'])}, index=pd.date_range('2000', periods=5))
+    df_after = decode(encode(df, chunk_rows=2))
+    assert df_after['a'].tolist() == df['a'].tolist()
+
+
+def test_read_decodes_selected_columns_only(monkeypatch):
+    df = _frame()
+    buf = encode(df, codec='zlib')
+    calls = _count_decoded(monkeypatch)
+    df_after = read(buf, columns=['c', 'a'])
+    assert list(df_after.columns) == ['c', 'a']
+    assert_(df_compare(df[['c', 'a']], df_after))
+    # The two columns and the index.
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize('rows', [slice(10, 25), slice(None, 3), slice(95, None), slice(-5, None),
+                                  slice(0, 100, 10), slice(200, 300)])
+def test_read_rows(rows):
+    df = _frame()
+    for chunk_rows in (None, 10):
+        df_after = read(encode(df, chunk_rows=chunk_rows), columns=['a'], rows=rows)
+        assert df_after['a'].tolist() == df['a'].values[rows].tolist()
+        assert list(df_after.index) == list(df.index[rows])
+
+
+def test_read_rows_skips_chunks(monkeypatch):
+    buf = encode(_frame(), chunk_rows=10)
+    calls = _count_decoded(monkeypatch)
+    df_after = read(buf, columns=['a'], rows=slice(15, 25))
+    assert df_after['a'].tolist() == list(range(15, 25))
+    # The chunk index bounds, then the index and column of rows 10-19 and 20-29.
+    assert len(calls) == 2 + 2 * 2
+
+
+@pytest.mark.parametrize('index_range', [
+    ('2000-01-05', '2000-01-20'),
+    (None, pd.Timestamp('2000-01-03')),
+    (dt.datetime(2000, 3, 30), None),
+    ('1999-01-01', '1999-12-31'),
+])
+def test_read_index_range(index_range):
+    df = _frame()
+    lo, hi = index_range
+    expected = df[(df.index >= (lo or df.index[0])) & (df.index <= (hi or df.index[-1]))]
+    for chunk_rows in (None, 10):
+        df_after = read(encode(df, chunk_rows=chunk_rows), index_range=index_range)
+        assert list(df_after.index) == list(expected.index)
+        assert df_after['b'].tolist() == expected['b'].tolist()
+        assert df_after['b'].dtype == df['b'].dtype
+
+
+def test_read_index_range_skips_chunks(monkeypatch):
+    buf = encode(_frame(), chunk_rows=10)
+    calls = _count_decoded(monkeypatch)
+    df_after = read(buf, columns=['b'], index_range=('2000-01-12', '2000-01-15'))
+    assert df_after['b'].tolist() == [22, 24, 26, 28]
+    assert len(calls) == 2 + 2
+
+
+def test_read_unordered_index():
+    df = pd.DataFrame({'a': [1, 2, 3, 4]}, index=['d', 'a', 'c', 'b'])
+    df_after = read(encode(df, chunk_rows=2), index_range=('b', 'c'))
+    assert list(df_after.index) == ['c', 'b']
+
+
+def test_read_time_series():
+    ts = pd.TimeSeries(np.arange(10.), pd.date_range('2000-01-01', periods=10))
+    assert read(encode(ts), rows=slice(2, 4)).tolist() == [2., 3.]
+    assert read(encode(ts), index_range=('2000-01-09', None)).tolist() == [8., 9.]
+    with pytest.raises(ValueError):
+        read(encode(ts), columns=['a'])
+
+
+def test_read_missing_column():
+    with pytest.raises(KeyError):
+        read(encode(_frame()), columns=['x'])
+
+
+def _base(arr):
+    while isinstance(arr, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+@pytest.mark.parametrize('options', [{}, {'codec': 'zlib'}, {'codec': 'auto+zlib'}, {'codec': 'xor'},
+                                     {'codec': 'shuffle+lzma'}, {'dedupe': True}, {'chunk_rows': 3}])
+def test_decode_into_pool(options):
+    df = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10), 'c': np.arange(10.)},
+                      index=pd.date_range('2000', periods=10))
+    pool = BufferPool()
+    df_after = decode(encode(df, **options), pool=pool)
+    assert_(df_compare(df, df_after))
+    df_after['a'].values[0] = 42.
+    pool.give(df_after)
+    assert len(pool) > 0
+
+
+def test_pool_reuses_buffers():
+    df = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10)}, index=pd.date_range('2000', periods=10))
+    buf = encode(df, codec='zlib')
+    pool = BufferPool()
+    first = decode(buf, pool=pool)
+    bases = set(id(_base(first[col].values)) for col in first.columns)
+    assert all(isinstance(_base(first[col].values), bytearray) for col in first.columns)
+    pool.give(first)
+    del first
+    free = len(pool)
+    second = decode(buf, pool=pool)
+    assert_(df_compare(df, second))
+    assert set(id(_base(second[col].values)) for col in second.columns) <= bases
+    assert len(pool) < free
+
+
+def test_pool_arrays_and_containers():
+    pool = BufferPool(max_free=1)
+    arr = np.arange(100.)
+    obj = decode(encode({'x': arr, 'y': (arr * 2, 'z')}), pool=pool)
+    assert_(ndarray_compare(arr, obj['x']))
+    pool.give(obj)
+    # The two arrays share a size and dtype, one of them is kept.
+    assert len(pool) == 1
+    pool.give(np.arange(3))
+    assert len(pool) == 1
+
+
+def test_b64_decode_in_steps(monkeypatch):
+    from pdutils.serialize import json as json_module
+    monkeypatch.setattr(json_module, '_B64_STEP', 8)
+    arr = np.arange(33, dtype=np.uint8)
+    assert_(ndarray_compare(arr, decode(encode(arr), pool=BufferPool())))
+
+
+def test_pool_with_deduplicated_chunks():
+    df = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10.) * 2, 'c': np.arange(10.)},
+                      index=pd.date_range('2000', periods=10))
+    assert_(df_compare(df, decode(encode(df, dedupe=True, chunk_rows=5), pool=BufferPool())))
+
+
+def _canonical_frame():
+    index = pd.date_range('2000-01-01', periods=6)
+    return pd.DataFrame({'a': np.arange(6.), 'b': np.arange(6), 'c': ['x', 'y', 'z'] * 2,
+                         'd': pd.Categorical(['p', 'q'] * 3)}, index=index)
+
+
+def test_canonical_encoding_round_trips():
+    df = _canonical_frame()
+    df_after = decode(encode(df, canonical=True))
+    assert_(df_compare(df[['a', 'b', 'c']], df_after[['a', 'b', 'c']]))
+    arr = np.arange(6, dtype='>i4').reshape(2, 3)
+    arr_after = decode(encode(arr, canonical=True))
+    assert arr_after.tolist() == arr.tolist()
+    assert arr_after.dtype == np.dtype('<i4')
+
+
+def test_canonical_encoding_is_byte_identical():
+    df = _canonical_frame()
+    same = pd.DataFrame(dict((col, df[col].values.copy()) for col in reversed(df.columns)), index=df.index.copy())
+    same = same[list(df.columns)]
+    assert encode(df, canonical=True) == encode(same, canonical=True)
+    assert encode(df, canonical=True, codec='auto+zlib') == encode(same, canonical=True, codec='auto+zlib')
+
+
+def test_canonical_encoding_ignores_layout_byte_order_and_identity():
+    arr = np.arange(12.).reshape(3, 4)
+    canonical = encode(arr, canonical=True)
+    assert encode(np.asfortranarray(arr), canonical=True) == canonical
+    assert encode(arr.astype('>f8'), canonical=True) == canonical
+    assert encode(np.arange(24.).reshape(3, 8)[:, ::2] / 2, canonical=True) == canonical
+
+    dates = [dt.date(2000, 1, 1)] * 2
+    distinct = [dt.date(2000, 1, 1), dt.date(2000, 1, 1)]
+    assert encode(np.array(dates, dtype=object), canonical=True) == \
+        encode(np.array(distinct, dtype=object), canonical=True)
+
+    base = np.arange(10.)
+    assert encode({'x': base, 'y': base[2:5]}, canonical=True) == \
+        encode({'y': np.arange(2., 5.), 'x': np.arange(10.)}, canonical=True)
+
+
+def test_canonical_dtype_strings():
+    assert '"<f8"' in encode(np.arange(3.), canonical=True)
+    assert ', ' not in encode(np.arange(3.), canonical=True)
+    assert '"float64"' in encode(np.arange(3.))
+
+
+def test_content_hash():
+    df = _canonical_frame()
+    assert content_hash(df) == content_hash(df.copy())
+    assert len(content_hash(df)) == 64
+    changed = df.copy()
+    changed['a'] = changed['a'] + 1
+    assert content_hash(changed) != content_hash(df)
+    assert content_hash(df, codec='zlib') != content_hash(df)
+    assert content_hash(np.arange(3)) != content_hash(np.arange(3.))
+
+
+def _cached_frame():
+    index = pd.date_range('2000-01-01', periods=100)
+    return pd.DataFrame({'a': np.arange(100.), 'b': np.arange(100), 'c': ['x'] * 100}, index=index)
+
+
+@pytest.mark.parametrize('options', [{}, {'codec': 'zlib'}, {'codec': 'auto+zlib', 'chunk_rows': 30},
+                                     {'dedupe': True}])
+def test_encode_cache_hits(options):
+    df = _cached_frame()
+    cache = EncodeCache()
+    first = encode(df, cache=cache, **options)
+    assert cache.hits == 0 and len(cache) > 0
+    encoded = cache.misses
+    second = encode(df, cache=cache, **options)
+    assert second == first
+    # The index bounds of chunks are computed anew, into new arrays, by every encode.
+    assert cache.hits == encoded - (2 if 'chunk_rows' in options else 0)
+    assert_(df_compare(df, decode(second)))
+
+
+def test_encode_cache_invalidated_by_mutation():
+    df = _cached_frame()
+    cache = EncodeCache()
+    encode(df, cache=cache, codec='zlib')
+    df['a'].values[5] = -1.
+    df.iloc[7, 1] = -7
+    df_after = decode(encode(df, cache=cache, codec='zlib'))
+    assert df_after['a'].values[5] == -1.
+    assert df_after['b'].values[7] == -7
+    assert_(df_compare(df, df_after))
+
+
+def _crc_collision(size):
+    """Returns `size` bytes, not all zero, with the CRC32 of `size` zero bytes."""
+    zero = zlib.crc32(bytes(size))
+    basis = {}
+    for bit in range(8 * size):
+        data = bytearray(size)
+        data[bit // 8] = 1 << (bit % 8)
+        # The CRC32 is affine in the bits of the data, so find flipped bits whose effects cancel out.
+        value, bits = zlib.crc32(bytes(data)) ^ zero, 1 << bit
+        while value:
+            top = value.bit_length()
+            if top not in basis:
+                basis[top] = value, bits
+                break
+            value, bits = value ^ basis[top][0], bits ^ basis[top][1]
+        else:
+            return bits.to_bytes(size, 'little')
+
+
+def test_encode_cache_invalidated_by_crc_preserving_mutation():
+    arr = np.zeros(4, dtype=np.int64)
+    cache = EncodeCache()
+    encode(arr, cache=cache)
+    arr.view(np.uint8)[:] = np.frombuffer(_crc_collision(arr.nbytes), dtype=np.uint8)
+    assert zlib.crc32(arr.tobytes()) == zlib.crc32(bytes(arr.nbytes)) and arr.any()
+    assert decode(encode(arr, cache=cache)).tolist() == arr.tolist()
+    assert cache.hits == 0
+
+def test_encode_cache_keys_on_codec():
+    arr = np.arange(1000.)
+    cache = EncodeCache()
+    assert decode(encode(arr, cache=cache)).tolist() == arr.tolist()
+    assert '"zlib"' in encode(arr, cache=cache, codec='zlib')
+    assert cache.hits == 0
+
+
+def test_encode_cache_evicts_least_recently_used():
+    arrays = [np.arange(1000.) + i for i in range(4)]
+    cache = EncodeCache()
+    encode(arrays[0], cache=cache)
+    cache = EncodeCache(max_bytes=cache.size * 5 // 2)
+    for arr in arrays:
+        encode(arr, cache=cache)
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    encode(arrays[0], cache=cache)
+    assert cache.hits == 0
+    encode(arrays[3], cache=cache)
+    assert cache.hits == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0
+
+
+def _batch():
+    arr = np.arange(20.).reshape(4, 5)
+    return (_cached_frame(), {'a': arr, 'view': arr[1:], 'transposed': arr.T, 'copy': arr.copy()},
+            [pd.Categorical(['x', 'y', 'x']), pd.TimeSeries(np.arange(5.), index=np.arange(5))])
+
+
+@pytest.mark.parametrize('options', [{}, {'codec': 'zlib'}, {'dedupe': True},
+                                     {'dedupe': True, 'codec': 'shuffle+zlib', 'chunk_rows': 30},
+                                     {'column_codecs': {'a': 'xor'}}, {'canonical': True}])
+@pytest.mark.parametrize('processes', [False, True])
+def test_encode_batch_matches_encode(options, processes):
+    data = _batch()
+    string = encode_batch(data, workers=2, processes=processes, **options)
+    assert string == encode(data, **options)
+    data_after = decode_batch(string, workers=2, processes=processes)
+    assert_(df_compare(data[0], data_after[0]))
+    for key in data[1]:
+        assert_(ndarray_compare(data[1][key], data_after[1][key]))
+    assert data_after[1]['view'].base is not None or options.get('canonical')
+    assert_(ts_compare(data[2][1], data_after[2][1]))
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_decode_batch_into_pool(processes):
+    data = _batch()
+    pool = BufferPool()
+    data_after = decode_batch(encode(data, codec='zlib'), workers=2, processes=processes, pool=pool)
+    assert_(df_compare(data[0], data_after[0]))
+    pool.give(data_after)
+    assert len(pool) > 0
+
+
+def test_encode_batch_uses_cache():
+    data = _batch()
+    cache = EncodeCache()
+    first = encode_batch(data, processes=True, workers=2, cache=cache)
+    assert cache.hits == 0
+    assert encode_batch(data, processes=True, workers=2, cache=cache) == first
+    assert cache.hits > 0
+
+
+class _Series(pd.Series):
+    @property
+    def _constructor(self):
+        return _Series
+
+
+@pytest.mark.parametrize('obj', [
+    pd.Series([1., 2.], index=['x', 'y'], name='s'),
+    _Series([1, 2, 3]),
+    pd.Index([1, 2, 3], name='i'),
+    pd.Index(['x', 'y']),
+    pd.RangeIndex(2, 20, 3, name='r'),
+    pd.date_range('2000-01-01', periods=5, freq='H', tz='Europe/London', name='when'),
+    pd.period_range('2000-01', periods=4, freq='Q'),
+    pd.timedelta_range('1D', periods=3),
+    pd.CategoricalIndex(['a', 'b', 'a']),
+    pd.MultiIndex.from_product([[1, 2], ['a', 'b']], names=['n', 'm']),
+    pd.interval_range(0, 5, name='iv'),
+    pd.interval_range(pd.Timestamp('2000-01-01', tz='UTC'), periods=3, closed='left'),
+    pd.array([1, None, 3], dtype='Int64'),
+    pd.array([True, None], dtype='boolean'),
+    pd.array([1.5, None], dtype='Float64'),
+    pd.date_range('2000-01-01', periods=3, tz='UTC').array,
+    pd.period_range('2000-01-01', periods=3, freq='D').array,
+    pd.arrays.IntervalArray.from_arrays([0., np.nan, 2.], [1.5, np.nan, 4.], closed='both'),
+])
+@pytest.mark.parametrize('codec', [None, jsonpickle])
+def test_pandas_types_round_trip(obj, codec):
+    obj_after = decode(encode(obj)) if codec is None else jsonpickle.decode(jsonpickle.encode(obj))
+    assert type(obj_after) is type(obj)
+    assert obj_after.equals(obj)
+    for attr in ('name', 'names', 'dtype'):
+        assert getattr(obj_after, attr, None) == getattr(obj, attr, None)
+    if isinstance(obj, pd.Index):
+        assert getattr(obj_after, 'freq', None) == getattr(obj, 'freq', None)
+
+
+def test_pandas_types_are_stored_compactly():
+    index = pd.date_range('2000-01-01', periods=1000, freq='H', tz='Europe/London')
+    buf = encode(index)
+    assert len(buf) < index.asi8.nbytes * 1.5
+    assert '"py/state"' not in buf and '"Timestamp"' not in buf
+
+
+def test_extension_columns_round_trip():
+    df = pd.DataFrame({'tz': pd.date_range('2000-01-01', periods=6, tz='Asia/Tokyo'),
+                       'i': pd.array([1, None, 3, 4, 5, 6], dtype='Int64'),
+                       'p': pd.period_range('2000-01', periods=6, freq='M'), 'f': np.arange(6.),
+                       'iv': pd.interval_range(0, 6)},
+                      index=pd.date_range('2001-01-01', periods=6, tz='UTC'))
+    for chunk_rows in (None, 4):
+        string = encode(df, chunk_rows=chunk_rows)
+        assert decode(string).equals(df)
+        assert list(decode(string).dtypes) == list(df.dtypes)
+        assert read(string, columns=['tz', 'i'], rows=slice(1, 5)).equals(df[['tz', 'i']].iloc[1:5])
+        index_range = (pd.Timestamp('2001-01-02', tz='UTC'), pd.Timestamp('2001-01-04', tz='UTC'))
+        assert read(string, index_range=index_range).equals(df.iloc[1:4])
+    series = pd.Series(df['tz'].values, name='naive')
+    assert decode(encode(df['tz'])).equals(df['tz'])
+    assert decode(encode(series)).name == 'naive'
+
+
+@pytest.mark.parametrize('index', [
+    pd.date_range('2000-01-01', periods=6, freq='H', name='when'),
+    pd.date_range('2000-01-01', periods=6, freq='D', tz='US/Eastern'),
+    pd.period_range('2000-01', periods=6, freq='M', name='month'),
+    pd.RangeIndex(10, 70, 10, name='r'),
+    pd.Index(list('abcdef'), name=('x', 1)),
+    pd.interval_range(0, 6, name='iv'),
+    pd.MultiIndex.from_product([[1, 2], ['a', 'b', 'c']], names=['n', 'm']),
+])
+@pytest.mark.parametrize('chunk_rows', [None, 4])
+def test_frame_and_series_indexes_round_trip(index, chunk_rows):
+    df = pd.DataFrame({'a': np.arange(6.), 'b': list('uvwxyz')}, index=index)
+    for obj in (df, df['a']):
+        obj_after = decode(encode(obj, chunk_rows=chunk_rows))
+        assert obj_after.equals(obj)
+        assert type(obj_after.index) is type(index)
+        assert obj_after.index.names == index.names
+        assert getattr(obj_after.index, 'freq', None) == getattr(index, 'freq', None)
+    after = read(encode(df, chunk_rows=chunk_rows), rows=slice(1, 5))
+    assert after.equals(df.iloc[1:5])
+    assert after.index.names == index.names
+
+
+class _OtherSeries(pd.Series):
+    pass
+
+
+def test_subclass_handlers_are_found_once(monkeypatch):
+    from jsonpickle import handlers
+    from pdutils.serialize import json as module
+
+    monkeypatch.setattr(module, '_DISPATCH', {})
+    assert handlers.get(_OtherSeries) is None
+    obj = _OtherSeries([1., 2.])
+    assert decode(encode(obj)).equals(obj)
+    # The handler found along the MRO is registered with jsonpickle, which finds it from then on.
+    assert handlers.get(_OtherSeries) is module.PandasTimeSeriesHandler
+    assert module._DISPATCH[_OtherSeries] is module.PandasTimeSeriesHandler
+    assert module._handler(int) is None
+    assert module._DISPATCH[int] is None
@@ -0,0 +1,118 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdutils.serialize.json import register_handlers
+from pdutils.serialize.store import AppendStore
+from pdutils.compare import ts_compare, df_compare
+from pdutils.assert_funcs import assert_
+
+register_handlers()
+
+
+def _series(start, size):
+    index = pd.date_range('2000-01-01', periods=start + size, freq='T')[start:]
+    return pd.TimeSeries(np.arange(start, start + size, dtype=float), index)
+
+
+def _filled(path, sizes=(10, 20, 5, 15), **options):
+    store = AppendStore(path, **options)
+    start = 0
+    for size in sizes:
+        store.append(_series(start, size))
+        start += size
+    return store
+
+
+def test_append_and_read(tmpdir):
+    store = _filled(str(tmpdir.join('store')), codec='zlib')
+    assert store.chunks() == [10, 20, 5, 15]
+    assert len(store) == 50
+    assert_(ts_compare(_series(0, 50), store.read()))
+
+
+def test_append_writes_new_rows_only(tmpdir):
+    store = _filled(str(tmpdir.join('store')))
+    before = dict((name, os.path.getmtime(os.path.join(store.path, name)))
+                  for name in os.listdir(store.path) if name.endswith('.frame'))
+    store.append(_series(50, 5))
+    after = [name for name in os.listdir(store.path) if name.endswith('.frame')]
+    assert len(after) == len(before) + 1
+    for name, mtime in before.items():
+        assert os.path.getmtime(os.path.join(store.path, name)) == mtime
+
+
+def test_reopen(tmpdir):
+    path = str(tmpdir.join('store'))
+    _filled(path)
+    assert_(ts_compare(_series(0, 50), AppendStore(path).read()))
+
+
+def test_read_selection(tmpdir):
+    store = _filled(str(tmpdir.join('store')))
+    expected = _series(0, 50)
+    assert store.read(rows=slice(8, 33)).tolist() == expected.values[8:33].tolist()
+    assert store.read(rows=slice(None, None, 7)).tolist() == expected.values[::7].tolist()
+    ts = store.read(index_range=(expected.index[12], expected.index[31]))
+    assert ts.tolist() == expected.values[12:32].tolist()
+    assert len(store.read(rows=slice(100, 200))) == 0
+
+
+def test_read_skips_chunks(tmpdir):
+    store = _filled(str(tmpdir.join('store')))
+    # Reads must not need the chunks outside the selection.
+    os.remove(os.path.join(store.path, 'chunk-000000.frame'))
+    assert store.read(rows=slice(10, 12)).tolist() == [10., 11.]
+    assert store.read(index_range=(_series(45, 1).index[0], None)).tolist() == [45., 46., 47., 48., 49.]
+
+
+def test_frames(tmpdir):
+    store = AppendStore(str(tmpdir.join('store')), chunk_rows=4)
+    parts = []
+    for start in (0, 10, 20):
+        index = pd.date_range('2000-01-01', periods=start + 10)[start:]
+        parts.append(pd.DataFrame({'a': np.arange(start, start + 10), 'b': np.ones(10)}, index=index))
+        store.append(parts[-1])
+    assert_(df_compare(pd.concat(parts), store.read()))
+    assert store.read(columns=['a'], rows=slice(8, 12))['a'].tolist() == [8, 9, 10, 11]
+    with pytest.raises(ValueError):
+        store.append(parts[0][['a']])
+    with pytest.raises(ValueError):
+        store.append(_series(0, 1))
+
+
+def test_empty_store(tmpdir):
+    with pytest.raises(ValueError):
+        AppendStore(str(tmpdir.join('store'))).read()
+
+
+def test_compact(tmpdir):
+    store = _filled(str(tmpdir.join('store')), sizes=[5] * 10)
+    store.compact(target_rows=20)
+    assert store.chunks() == [20, 20, 10]
+    assert len([name for name in os.listdir(store.path) if name.endswith('.frame')]) == 3
+    assert_(ts_compare(_series(0, 50), store.read()))
+
+
+def test_background_compaction_with_appends_and_reads(tmpdir):
+    store = _filled(str(tmpdir.join('store')), sizes=[5] * 20)
+    results = []
+
+    def reader():
+        for _ in range(20):
+            ts = store.read()
+            results.append(ts.tolist() == list(np.arange(len(ts), dtype=float)))
+
+    thread = store.compact(target_rows=25, wait=False)
+    reading = threading.Thread(target=reader)
+    reading.start()
+    for start in range(100, 150, 5):
+        store.append(_series(start, 5))
+    thread.join()
+    reading.join()
+    assert all(results)
+    assert_(ts_compare(_series(0, 150), store.read()))
+    assert sum(store.chunks()) == 150
@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 from dateutil.parser import parse as parse_date
 
-from pdutils import df_compare, ndarray_compare, ts_compare, assert_, assert_not
+from pdutils import df_compare, ndarray_compare, ts_compare, sketch, sketch_compare, assert_, assert_not
 
 
 #    Example pandas DataFrame objects that are expected to be equal.
@@ -225,3 +225,168 @@ def test_df_compare_same_with_custom_float_precision(df1, df2, tolerance):
 ])
 def test_ts_compare_same_with_custom_float_precision(ts1, ts2, tolerance):
     assert_(ts_compare(ts1, ts2, verbose=True, rtol=tolerance))
+
+
+def test_sketch():
+    summary = sketch(np.array([1., np.nan, -2., 4.]))
+    assert summary == {'dtype': '<f8', 'count': 4, 'nans': 1, 'min': -2., 'max': 4., 'sum': 3., 'sum_sq': 21.,
+                       'distinct': summary['distinct']}
+    assert round(summary['distinct']) == 4
+    assert sketch(np.array([3, 1, 2]), distinct=False) == {'dtype': '<i8', 'count': 3, 'nans': 0, 'min': 1,
+                                                           'max': 3, 'sum': 6, 'sum_sq': 14}
+    assert sketch(np.array([np.nan]), distinct=False)['min'] is None
+    assert sketch(np.array(['a', 'b'], dtype=object), distinct=False) == {'dtype': '|O', 'count': 2, 'nans': 0}
+    dates = sketch(pd.date_range('2000-01-01', periods=3).values, distinct=False)
+    assert dates['min'] == pd.Timestamp('2000-01-01').value
+    for size in (10, 1000, 100000):
+        assert abs(sketch(np.arange(size) % (size // 2))['distinct'] / (size // 2) - 1) < 0.1
+
+
+def test_sketch_compare():
+    a = np.random.RandomState(0).normal(size=1000)
+    assert_(sketch_compare(sketch(a), sketch(a.copy())))
+    assert_not(sketch_compare(sketch(a), sketch(a + 1)))
+    assert_not(sketch_compare(sketch(a), sketch(a[:-1])))
+    assert_not(sketch_compare(sketch(a), sketch(a.astype(np.float32))))
+    b = a.copy()
+    b[5] = np.nan
+    assert_not(sketch_compare(sketch(a), sketch(b)))
+    equivalent, msg = sketch_compare(sketch(np.arange(10)), sketch(np.arange(10) + 1))
+    assert not equivalent and 'sum' in msg and 'min' in msg
+    assert_(sketch_compare(sketch(np.arange(10)), sketch(np.arange(10)[::-1])))
+    assert_not(sketch_compare(sketch(np.arange(10)), sketch(np.arange(10) % 5)))
+
+
+def test_sketch_compare_never_rejects_equivalent_arrays():
+    rs = np.random.RandomState(1)
+    for _ in range(100):
+        scale = 10. ** rs.randint(-5, 10)
+        left = rs.normal(size=rs.randint(1, 10000)) * scale
+        left[rs.uniform(size=left.size) < 0.1] = np.nan
+        rtol, atol = 10. ** rs.randint(-9, -2), 10. ** rs.randint(-12, 0)
+        # Moved by as much as np.allclose() allows.
+        right = left + np.sign(rs.normal(size=left.size)) * (atol + rtol * np.abs(left)) * 0.999
+        assert ndarray_compare(left, right, rtol=rtol, atol=atol)[0]
+        assert_(sketch_compare(sketch(left), sketch(right), rtol=rtol, atol=atol))
+
+
+@pytest.mark.parametrize('dtype', [np.float16, np.float32])
+def test_sketch_compare_at_tolerance_in_narrow_dtypes(dtype):
+    # np.allclose() rounds atol (and the differences) to the dtype of the values.
+    left, right = np.array([0, 1], dtype=dtype), np.array([0.001, 1], dtype=dtype)
+    assert ndarray_compare(left, right, rtol=0, atol=1e-3)[0]
+    assert_(sketch_compare(sketch(left), sketch(right), rtol=0, atol=1e-3))
+    df1, df2 = pd.DataFrame({'x': left}), pd.DataFrame({'x': right})
+    assert_(df_compare(df1, df2, rtol=0, atol=1e-3))
+    from pdutils.compare import df_compare_batch
+    assert df_compare_batch([(df1, df2)], rtol=0, atol=1e-3)[0][0]
+    assert_not(sketch_compare(sketch(left), sketch(right * dtype(2)), rtol=0, atol=1e-3))
+
+
+def test_sketch_compare_overflow_is_inconclusive():
+    # The sum of squares overflows to inf on the left only.
+    left = np.array([np.sqrt(np.finfo(np.float64).max) * (1 + 1e-9)])
+    right = left * (1 - 2e-9)
+    assert np.isinf(sketch(left)['sum_sq']) and np.isfinite(sketch(right)['sum_sq'])
+    assert ndarray_compare(left, right)[0]
+    assert_(sketch_compare(sketch(left), sketch(right)))
+    assert_(sketch_compare(sketch(right), sketch(left)))
+
+
+def test_df_compare_quick_reject():
+    df1 = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10)})
+    df2 = df1.copy()
+    df2['b'] *= 2
+    equivalent, msg = df_compare(df1, df2)
+    assert not equivalent
+    assert msg.startswith("comparison of column 'b' failed! values are different! ")
+    df2 = df1.copy()
+    df2.iloc[[0, 1], 0] = [1., 0.]
+    assert df_compare(df1, df2) == (False, "comparison of column 'a' failed! values are different!")
+
+
+def test_sample_rows():
+    from pdutils.compare import _sample_rows
+    rows = _sample_rows(10 ** 9, 1000, 3)
+    assert len(rows) == len(np.unique(rows)) == 1000
+    assert np.all(np.diff(rows) > 0)
+    assert rows.tolist() == _sample_rows(10 ** 9, 1000, 3).tolist()
+    assert rows.tolist() != _sample_rows(10 ** 9, 1000, 4).tolist()
+    assert len(_sample_rows(1000, 0.1, 0)) == 100
+    assert len(_sample_rows(1000, 900, 0)) == 900
+    assert _sample_rows(1000, 1000, 0) is None
+    assert _sample_rows(1000, 1., 0) is None
+    assert len(_sample_rows(1000, 0.0001, 0)) == 1
+    assert len(_sample_rows(1000, 2., 0)) == 2
+    for sample in (0, 0., -1, -0.5):
+        with pytest.raises(ValueError):
+            _sample_rows(1000, sample, 0)
+
+
+def test_ndarray_compare_sample():
+    a = np.random.RandomState(0).normal(size=100000)
+    b = a.copy()
+    equivalent, msg = ndarray_compare(a, b, sample=1000)
+    assert equivalent
+    assert msg == 'values are equivalent in a sample of 1000 of 100000 rows, ' \
+        'the mismatch rate is below 0.00299 with 95% confidence'
+    assert ndarray_compare(a, b, sample=1000, confidence=0.99)[1].endswith('below 0.00459 with 99% confidence')
+    assert ndarray_compare(a, b, sample=10 ** 6) == (True, 'values are equivalent')
+    # Rows that differ rarely may be missed, often they are not.
+    b[::10000] += 1
+    assert_(ndarray_compare(a, b, sample=100))
+    b[::10] += 1
+    assert_not(ndarray_compare(a, b, sample=100))
+    assert_not(ndarray_compare(a, b[:-1], sample=100))
+    assert ndarray_compare(a, b, sample=1.) == ndarray_compare(a, b)
+    # 0-d arrays have no rows to sample and are compared in full.
+    assert ndarray_compare(np.array(1.), np.array(1.), sample=10) == (True, 'values are equivalent')
+    assert_not(ndarray_compare(np.array(1), np.array(2), sample=0.5))
+    with pytest.raises(ValueError):
+        ndarray_compare(a, b, sample=0)
+
+
+def test_df_compare_sample():
+    index = pd.date_range('2000-01-01', periods=10000, freq='S')
+    df1 = pd.DataFrame({'a': np.arange(10000.), 'b': np.arange(10000) % 7}, index)
+    df2 = df1.copy()
+    equivalent, msg = df_compare(df1, df2, sample=0.05, seed=1)
+    assert equivalent
+    assert msg.startswith('DataFrame contents are equivalent in a sample of 500 of 10000 rows')
+    df2.iloc[::2, 1] = -1
+    assert_not(df_compare(df1, df2, sample=50))
+    df2 = df1.copy()
+    df2.index = index + pd.Timedelta('1ms')
+    assert df_compare(df1, df2, sample=50) == (False, 'index values are not the same!')
+
+    ts1, ts2 = df1['a'], df1['a'] * (1 + 1e-9)
+    assert ts_compare(ts1, ts2, sample=10)[1].startswith('TimeSeries contents are equivalent in a sample of 10 ')
+    assert_not(ts_compare(ts1, ts2 + 1, sample=10))
+
+
+def test_df_compare_batch(monkeypatch):
+    index = pd.date_range('1970-01-01', periods=3, freq='S')
+    df = pd.DataFrame({'a': [1., np.nan, 3.], 'b': [1, 2, 3], 'c': ['x', 'y', 'z']}, index)
+    pairs = [(df, df.copy()), (df, df.assign(a=[1., np.nan, 3.000001])), (df, df.assign(a=[1., 2., 3.])),
+             (df, df.assign(a=[1., np.nan, 4.])), (df, df.assign(b=[1, 2, 4])), (df, df.assign(c=['x', 'y', 'w'])),
+             (df, df.set_axis(index + pd.Timedelta('1s'))), (df, df[['c', 'b', 'a']]), (df, df.iloc[:2]),
+             (df, df.assign(b=df['b'].astype(float))), (df.iloc[:0], df.iloc[:0]),
+             (df.tz_localize('UTC'), df.tz_localize('UTC').assign(b=[1, 2, 4])),
+             (df[['b']], df[['b']]), (df[['b']].iloc[:1], df[['b']].iloc[:1].copy())]
+    expected = [df_compare(left, right) for left, right in pairs]
+    assert [equivalent for equivalent, _ in expected] == [True, True, False, False, False, False, False, True,
+                                                          False, False, True, False, True, True]
+
+    from pdutils import compare
+    compared = []
+
+    def counted(left, right, **kwargs):
+        compared.append([i for i, pair in enumerate(pairs) if pair[0] is left and pair[1] is right][0])
+        return df_compare(left, right, **kwargs)
+
+    monkeypatch.setattr(compare, 'df_compare', counted)
+    assert compare.df_compare_batch(pairs) == expected
+    # Only the pairs that differ, or that can't be grouped, are compared one by one.
+    assert compared == [7, 8, 9, 10, 11, 2, 3, 4, 5, 6]
+    assert compare.df_compare_batch(iter(pairs), rtol=0.1) == [df_compare(l, r, rtol=0.1) for l, r in pairs]
+    assert compare.df_compare_batch([]) == []
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdutils.diff import diff, patch
+from pdutils.serialize.json import register_handlers, encode, decode
+
+register_handlers()
+
+
+def _frame(size=1000):
+    index = pd.date_range('2000-01-01', periods=size, freq='H')
+    index.name = 'when'
+    return pd.DataFrame({'a': np.arange(size, dtype=float), 'b': np.arange(size) * 2,
+                         'c': np.array(['x', 'y'] * (size // 2), dtype=object)}, index=index)
+
+
+def _round_trip(old, new, **kwargs):
+    delta = decode(encode(diff(old, new, **kwargs)))
+    patched = patch(old, delta)
+    assert patched.equals(new)
+    assert list(patched.columns) == list(new.columns)
+    assert patched.index.name == new.index.name
+    return delta
+
+
+def test_unchanged():
+    df = _frame()
+    delta = _round_trip(df, df.copy())
+    assert delta['changes'] == []
+    assert len(delta['rows']) == len(delta['removed_rows']) == 0
+    assert delta['index'] is None
+
+
+def test_changed_values():
+    old = _frame()
+    new = old.copy()
+    new.iloc[10:20, 0] = -1.
+    new.iloc[500, 0] = np.nan
+    new.iloc[999, 2] = 'z'
+    old.iloc[[3, 4], 0] = new.iloc[[3, 4], 0] = np.nan
+    delta = _round_trip(old, new)
+    changes = dict((name, change) for name, change in delta['changes'])
+    assert sorted(changes) == ['a', 'c']
+    assert changes['a']['ranges'].tolist() == [[10, 20], [500, 501]]
+    assert changes['c']['ranges'].tolist() == [[999, 1000]]
+    assert list(changes['c']['values']) == ['z']
+
+
+def test_rows_and_columns():
+    old = _frame()
+    new = old.drop(old.index[[0, 1, 500]])
+    new = pd.concat([new, _frame(1010).iloc[1000:]])
+    new.iloc[100, 1] = 7
+    new['d'] = np.arange(len(new)) % 5 == 0
+    del new['c']
+    delta = _round_trip(old, new)
+    assert list(delta['removed_rows']) == list(old.index[[0, 1, 500]])
+    assert len(delta['rows']) == 10
+    assert delta['removed_columns'] == ['c']
+    assert delta['index'] is None
+
+
+def test_reordered():
+    old = _frame(10)
+    new = old.iloc[::-1][['c', 'a', 'b']]
+    new.index.name = 'other'
+    delta = _round_trip(old, new)
+    assert delta['changes'] == []
+    assert delta['index'] is not None
+
+
+def test_replaced_columns():
+    old = _frame()
+    new = old.copy()
+    new['a'] = new['a'] + 1
+    new['b'] = new['b'].astype(float)
+    delta = _round_trip(old, new)
+    changes = dict((name, change) for name, change in delta['changes'])
+    assert sorted(changes) == ['a', 'b']
+    assert all('ranges' not in change for change in changes.values())
+
+
+def test_tolerance():
+    old = _frame()
+    new = old.copy()
+    new['a'] += 1e-12
+    new.iloc[5, 0] = 1e6
+    delta = diff(old, new, atol=1e-9)
+    assert [name for name, _ in delta['changes']] == ['a']
+    patched = patch(old, delta)
+    assert patched.iloc[5, 0] == 1e6
+    assert np.allclose(patched['a'], new['a'], atol=1e-9)
+
+
+def test_extension_columns():
+    old = _frame(100)
+    old['tz'] = pd.date_range('2000-01-01', periods=100, tz='US/Eastern')
+    old['i'] = pd.array(np.arange(100), dtype='Int64')
+    old['cat'] = pd.Categorical(['p', 'q'] * 50)
+    new = old.copy()
+    new.iloc[3, 3] = pd.Timestamp('1999-01-01', tz='US/Eastern')
+    new.iloc[[4, 5], 4] = pd.NA
+    new.iloc[7, 5] = 'p'
+    new = pd.concat([new, new.iloc[:2].set_axis(pd.date_range('2001-01-01', periods=2, freq='H', name='when'))])
+    delta = _round_trip(old, new)
+    assert sorted(name for name, change in delta['changes'] if 'ranges' in change) == ['cat', 'i', 'tz']
+    assert str(patch(old, delta)['i'].dtype) == 'Int64'
+
+
+def test_chain():
+    snapshots = [_frame(2000)]
+    for day in range(1, 10):
+        df = snapshots[-1].copy()
+        df.iloc[day * 10:day * 10 + 5, 0] = day
+        df.loc[df.index[-1] + pd.Timedelta(hours=1)] = [day, day, 'x']
+        snapshots.append(df.iloc[1:])
+    deltas = [encode(diff(old, new), codec='zlib') for old, new in zip(snapshots, snapshots[1:])]
+    df = snapshots[0]
+    for delta in deltas:
+        df = patch(df, decode(delta))
+    assert df.equals(snapshots[-1])
+    assert sum(len(delta) for delta in deltas) < len(encode(snapshots[-1], codec='zlib'))
+
+
+def test_errors():
+    df = _frame(10)
+    delta = diff(df, df.iloc[1:])
+    with pytest.raises(ValueError):
+        patch(df.iloc[1:], delta)
+    with pytest.raises(ValueError):
+        patch(df, {'a': 1})
+    with pytest.raises(ValueError):
+        diff(df, pd.concat([df, df]))
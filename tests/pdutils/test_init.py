@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pdutils
+import pdutils.serialize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(pdutils.__file__)))
+
+
+def _imported(statement):
+    """Returns the names of the modules imported by `statement` in a fresh interpreter."""
+    script = '%s\nimport sys\nprint(" ".join(sys.modules))' % statement
+    output = subprocess.check_output([sys.executable, '-c', script], env=dict(os.environ, PYTHONPATH=ROOT))
+    return set(output.decode('ascii').split())
+
+
+def test_import_is_lazy():
+    assert 'numpy' not in _imported('import pdutils')
+    assert 'numpy' not in _imported('from pdutils import assert_, assert_not')
+    assert 'pandas' not in _imported('from pdutils import ndarray_compare, sketch, sketch_compare')
+    imported = _imported('import pdutils.serialize')
+    assert 'pandas' not in imported and 'jsonpickle' not in imported
+
+
+def test_public_names():
+    from pdutils.compare import ts_compare, df_compare, ndarray_compare
+    from pdutils.assert_funcs import assert_, assert_not
+    assert (pdutils.ts_compare, pdutils.df_compare, pdutils.ndarray_compare) == (ts_compare, df_compare,
+                                                                                 ndarray_compare)
+    assert (pdutils.assert_, pdutils.assert_not) == (assert_, assert_not)
+    assert set(pdutils.__all__) <= set(dir(pdutils))
+    with pytest.raises(AttributeError):
+        pdutils.no_such_name
+
+
+def test_serialize_submodules():
+    from pdutils.serialize import codecs
+    assert pdutils.serialize.codecs is codecs
+    assert 'json' in dir(pdutils.serialize)
+    with pytest.raises(AttributeError):
+        pdutils.serialize.no_such_module
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+
+from pdutils.sharedmem import SharedFrame, share
+from pdutils.compare import df_compare
+from pdutils.assert_funcs import assert_
+
+
+def _frame():
+    index = pd.date_range('2000-01-01', periods=1000, freq='T')
+    return pd.DataFrame({'a': np.arange(1000.), 'b': np.arange(1000) % 7, 'c': ['x', 'y'] * 500}, index=index)
+
+
+def _column_sums(handle):
+    df = handle.frame()
+    views = all(not df[col].values.flags.owndata for col in ('a', 'b'))
+    sums = float(df['a'].sum()), int(df['b'].sum())
+    del df
+    handle.close()
+    return sums, views
+
+
+def _crash(handle):
+    handle.frame()
+    os._exit(1)
+
+
+def _exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def test_frame_round_trip():
+    df = _frame()
+    with share(df) as handle:
+        df_after = handle.frame()
+        assert_(df_compare(df, df_after))
+        assert not df_after['a'].values.flags.writeable
+        del df_after
+    assert not _exists(handle.name)
+
+
+def test_workers_view_shared_buffers():
+    df = _frame()
+    pool = multiprocessing.Pool(2)
+    try:
+        with share(df) as handle:
+            results = pool.map(_column_sums, [handle] * 4)
+    finally:
+        pool.close()
+        pool.join()
+    for sums, views in results:
+        assert sums == (float(df['a'].sum()), int(df['b'].sum()))
+        assert views
+    assert not _exists(handle.name)
+
+
+def test_handle_pickles_to_name_and_size():
+    with share(_frame()) as handle:
+        state = handle.__getstate__()
+        assert state == {'name': handle.name, 'size': handle.size}
+        attached = SharedFrame(**state)
+        df = attached.frame()
+        assert_(df_compare(_frame(), df))
+        del df
+        attached.close()
+
+
+def test_worker_crash_does_not_leak():
+    with share(_frame()) as handle:
+        process = multiprocessing.Process(target=_crash, args=(handle,))
+        process.start()
+        process.join()
+        assert process.exitcode == 1
+        assert _exists(handle.name)
+    assert not _exists(handle.name)
+
+
+def test_close_with_frames_in_use():
+    with share(_frame()) as handle:
+        df = handle.frame()
+        with pytest.raises(BufferError):
+            handle.close()
+        del df
+        handle.close()
+
+
+def test_only_the_owner_unlinks():
+    with share(_frame()) as handle:
+        with pytest.raises(ValueError):
+            SharedFrame(handle.name, handle.size).unlink()
+        assert _exists(handle.name)